@@ -0,0 +1,153 @@
+import platform
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass
+
+from . import __version__
+from .database import CleanupSchema
+from .docker_client import DockerClient
+from .engine import DEFAULT_BATCH_SIZE, DEFAULT_JOBS, CleanupEngine
+from .fake_daemon import FakeDockerDaemon, container, image, volume
+from .inventory import RESOURCE_TYPES, Inventory, Resource, iter_resources, resource_matcher
+from .plan import CleanupPlan
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_PATTERN_COUNTS = (1, 10, 100)
+DEFAULT_MATCH_RATIO = 0.1
+# list: stream every resource from the daemon; match: evaluate the patterns against the listing;
+# attribute: tell which cleanups match each resource of a snapshot of the listing;
+# delete: remove the matches computed beforehand; clean: the whole `clean` path on a fresh daemon.
+STAGES = ("list", "match", "attribute", "delete", "clean")
+
+
+@dataclass
+class BenchResult:
+    """Throughput of one stage for one inventory size and pattern count."""
+
+    stage: str
+    size: int
+    patterns: int
+    items: int
+    seconds: float
+
+    @property
+    def per_second(self) -> float:
+        """Items processed per second."""
+        return self.items / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> dict:
+        """Serialize the result, including its throughput."""
+        return {**asdict(self), "per_second": round(self.per_second, 1)}
+
+
+def synthetic_inventory(size: int, patterns: int, match_ratio: float = DEFAULT_MATCH_RATIO) -> dict[str, list[dict]]:
+    """Build ``size`` containers, volumes and images, a ``match_ratio`` share of them matched by the patterns.
+
+    Matched resources are spread evenly over the ``patterns`` cleanups of :func:`bench_cleanups`.
+    """
+    step = max(round(1 / match_ratio), 1)
+    names = [f"job{(i // step) % patterns}-{i}" if i % step == 0 else f"svc-{i}" for i in range(size)]
+    return {
+        "containers": [container(f"{i:064x}", name, Created=i, SizeRw=1024) for i, name in enumerate(names)],
+        "volumes": [volume(name, UsageData={"Size": 4096, "RefCount": 0}) for name in names],
+        "images": [image(f"sha256:{i:064x}", f"{name}:latest", Created=i, Size=65536) for i, name in enumerate(names)],
+    }
+
+
+def bench_cleanups(patterns: int) -> list[CleanupSchema]:
+    """Return the cleanups matching the resources of :func:`synthetic_inventory`."""
+    return [CleanupSchema(name=f"job{j}", regular_expression=f"job{j}-") for j in range(patterns)]
+
+
+def run_case(  # noqa: PLR0913
+    size: int,
+    patterns: int,
+    *,
+    match_ratio: float = DEFAULT_MATCH_RATIO,
+    latency: float = 0.0,
+    jobs: int = DEFAULT_JOBS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> list[BenchResult]:
+    """Measure every stage of :data:`STAGES` for one inventory size and pattern count.
+
+    Args:
+        size: Number of containers, and of volumes and of images.
+        patterns: Number of cleanups run together.
+        match_ratio: Share of the resources matched by the cleanups.
+        latency: Seconds the fake daemon waits before answering each request.
+        jobs: Concurrent removals.
+        batch_size: Matches handed to the removal workers at a time.
+    """
+    inventory = synthetic_inventory(size, patterns, match_ratio)
+    cleanups = bench_cleanups(patterns)
+    results = []
+
+    with FakeDockerDaemon(**inventory, latency=latency) as daemon, DockerClient(daemon.base_url) as client:
+        start = time.perf_counter()
+        listed: dict[str, list[Resource]] = {t: list(iter_resources(client, t)) for t in RESOURCE_TYPES}
+        results.append(_result("list", size, patterns, sum(map(len, listed.values())), start))
+
+        start = time.perf_counter()
+        matches = resource_matcher(cleanups)
+        matched = {t: [r for r in resources if matches(r)] for t, resources in listed.items()}
+        results.append(_result("match", size, patterns, sum(map(len, listed.values())), start))
+
+        snapshot = Inventory(resource for resources in listed.values() for resource in resources)
+        start = time.perf_counter()
+        snapshot.matched_by(cleanups)
+        results.append(_result("attribute", size, patterns, len(snapshot), start))
+
+        plan = CleanupPlan.build(cleanups, matched, docker_host=daemon.base_url)
+        start = time.perf_counter()
+        removed = CleanupEngine(client).execute(plan, jobs=jobs, batch_size=batch_size)
+        results.append(_result("delete", size, patterns, _removed(removed.values()), start))
+
+    with FakeDockerDaemon(**inventory, latency=latency) as daemon, DockerClient(daemon.base_url) as client:
+        start = time.perf_counter()
+        removed = CleanupEngine(client).clean_many(cleanups, jobs=jobs, batch_size=batch_size)
+        results.append(_result("clean", size, patterns, _removed(removed.values()), start))
+    return results
+
+
+def run_benchmarks(  # noqa: PLR0913
+    sizes: Iterable[int] = DEFAULT_SIZES,
+    pattern_counts: Iterable[int] = DEFAULT_PATTERN_COUNTS,
+    *,
+    match_ratio: float = DEFAULT_MATCH_RATIO,
+    latency: float = 0.0,
+    jobs: int = DEFAULT_JOBS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Callable[[int, int], None] | None = None,
+) -> list[BenchResult]:
+    """Run :func:`run_case` for every combination of size and pattern count.
+
+    ``progress`` is called with ``(size, patterns)`` before each case.
+    """
+    results = []
+    for size in sizes:
+        for patterns in pattern_counts:
+            if progress is not None:
+                progress(size, patterns)
+            results += run_case(
+                size, patterns, match_ratio=match_ratio, latency=latency, jobs=jobs, batch_size=batch_size
+            )
+    return results
+
+
+def bench_report(results: Iterable[BenchResult], **parameters: object) -> dict:
+    """Build the machine-readable report: environment, benchmark parameters and one entry per result."""
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": parameters,
+        "results": [result.to_dict() for result in results],
+    }
+
+
+def _result(stage: str, size: int, patterns: int, items: int, start: float) -> BenchResult:
+    return BenchResult(stage, size, patterns, items, time.perf_counter() - start)
+
+
+def _removed(results: Iterable) -> int:
+    return sum(len(result.removed) for result in results)
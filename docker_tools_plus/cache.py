@@ -0,0 +1,266 @@
+import hashlib
+import logging
+import marshal
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from . import profiling
+from .defaults import DEFAULT_CACHE_TTL
+from .exceptions import DockerAPIError, DockerCommandError
+from .filters import parse_timestamp
+from .inventory import (
+    DEFAULT_INVENTORY_TTL,
+    EVENT_ACTIONS,
+    EVENT_TYPES,
+    REMOVAL_ACTIONS,
+    RESOURCE_TYPES,
+    Inventory,
+    InventoryProvider,
+    Resource,
+    fetch_resource,
+)
+
+if TYPE_CHECKING:
+    from .docker_client import DockerClient
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the layout of the cache file changes; files of another version are ignored
+CACHE_FORMAT = 4
+# Events the daemon keeps for replays; a replay this long may have lost the oldest changes
+DAEMON_EVENT_BUFFER = 256
+
+
+def cache_path(folder: Path, base_url: str) -> Path:
+    """Return the cache file of a Docker host; each host has its own."""
+    digest = hashlib.sha256(base_url.encode()).hexdigest()[:16]
+    return folder / f"inventory-{digest}.cache"
+
+
+@dataclass(frozen=True)
+class DaemonState:
+    """What identifies the state of a daemon an inventory reflects."""
+
+    daemon_id: str
+    # Daemon clock when the state was read; later events are not reflected
+    cursor: float
+    # Containers and images reported by /info, to notice changes the replayed events missed
+    counters: tuple[int, int]
+
+    @classmethod
+    def read(cls, client: "DockerClient") -> "DaemonState":
+        """Read the state of the daemon from ``/info``."""
+        info = client.info()
+        return cls(
+            daemon_id=info.get("ID") or "",
+            cursor=parse_timestamp(info.get("SystemTime")) or time.time(),
+            counters=(info.get("Containers") or 0, info.get("Images") or 0),
+        )
+
+
+def save_inventory(path: Path, inventory: Inventory, base_url: str, state: DaemonState) -> None:
+    """Write an inventory and the daemon state it reflects to ``path``.
+
+    The file is a ``marshal`` dump of built-in types, which loads without any parsing in Python code. It is
+    written to a temporary file first and renamed, so concurrent processes never read half of it.
+
+    Raises:
+        OSError: If the file cannot be written.
+    """
+    data = marshal.dumps(
+        {
+            "format": CACHE_FORMAT,
+            "base_url": base_url,
+            "saved_at": time.time(),
+            "daemon_id": state.daemon_id,
+            "cursor": state.cursor,
+            "sized": inventory.sized,
+            "resources": {
+                t: [
+                    (r.id, r.names, r.image, r.labels, r.size, r.created, r.driver, r.parent)
+                    for r in inventory.of_type(t)
+                ]
+                for t in RESOURCE_TYPES
+            },
+        }
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(data)
+    temporary.replace(path)
+
+
+def read_cache(path: Path) -> dict[str, Any] | None:
+    """Return the content of a cache file, or ``None`` if it is missing, unreadable or of another format."""
+    try:
+        data = marshal.loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        logger.warning("Ignoring the unreadable inventory cache %s: %s", path, e)
+        return None
+    if not isinstance(data, dict) or data.get("format") != CACHE_FORMAT:
+        return None
+    return data
+
+
+class CachedInventoryProvider(InventoryProvider):
+    """Start from the inventory an earlier process left on disk instead of listing the daemon again.
+
+    Loading the cache costs one ``/info`` call, to check the daemon is the same one, and one ``/events``
+    call replaying what changed since the cache was written. The resources those events are about are
+    fetched one by one and applied to the cached inventory, as :class:`EventInventoryProvider` does. The
+    daemon is listed instead when the cache is missing, older than ``cache_ttl`` seconds or written for
+    another daemon, when the replay may have lost events because the daemon only keeps the last
+    :data:`DAEMON_EVENT_BUFFER`, or when the containers and images of the updated inventory do not add up to
+    the counts ``/info`` reports.
+
+    Call :meth:`save` after a run so the next process starts from the inventory it left, without the
+    resources it removed. A run that streamed the listing because the cache was cold hands what it listed
+    over with :meth:`adopt`; a run that did not list everything leaves nothing to save.
+    """
+
+    def __init__(
+        self,
+        client: "DockerClient",
+        path: Path,
+        cache_ttl: float = DEFAULT_CACHE_TTL,
+        ttl: float = DEFAULT_INVENTORY_TTL,
+    ) -> None:
+        """Keep the snapshots of ``client`` in the file at ``path``.
+
+        Args:
+            client: Client of the host to list.
+            path: File the snapshot is saved to between commands.
+            cache_ttl: Seconds a saved snapshot may be reused for.
+            ttl: Seconds a snapshot may be reused for within one command.
+        """
+        super().__init__(client, ttl)
+        self.path = path
+        self.cache_ttl = cache_ttl
+        # Whether the current snapshot was loaded from the cache rather than listed
+        self.loaded = False
+        self._state: DaemonState | None = None
+        self._use_cache = True
+
+    def get(self, sizes: bool = False) -> Inventory:
+        """Return a snapshot no older than ``ttl`` seconds, loaded from the cache the first time if possible."""
+        with self._lock:
+            if self._snapshot is None or not self._snapshot.usable(self.ttl, sizes):
+                self._snapshot = self._load_or_fetch(sizes)
+            return self._snapshot
+
+    def current(self, sizes: bool = False) -> Inventory | None:
+        """Return the snapshot while it is fresh; the first call loads it from the cache if it is usable.
+
+        A cold or unusable cache gives ``None`` rather than a full listing, so the caller streams the listing
+        and starts removing right away. Failures are logged and give ``None`` too; the caller then reports them.
+        """
+        with self._lock:
+            if self._snapshot is None and self._state is None and self._use_cache:
+                try:
+                    self._snapshot = self._load(sizes)
+                    if self._snapshot is None:
+                        # Read before the caller streams the listing, which :meth:`adopt` may then keep
+                        self._state = DaemonState.read(self.client)
+                except DockerCommandError as e:
+                    logger.warning("Cannot load the inventory cache of %s: %s", self.client.base_url, e)
+                self.loaded = self._snapshot is not None
+        return super().current(sizes)
+
+    def adopt(self, inventory: Inventory) -> None:
+        """Keep an inventory a run streamed after :meth:`current` found the cache cold, so :meth:`save` writes it."""
+        with self._lock:
+            if self._snapshot is None and self._state is not None:
+                self._snapshot = inventory
+
+    def invalidate(self) -> None:
+        """Force the next call to :meth:`get` to re-list the daemon, without looking at the cache."""
+        with self._lock:
+            self._snapshot = None
+            self._use_cache = False
+
+    def save(self) -> None:
+        """Write the current snapshot to the cache for the next process; failures are logged, never raised.
+
+        Without a snapshot, e.g. after a run that stopped before listing everything, nothing is written: listing
+        the daemon only to fill the cache would cost what the cache saves.
+        """
+        with self._lock:
+            snapshot, state = self._snapshot, self._state
+        if snapshot is None or state is None:
+            return
+        try:
+            with profiling.span("cache.save"):
+                save_inventory(self.path, snapshot, self.client.base_url, state)
+        except OSError as e:
+            logger.warning("Could not write the inventory cache %s: %s", self.path, e)
+
+    def _load_or_fetch(self, sizes: bool) -> Inventory:
+        inventory = self._load(sizes) if self._use_cache else None
+        self.loaded = inventory is not None
+        if inventory is None:
+            # Read before listing, so what changes during the listing is replayed by the next process
+            state = DaemonState.read(self.client)
+            inventory = Inventory.fetch(self.client, sizes)
+            self._state = state
+        return inventory
+
+    def _load(self, sizes: bool) -> Inventory | None:
+        """Load the cached inventory and bring it up to date, or return ``None`` if it cannot be used."""
+        with profiling.span("cache.load"):
+            data = read_cache(self.path)
+            if data is None or data["base_url"] != self.client.base_url or (sizes and not data["sized"]):
+                return None
+            if time.time() - data["saved_at"] >= self.cache_ttl:
+                return None
+            try:
+                state = DaemonState.read(self.client)
+                # Another daemon's events say nothing of the cached resources
+                changes = self._changes(data["cursor"], state.cursor) if state.daemon_id == data["daemon_id"] else None
+                if changes is None:
+                    return None
+                sized = data["sized"]
+                rows = data["resources"]
+                inventory = Inventory((Resource(t, *row) for t in RESOURCE_TYPES for row in rows[t]), sized=sized)
+                for (resource_type, key), action in changes.items():
+                    if action in REMOVAL_ACTIONS:
+                        resource = None
+                    else:
+                        resource = fetch_resource(self.client, resource_type, key, sized)
+                    if resource is None:
+                        inventory.discard(Resource(resource_type, key))
+                    else:
+                        inventory.add(resource)
+                # Events the replay missed, e.g. those of a restarted daemon, show up in the counts. Images
+                # left by the legacy builder are counted but not listed, so such hosts are always re-listed.
+                if (len(inventory.of_type("containers")), len(inventory.of_type("images"))) != state.counters:
+                    return None
+            except DockerAPIError as e:
+                logger.warning("Cannot bring the inventory cache of %s up to date: %s", self.client.base_url, e)
+                return None
+            self._state = state
+            return inventory
+
+    def _changes(self, since: float, until: float) -> dict[tuple[str, str], str] | None:
+        """Return the last event action of every resource changed between two daemon times.
+
+        Every event is replayed, not only those about resources, since the daemon's buffer holds events of all
+        types. Returns ``None`` when the replay fills the buffer, as older changes may then be lost.
+        """
+        changes: dict[tuple[str, str], str] = {}
+        replayed = 0
+        with self.client.events(None, since, until) as stream:
+            for event in stream:
+                replayed += 1
+                resource_type = EVENT_TYPES.get(event.get("Type"))
+                key = (event.get("Actor") or {}).get("ID")
+                if resource_type is not None and key and event.get("Action") in EVENT_ACTIONS:
+                    changes.pop((resource_type, key), None)
+                    changes[resource_type, key] = event.get("Action")
+        if replayed >= DAEMON_EVENT_BUFFER:
+            return None
+        return changes
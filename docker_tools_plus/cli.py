@@ -1,39 +1,286 @@
 import datetime
+import functools
 import logging
-import subprocess
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import click
-from rich.align import Align
-from rich.console import Console, Group
-from rich.panel import Panel
 
 from . import __version__
-from .database import CleanupSchema, _manager, create_cleanup, delete_cleanup, get_cleanup_by_name, list_cleanups
-from .exceptions import DatabaseError, DockerToolsError, InvalidRegularExpressionError
-from .settings import settings
+from .exceptions import DatabaseError, DockerToolsError, InvalidPlanError, InvalidRegularExpressionError
 
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from .database import CleanupSchema, ScheduleSchema
+    from .docker_client import DockerClient
+    from .engine import CleanupResult
+    from .exceptions import DockerCommandError
+    from .explain import Explanation
+    from .fleet import HostResult
+    from .inventory import InventoryProvider, Resource
+    from .output import RecordStream
+    from .plan import CleanupPlan
+    from .profiling import Profiler
+
+# Database, settings, the Docker engine and rich are imported inside the commands that use them,
+# so `--help` and shell completion don't pay for pydantic, SQLite or configuration loading.
 logger = logging.getLogger(__name__)
 
 
 @click.group()
-def cli() -> None:
+@click.option("--profile", is_flag=True, help="Print how long each phase of the command took")
+@click.option(
+    "--profile-export",
+    metavar="FILE|URL",
+    help="Append the timing spans to FILE, or send them to an OTLP/HTTP collector URL (e.g. .../v1/traces)",
+)
+@click.option(
+    "--profile-format",
+    type=click.Choice(["jsonl", "otlp"]),
+    default="jsonl",
+    show_default=True,
+    help="JSON lines, one record per span, or an OTLP/JSON trace export request",
+)
+@click.option(
+    "--output",
+    "output_format",
+    type=click.Choice(["text", "json", "ndjson"]),
+    default="text",
+    show_default=True,
+    help="Print list, clean and delete results as text, a JSON array or JSON lines, record by record",
+)
+@click.pass_context
+def cli(ctx: click.Context, profile: bool, profile_export: str | None, profile_format: str, output_format: str) -> None:
     """Docker cleanup management tool."""
+    if output_format != "text":
+        from .output import RecordStream
+
+        ctx.obj = RecordStream(output_format)
+        ctx.call_on_close(ctx.obj.close)
+    if not (profile or profile_export):
+        return
+    if profile_export and profile_export.startswith(("http://", "https://")) and profile_format != "otlp":
+        raise click.UsageError("Use --profile-format otlp to send a profile to a collector.")
+
+    from . import profiling
+
+    profiler = profiling.start()
+    # Registered before the root span, so it runs after the span is closed
+    ctx.call_on_close(lambda: _finish_profile(profile, profile_export, profile_format))
+    ctx.with_resource(profiler.span(f"cli.{ctx.invoked_subcommand}"))
+
+
+def _finish_profile(show: bool, export: str | None, export_format: str) -> None:
+    """Stop profiling, then print the breakdown and export the spans."""
+    from . import profiling
+
+    profiler = profiling.stop()
+    if profiler is None:
+        return
+    if show:
+        _print_profile(profiler)
+    if export:
+        try:
+            profiler.export(export, export_format)
+        except DockerToolsError as e:
+            logger.error(str(e))
+            click.secho(f"Error: {e}", fg="red", err=True)
+
+
+def _records() -> "RecordStream | None":
+    """Return where to write records with --output json or ndjson, or None when printing text."""
+    from .output import RecordStream
+
+    return click.get_current_context().find_object(RecordStream)
+
+
+def _fail(message: str) -> None:
+    """Show why a command failed, as an ``error`` record with --output json or ndjson."""
+    records = _records()
+    if records is not None:
+        records.emit("error", message=message)
+    else:
+        click.secho(message, fg="red")
+
+
+def _report_error(error: DockerToolsError) -> None:
+    """Log an error and show it."""
+    logger.error(str(error))
+    _fail(str(error) if _records() is not None else f"Error: {error}")
+
+
+def _note(message: str, **style: str) -> None:
+    """Show a message meant for people; with --output json or ndjson it goes to stderr, out of the records."""
+    click.secho(message, err=_records() is not None, **style)
+
+
+def _confirm(text: str, default: bool) -> bool:
+    """Ask for confirmation, on stderr with --output json or ndjson so stdout only holds records."""
+    return click.confirm(text, default=default, err=_records() is not None)
+
+
+def _print_profile(profiler: "Profiler") -> None:
+    """Print where the time went, costliest span first, on stderr."""
+    from rich.console import Console
+    from rich.table import Table
+
+    root = profiler.root
+    wall = root.duration if root is not None else 0.0
+    table = Table(title="Profile", caption=f"{wall:.3f}s in total")
+    table.add_column("Span")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Mean", justify="right")
+    table.add_column("Max", justify="right")
+    table.add_column("% of run", justify="right")
+    for name, calls, total, longest in profiler.breakdown():
+        share = f"{total / wall:.0%}" if wall else "-"
+        table.add_row(name, str(calls), f"{total:.4f}s", f"{total / calls:.4f}s", f"{longest:.4f}s", share)
+    Console(stderr=True).print(table)
+
+
+def _size_option(_ctx: click.Context, param: click.Parameter, value: str | None) -> int | None:
+    """Parse a size option such as ``--free-at-least 20GB`` into bytes."""
+    from .filters import parse_size
+
+    if value is None:
+        return None
+    try:
+        return parse_size(value)
+    except DockerToolsError as e:
+        raise click.BadParameter(str(e), param=param) from e
 
 
 @cli.command()
-@click.argument("name")
+@click.argument("names", nargs=-1)
+@click.option("--all", "all_cleanups", is_flag=True, help="Run every saved cleanup")
 @click.option("--force", is_flag=True, help="Skip confirmation prompts")
-def clean(name, force) -> None:
-    """Execute cleanup by name.
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of resources removed concurrently  [default: the 'jobs' setting, 8]",
+)
+@click.option(
+    "--host",
+    "hosts",
+    multiple=True,
+    metavar="URL",
+    help="Docker daemon to clean, unix:// or tcp://; repeat to clean several concurrently  "
+    "[default: the 'hosts' setting, else 'docker_host']",
+)
+@click.option("--dry-run", is_flag=True, help="Show what would be removed, in removal order, without removing it")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["table", "json"]),
+    default="table",
+    show_default=True,
+    help="How --dry-run prints the plan",
+)
+@click.option(
+    "--plan-file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="With --dry-run, save the plan to this file; otherwise remove what a saved plan lists",
+)
+@click.option(
+    "--free-at-least",
+    metavar="SIZE",
+    callback=_size_option,
+    help="Only remove the largest matches, until they add up to SIZE, e.g. 20GB",
+)
+@click.option("--no-cache", is_flag=True, help="List the Docker host instead of using the inventory cached on disk")
+@click.option(
+    "--cache-ttl",
+    type=click.FloatRange(min=0),
+    metavar="SECONDS",
+    help="Only use an inventory cached on disk less than SECONDS ago  [default: the 'inventory_cache_ttl' "
+    "setting, 300]",
+)
+@click.option(
+    "--rate-limit",
+    type=click.FloatRange(min=0, min_open=True),
+    metavar="N",
+    help="Send at most N removal requests per second to each Docker host  [default: the 'removal_rate_limit' "
+    "setting, unlimited]",
+)
+@click.option(
+    "--explain",
+    is_flag=True,
+    help="Show what each cleanup selects per resource type, how long its pattern takes and why it may be slow, "
+    "without removing anything",
+)
+def clean(  # noqa: PLR0912, PLR0913, PLR0917
+    names: tuple[str, ...],
+    all_cleanups: bool,
+    force: bool,
+    jobs: int | None,
+    hosts: tuple[str, ...],
+    dry_run: bool,
+    output_format: str,
+    plan_file: Path | None,
+    free_at_least: int | None,
+    no_cache: bool,
+    cache_ttl: float | None,
+    rate_limit: float | None,
+    explain: bool,
+) -> None:
+    """Execute cleanups by name.
 
-    If no exact match is found, you'll be prompted to create a new configuration.
+    With a single name, if no exact match is found, you'll be prompted to create a new configuration.
+    With several names or --all, the selected cleanups are run together and each resource is removed once.
+    With --plan-file and no --dry-run, the resources listed in a plan saved earlier are removed instead.
+    With several hosts, the cleanups run against every daemon concurrently and a summary per host is printed.
+    With --free-at-least, matches are removed largest first and the run stops once enough space is freed.
+    With --output json or ndjson, names must match exactly and every removal is printed as a record as it happens.
+    Against a single host, the inventory is cached on disk and checked against the daemon's events, so the
+    next run does not list everything again.
+    With --explain, nothing is removed: the matches of each cleanup are counted and its pattern is timed.
     """
+    if explain and plan_file is not None:
+        raise click.UsageError(
+            "--explain evaluates cleanups against the Docker host; do not combine it with --plan-file."
+        )
+    if plan_file is not None and not dry_run:
+        if names or all_cleanups or free_at_least:
+            raise click.UsageError(
+                "--plan-file runs a saved plan; do not combine it with cleanup names, --all or --free-at-least."
+            )
+        _run_plan_file(plan_file, force, jobs, _single_host(hosts), rate_limit)
+        return
+    if all_cleanups == bool(names):
+        raise click.UsageError("Provide one or more cleanup names, or --all.")
+
+    from .database import create_cleanup, get_cleanup_by_name
+
+    cache_ttl = 0.0 if no_cache else cache_ttl
+
+    def run(selected: list["CleanupSchema"]) -> None:
+        if explain:
+            _explain_cleanups(selected, _single_host(hosts), cache_ttl)
+        elif dry_run:
+            _plan_cleanup(selected, output_format, plan_file, _single_host(hosts), free_at_least, cache_ttl)
+        elif free_at_least is not None:
+            _free_space(selected, free_at_least, force, jobs, _single_host(hosts), cache_ttl, rate_limit)
+        else:
+            _execute_cleanup(selected, force, jobs, hosts, cache_ttl, rate_limit)
+
     try:
+        if all_cleanups or len(names) > 1 or _records() is not None:
+            cleanups = _select_cleanups(names, all_cleanups)
+            if cleanups:
+                run(cleanups)
+            return
+
+        name = names[0]
         cleanups: list[CleanupSchema] = get_cleanup_by_name(name)
 
         if not cleanups:
             click.echo(f"No cleanup found matching '{name}'")
+            if dry_run or explain:
+                return
             regex = click.prompt("Please enter a regular expression for the cleanup")
             try:
                 cleanup = create_cleanup(name, regex)
@@ -50,54 +297,716 @@ def clean(name, force) -> None:
         else:
             cleanup = cleanups[0]
 
-        _execute_cleanup(cleanup, force)
+        run([cleanup])
     except DockerToolsError as e:
-        logger.error(str(e))
-        click.secho(f"Error: {e}", fg="red")
+        _report_error(e)
 
 
-def _execute_cleanup(cleanup: CleanupSchema, force: bool) -> None:
-    """Run docker cleanup commands based on the selected configuration."""
-    commands = {
-        "containers": f"docker ps -a | grep -E '{cleanup.regular_expression}' | awk '{{print $1}}' | xargs docker rm",
-        "volumes": f"docker volume ls | grep -E '{cleanup.regular_expression}' | awk '{{print $2}}' | xargs docker volume rm",
-        "images": f"docker image ls | grep -E '{cleanup.regular_expression}' | awk '{{print $3}}' | xargs docker image rm",
-    }
+def _select_cleanups(names: tuple[str, ...], all_cleanups: bool) -> list["CleanupSchema"]:
+    """Resolve the cleanups for a batch run; names must match exactly."""
+    from .database import get_cleanups_by_names, list_cleanups
+
+    if all_cleanups:
+        cleanups = list_cleanups()
+        if not cleanups:
+            _note("No cleanups found")
+        return cleanups
+
+    cleanups = get_cleanups_by_names(list(names))
+    missing = sorted(set(names) - {c.name for c in cleanups})
+    if missing:
+        _fail(f"No cleanup named: {', '.join(missing)}")
+        return []
+    return cleanups
+
+
+def _docker_hosts(hosts: tuple[str, ...]) -> list[str]:
+    """Return the daemons to run against: --host options, else the 'hosts' setting, else 'docker_host'."""
+    from .settings import settings
+
+    return list(dict.fromkeys(hosts or settings.hosts)) or [settings.docker_host]
+
+
+def _single_host(hosts: tuple[str, ...]) -> str:
+    """Return the one daemon a plan is made for or executed against."""
+    targets = _docker_hosts(hosts)
+    if len(targets) > 1:
+        raise click.UsageError(
+            "--dry-run, --explain and --plan-file work against one Docker host at a time; pass one --host."
+        )
+    return targets[0]
+
+
+def _inventory_provider(client: "DockerClient", cache_ttl: float | None) -> "InventoryProvider":
+    """Return the inventory provider of a run: cached on disk unless the cache TTL, or the setting, is 0."""
+    from .settings import Settings, settings
+
+    cache_ttl = settings.inventory_cache_ttl if cache_ttl is None else cache_ttl
+    if not cache_ttl:
+        from .inventory import InventoryProvider
+
+        return InventoryProvider(client, ttl=settings.inventory_ttl)
+
+    from .cache import CachedInventoryProvider, cache_path
+
+    folder = settings.inventory_cache_dir or Settings.get_configuration_folder()
+    path = cache_path(folder, client.base_url)
+    return CachedInventoryProvider(client, path, cache_ttl=cache_ttl, ttl=settings.inventory_ttl)
+
+
+def _execute_cleanup(  # noqa: PLR0913, PLR0917
+    cleanups: list["CleanupSchema"],
+    force: bool,
+    jobs: int | None = None,
+    hosts: tuple[str, ...] = (),
+    cache_ttl: float | None = None,
+    rate_limit: float | None = None,
+) -> None:
+    """Remove the containers, volumes and images matching the selected configurations."""
+    from . import profiling
+    from .docker_client import DockerClient
+    from .engine import RESOURCE_TYPES, CleanupEngine
+    from .settings import settings
+
+    targets = _docker_hosts(hosts)
+    if len(cleanups) == 1:
+        target = f"using pattern '{cleanups[0].regular_expression}'"
+    else:
+        target = f"matching {len(cleanups)} cleanups ({', '.join(c.name for c in cleanups)})"
+    with profiling.span("clean.confirm"):
+        resource_types = [
+            resource for resource in RESOURCE_TYPES if force or _confirm(f"Clean {resource} {target}?", default=True)
+        ]
+    if not resource_types:
+        return
+
+    records = _records()
+    if len(targets) > 1:
+        from .fleet import run_fleet
+
+        host_results = run_fleet(
+            targets,
+            cleanups,
+            resource_types,
+            jobs=jobs or settings.jobs,
+            batch_size=settings.batch_size,
+            timeout=settings.default_timeout,
+            on_removal=records.removal if records is not None else None,
+            rate_limit=rate_limit or settings.removal_rate_limit,
+            deadline=settings.host_deadline,
+        )
+        _record_runs(cleanups, {outcome.host: outcome.results for outcome in host_results})
+        _report_hosts(host_results)
+        return
+
+    with DockerClient(targets[0], timeout=settings.default_timeout) as client:
+        inventory = _inventory_provider(client, cache_ttl)
+        engine = CleanupEngine(
+            client,
+            inventory,
+            on_removal=_removal_listener(targets[0]),
+            rate_limit=rate_limit or settings.removal_rate_limit,
+        )
+        results = engine.clean_many(
+            cleanups, resource_types, jobs=jobs or settings.jobs, batch_size=settings.batch_size
+        )
+        inventory.save()
+    _record_runs(cleanups, {targets[0]: results})
+    _report_results(results, targets[0])
 
-    for resource, cmd in commands.items():
-        if force or click.confirm(f"Clean {resource} using pattern '{cleanup.regular_expression}'?", default=True):
-            try:
-                subprocess.run(cmd, shell=True, check=True)
-                click.echo(f"Successfully cleaned {resource}")
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Error cleaning {resource}: {e}")
-                click.secho(f"Failed to clean {resource}.", fg="red")
+
+def _removal_listener(host: str) -> "Callable[[Resource, DockerCommandError | None], None] | None":
+    """Return what prints each removal as a record with --output json or ndjson; nothing is printed for text."""
+    records = _records()
+    return functools.partial(records.removal, host) if records is not None else None
+
+
+def _record_runs(cleanups: list["CleanupSchema"], results_by_host: dict[str, dict[str, "CleanupResult"]]) -> None:
+    """Store the outcome of a run for `stats`. A failure to record is logged but never fails the run."""
+    from .stats import save_run
+
+    try:
+        save_run(cleanups, results_by_host)
+    except DockerToolsError as e:
+        logger.warning("Could not record run statistics: %s", e)
+
+
+def _plan_cleanup(  # noqa: PLR0913, PLR0917
+    cleanups: list["CleanupSchema"],
+    output_format: str,
+    plan_file: Path | None,
+    host: str,
+    free_at_least: int | None = None,
+    cache_ttl: float | None = None,
+) -> None:
+    """Print, and optionally save, the plan for removing what the cleanups match."""
+    from .docker_client import DockerClient
+    from .engine import CleanupEngine
+    from .settings import settings
+
+    with DockerClient(host, timeout=settings.default_timeout) as client:
+        inventory = _inventory_provider(client, cache_ttl)
+        plan = CleanupEngine(client, inventory).plan(cleanups, free_at_least=free_at_least)
+        inventory.save()
+
+    records = _records()
+    if records is not None:
+        records.plan(plan)
+    elif output_format == "json":
+        click.echo(plan.to_json())
+    else:
+        _print_plan(plan)
+    if plan_file is not None:
+        plan.save(plan_file)
+        click.echo(f"Plan saved to {plan_file}", err=output_format == "json" or records is not None)
+
+
+def _free_space(  # noqa: PLR0913, PLR0917
+    cleanups: list["CleanupSchema"],
+    target: int,
+    force: bool,
+    jobs: int | None,
+    host: str,
+    cache_ttl: float | None = None,
+    rate_limit: float | None = None,
+) -> None:
+    """Remove the largest matches of the cleanups until ``target`` bytes are freed."""
+    from .docker_client import DockerClient
+    from .engine import CleanupEngine
+    from .plan import format_size
+    from .settings import settings
+
+    try:
+        with DockerClient(host, timeout=settings.default_timeout) as client:
+            inventory = _inventory_provider(client, cache_ttl)
+            engine = CleanupEngine(
+                client,
+                inventory,
+                on_removal=_removal_listener(host),
+                rate_limit=rate_limit or settings.removal_rate_limit,
+            )
+            plan = engine.plan(cleanups, free_at_least=target)
+            if not plan.resources:
+                _note("Nothing to remove")
+                return
+            if plan.total_size < target:
+                _note(
+                    f"The matches only add up to {format_size(plan.total_size)} of {format_size(target)}.",
+                    fg="yellow",
+                )
+            if not force and not _confirm(
+                f"Remove the {len(plan)} largest match(es) ({format_size(plan.total_size)})?", default=True
+            ):
+                return
+            results = engine.execute(plan, jobs=jobs or settings.jobs, batch_size=settings.batch_size)
+            inventory.save()
+    except DockerToolsError as e:
+        _report_error(e)
+        return
+    _record_runs(cleanups, {host: results})
+    _report_results(results, host)
+    freed = sum(result.reclaimed for result in results.values())
+    _note(f"Freed {format_size(freed)} of {format_size(target)}", fg="green" if freed >= target else "yellow")
+
+
+def _print_plan(plan: "CleanupPlan") -> None:
+    """Render a plan as a rich table, one row per resource in removal order."""
+    from rich.console import Console
+    from rich.table import Table
+
+    from .plan import format_size
+
+    if not plan.resources:
+        click.echo("Nothing to remove")
+        return
+    table = Table(
+        title=f"Cleanup plan: {', '.join(c.name for c in plan.cleanups)}",
+        caption=f"{len(plan)} resource(s), {format_size(plan.total_size)} reclaimable",
+    )
+    table.add_column("Phase", justify="right")
+    table.add_column("Type")
+    table.add_column("Name")
+    table.add_column("ID")
+    table.add_column("Size", justify="right")
+    for resource in plan.resources:
+        short_id = resource.id.removeprefix("sha256:")[:12]
+        size = format_size(resource.size) if resource.size else "-"
+        table.add_row(str(resource.phase + 1), resource.kind, resource.name, short_id, size)
+    Console().print(table)
+
+
+def _explain_cleanups(cleanups: list["CleanupSchema"], host: str, cache_ttl: float | None = None) -> None:
+    """Print what each cleanup selects on a host and what its pattern costs, without removing anything."""
+    from .docker_client import DockerClient
+    from .explain import explain
+    from .settings import settings
+
+    with DockerClient(host, timeout=settings.default_timeout) as client:
+        inventory = _inventory_provider(client, cache_ttl)
+        snapshot = inventory.get()
+        explanations = [explain(cleanup, snapshot) for cleanup in cleanups]
+        inventory.save()
+
+    records = _records()
+    for explanation in explanations:
+        if records is not None:
+            records.emit("explain", host=host, **explanation.to_dict())
+        else:
+            _print_explanation(explanation, f"{explanation.cleanup.name}: {_describe(explanation.cleanup)}")
+
+
+def _print_explanation(explanation: "Explanation", title: str) -> None:
+    """Print the matches per resource type, the timings and the warnings of an explanation."""
+    from .plan import format_size
+
+    click.secho(title, bold=True)
+    if explanation.cleanup.regular_expression:
+        click.echo(
+            f"  Compiled in {explanation.compile_seconds * 1000:.2f} ms, "
+            f"searched {explanation.searched:,} value(s) in {explanation.match_seconds * 1000:.2f} ms"
+        )
+    for matches in explanation.types:
+        line = f"  {matches.resource_type}: {matches.matched:,} of {matches.total:,} selected"
+        if matches.size:
+            line += f" ({format_size(matches.size)})"
+        if matches.samples:
+            more = ", ..." if matches.matched > len(matches.samples) else ""
+            line += f", e.g. {', '.join(matches.samples)}{more}"
+        click.echo(line)
+    for warning in explanation.warnings:
+        click.secho(f"  Warning: {warning}", fg="yellow")
+
+
+def _run_plan_file(plan_file: Path, force: bool, jobs: int | None, host: str, rate_limit: float | None = None) -> None:
+    """Remove the resources listed in a saved plan."""
+    from .docker_client import DockerClient
+    from .engine import CleanupEngine
+    from .plan import CleanupPlan, format_size
+    from .settings import settings
+
+    try:
+        plan = CleanupPlan.load(plan_file)
+        if plan.docker_host and plan.docker_host != host:
+            raise InvalidPlanError(f"The plan was made for {plan.docker_host}, but the Docker host is {host}.")
+        if not plan.resources:
+            _note("Nothing to remove")
+            return
+        if not force and not _confirm(
+            f"Remove {len(plan)} resource(s) ({format_size(plan.total_size)}) listed in {plan_file}?", default=True
+        ):
+            return
+        with DockerClient(host, timeout=settings.default_timeout) as client:
+            engine = CleanupEngine(
+                client, on_removal=_removal_listener(host), rate_limit=rate_limit or settings.removal_rate_limit
+            )
+            results = engine.execute(plan, jobs=jobs or settings.jobs, batch_size=settings.batch_size)
+    except DockerToolsError as e:
+        _report_error(e)
+        return
+    _record_runs(plan.cleanups, {host: results})
+    _report_results(results, host)
+
+
+def _report_results(results: dict[str, "CleanupResult"], host: str) -> None:
+    """Print the outcome of each resource type and every resource that could not be removed.
+
+    With --output json or ndjson, a ``result`` record is printed per resource type instead; each failed
+    resource already had its own record.
+    """
+    records = _records()
+    if records is not None:
+        for result in results.values():
+            if result.error is not None:
+                logger.error("Error cleaning %s: %s", result.resource_type, result.error)
+        records.results(host, results)
+        return
+    for resource, result in results.items():
+        if result.error is not None:
+            logger.error("Error cleaning %s: %s", resource, result.error)
+            click.secho(f"Failed to clean {resource}.", fg="red")
+        elif result.failures:
+            click.secho(
+                f"Cleaned {resource} with errors ({len(result.removed)} removed, {len(result.failures)} failed)",
+                fg="yellow",
+            )
+        else:
+            click.echo(
+                f"Successfully cleaned {resource} ({len(result.removed)} removed, "
+                f"{_reclaimed(result.reclaimed, result.sized)})"
+            )
+
+    failures = [failure for result in results.values() for failure in result.failures]
+    if failures:
+        click.secho(f"{len(failures)} resource(s) could not be removed:", fg="red")
+        for resource, error in failures:
+            logger.error("Error removing %s %s: %s", resource.kind, resource.name, error)
+            click.secho(f"  {resource.kind} {resource.name}: {error}", fg="red")
+
+
+def _reclaimed(reclaimed: int, sized: bool) -> str:
+    """Describe the space reclaimed, without passing off containers and volumes of unknown size as 0 bytes."""
+    from .plan import format_size
+
+    if sized:
+        return f"{format_size(reclaimed)} reclaimed"
+    if not reclaimed:
+        return "space reclaimed unknown"
+    return f"at least {format_size(reclaimed)} reclaimed"
+
+
+def _report_hosts(host_results: list["HostResult"]) -> None:
+    """Print one summary line per host, followed by the resources each host could not remove."""
+    records = _records()
+    if records is not None:
+        for outcome in host_results:
+            if outcome.error is not None:
+                logger.error("Error cleaning %s: %s", outcome.host, outcome.error)
+                records.emit("error", host=outcome.host, message=str(outcome.error))
+            records.results(outcome.host, outcome.results)
+        return
+    succeeded = sum(1 for outcome in host_results if outcome.ok)
+    click.echo(f"Cleaned {len(host_results)} host(s): {succeeded} succeeded, {len(host_results) - succeeded} failed")
+    for outcome in host_results:
+        summary = (
+            f"{outcome.removed} removed, {outcome.failed} failed, {_reclaimed(outcome.reclaimed, outcome.sized)} "
+            f"in {outcome.duration:.1f}s"
+        )
+        error = outcome.first_error
+        if error is not None:
+            logger.error("Error cleaning %s: %s", outcome.host, error)
+            click.secho(f"  {outcome.host}: Error: {error} ({summary})", fg="red")
+        elif outcome.failed:
+            click.secho(f"  {outcome.host}: {summary}", fg="yellow")
+            for resource, failure in (f for result in outcome.results.values() for f in result.failures):
+                click.secho(f"    {resource.kind} {resource.name}: {failure}", fg="yellow")
+        else:
+            click.secho(f"  {outcome.host}: {summary}", fg="green")
+
+
+@cli.command()
+@click.option("--days", type=click.IntRange(min=1), default=30, show_default=True, help="Only runs of the last N days")
+@click.option("--cleanup", "cleanup_name", metavar="NAME", help="Only runs of this cleanup")
+@click.option(
+    "--top", type=click.IntRange(min=1), default=10, show_default=True, help="Number of cleanups shown, costliest first"
+)
+def stats(days: int, cleanup_name: str | None, top: int) -> None:
+    """Summarize recorded clean runs: duration percentiles, trends and the most expensive cleanups."""
+    from rich.console import Console
+    from rich.table import Table
+
+    from .database import list_runs
+    from .plan import format_size
+    from .stats import cleanup_stats, summarize_runs
+
+    since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+    try:
+        summaries = summarize_runs(list_runs(since=since.timestamp(), cleanup_name=cleanup_name))
+    except DockerToolsError as e:
+        _report_error(e)
+        return
+    if not summaries:
+        click.echo(f"No runs recorded in the last {days} day(s)")
+        return
+
+    per_cleanup = cleanup_stats(summaries)
+    table = Table(
+        title=f"Clean runs in the last {days} day(s)",
+        caption=(
+            f"{len(summaries)} run(s), {sum(s.deleted for s in summaries)} removed, "
+            f"{sum(s.failed for s in summaries)} failed, {format_size(sum(s.reclaimed for s in summaries))} reclaimed"
+        ),
+    )
+    table.add_column("Cleanup")
+    table.add_column("Runs", justify="right")
+    table.add_column("p50", justify="right")
+    table.add_column("p95", justify="right")
+    table.add_column("Trend", justify="right")
+    table.add_column("Total time", justify="right")
+    table.add_column("Removed", justify="right")
+    table.add_column("Failed", justify="right")
+    table.add_column("Reclaimed", justify="right")
+    for row in per_cleanup[:top]:
+        trend = "-" if row.trend is None else f"{row.trend:+.0%}"
+        table.add_row(
+            row.cleanup_name,
+            str(row.runs),
+            f"{row.p50:.2f}s",
+            f"{row.p95:.2f}s",
+            trend,
+            f"{row.total_duration:.1f}s",
+            str(row.deleted),
+            str(row.failed),
+            format_size(row.reclaimed),
+        )
+    Console().print(table)
+
+
+@cli.command()
+@click.option(
+    "--size",
+    "-n",
+    "sizes",
+    type=click.IntRange(min=1),
+    multiple=True,
+    help="Containers, volumes and images each on the fake daemon; repeatable  [default: 1000, 10000, 100000]",
+)
+@click.option(
+    "--patterns",
+    "-p",
+    "pattern_counts",
+    type=click.IntRange(min=1),
+    multiple=True,
+    help="Number of cleanups run together; repeatable  [default: 1, 10, 100]",
+)
+@click.option(
+    "--match-ratio",
+    type=click.FloatRange(0, 1, min_open=True),
+    default=0.1,
+    show_default=True,
+    help="Share of the resources the cleanups match",
+)
+@click.option(
+    "--latency",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    show_default=True,
+    help="Milliseconds the fake daemon waits before answering each request",
+)
+@click.option("--jobs", "-j", type=click.IntRange(min=1), default=8, show_default=True, help="Concurrent removals")
+@click.option(
+    "--batch-size", type=click.IntRange(min=1), default=100, show_default=True, help="Matches removed per batch"
+)
+@click.option("--format", "output_format", type=click.Choice(["table", "json"]), default="table", show_default=True)
+@click.option(
+    "--report",
+    "report_file",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Also write the JSON report to FILE",
+)
+def bench(  # noqa: PLR0913, PLR0917
+    sizes: tuple[int, ...],
+    pattern_counts: tuple[int, ...],
+    match_ratio: float,
+    latency: float,
+    jobs: int,
+    batch_size: int,
+    output_format: str,
+    report_file: Path | None,
+) -> None:
+    """Measure listing, matching and deletion throughput against a synthetic Docker daemon.
+
+    Nothing is removed from the real Docker host: an in-process fake daemon is filled with synthetic
+    resources for every combination of --size and --patterns.
+    """
+    import json
+
+    from .bench import DEFAULT_PATTERN_COUNTS, DEFAULT_SIZES, bench_report, run_benchmarks
+
+    def progress(size: int, patterns: int) -> None:
+        click.echo(f"Benchmarking {size} resources per type with {patterns} pattern(s)...", err=True)
+
+    try:
+        results = run_benchmarks(
+            sizes or DEFAULT_SIZES,
+            pattern_counts or DEFAULT_PATTERN_COUNTS,
+            match_ratio=match_ratio,
+            latency=latency / 1000,
+            jobs=jobs,
+            batch_size=batch_size,
+            progress=progress,
+        )
+    except DockerToolsError as e:
+        _report_error(e)
+        return
+    report = bench_report(results, match_ratio=match_ratio, latency_ms=latency, jobs=jobs, batch_size=batch_size)
+    if report_file is not None:
+        report_file.write_text(json.dumps(report, indent=2) + "\n")
+    if output_format == "json":
+        click.echo(json.dumps(report, indent=2))
+        return
+
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title=f"docker-tools-plus {report['version']} on Python {report['python']}")
+    for column in ("Size", "Patterns", "Stage", "Items", "Seconds", "Items/s"):
+        table.add_column(column, justify="left" if column == "Stage" else "right")
+    for result in results:
+        table.add_row(
+            str(result.size),
+            str(result.patterns),
+            result.stage,
+            str(result.items),
+            f"{result.seconds:.3f}",
+            f"{result.per_second:,.0f}",
+        )
+    Console().print(table)
 
 
 @cli.command(name="list")
-def list_cleanups() -> None:
+@click.option("--search", "-s", metavar="TEXT", help="Only show cleanups whose name resembles TEXT, best first")
+def list_cleanups(search: str | None) -> None:
     """List all registered cleanups."""
+    from . import profiling
+    from .database import list_cleanups, search_cleanups
+
     try:
-        cleanups = _manager.list_cleanups()
+        cleanups = search_cleanups(search) if search else list_cleanups()
+        records = _records()
+        if records is not None:
+            for cleanup in cleanups:
+                records.emit("cleanup", **cleanup.model_dump(mode="json"))
+            return
         if not cleanups:
             click.echo("No cleanups found")
             return
-        for cleanup in cleanups:
-            click.echo(f"{cleanup.id}: {cleanup.name} - {cleanup.regular_expression}")
+        with profiling.span("list.render", cleanups=len(cleanups)):
+            for cleanup in cleanups:
+                click.echo(f"{cleanup.id}: {cleanup.name} - {_describe(cleanup)}")
     except DockerToolsError as e:
-        logger.error(str(e))
-        click.secho(f"Error: {e}", fg="red")
+        _report_error(e)
+
+
+def _describe(cleanup: "CleanupSchema") -> str:
+    """Summarize what a cleanup selects: its pattern followed by its filters."""
+    from .plan import format_size
+
+    filters = [f"label {spec}" for spec in cleanup.labels]
+    if cleanup.until is not None:
+        filters.append(f"until {cleanup.until}")
+    if cleanup.min_size is not None:
+        filters.append(f"min size {format_size(cleanup.min_size)}")
+    if cleanup.keep_latest is not None:
+        filters.append(f"keep latest {cleanup.keep_latest}")
+    pattern = cleanup.regular_expression
+    if cleanup.match_fields:
+        pattern = f"{pattern} in {', '.join(cleanup.match_fields)}"
+    if not filters:
+        return pattern
+    return f"{pattern or '*'} [{', '.join(filters)}]"
 
 
 @cli.command()
 @click.argument("name")
-def delete(name) -> None:
-    """Delete a cleanup configuration."""
+@click.argument("regex", required=False, default="")
+@click.option(
+    "--label",
+    "labels",
+    multiple=True,
+    metavar="KEY[=VALUE]",
+    help="Only select resources with this label; prefix with ! to select those without it. Repeatable.",
+)
+@click.option(
+    "--until",
+    "--older-than",
+    "until",
+    metavar="DURATION",
+    help="Only select resources created longer ago than DURATION, e.g. 24h",
+)
+@click.option("--min-size", metavar="SIZE", help="Only select resources of at least SIZE, e.g. 500MB")
+@click.option(
+    "--keep-latest",
+    type=click.IntRange(min=1),
+    metavar="N",
+    help="Spare the N most recently created matches of each resource type",
+)
+@click.option(
+    "--field",
+    "match_fields",
+    multiple=True,
+    type=click.Choice(["id", "name", "image", "tag", "label", "driver"]),
+    help="Match REGEX against this field only instead of IDs, names and images together. Repeatable.",
+)
+def create(  # noqa: PLR0913, PLR0917
+    name: str,
+    regex: str,
+    labels: tuple[str, ...],
+    until: str | None,
+    min_size: str | None,
+    keep_latest: int | None,
+    match_fields: tuple[str, ...],
+) -> None:
+    """Save a cleanup configuration.
+
+    REGEX is matched against resource IDs, names and images, or with --field against the given fields:
+    an image reference or just its tag, labels as KEY=VALUE, a volume driver. It can be left out when
+    --label, --until or --min-size is given; cleanups made only of --label and --until are run with
+    Docker's prune endpoints in a single call per resource type.
+    """
+    from .database import create_cleanup
+    from .filters import parse_size
+
     try:
-        cleanups = get_cleanup_by_name(name)
+        size = parse_size(min_size) if min_size is not None else None
+        cleanup = create_cleanup(name, regex, list(labels), until, size, keep_latest, list(match_fields))
+        click.secho(f"Created cleanup {cleanup.id}: {cleanup.name} - {_describe(cleanup)}", fg="green")
+    except DockerToolsError as e:
+        _report_error(e)
+
+
+@cli.command(name="test-pattern")
+@click.argument("regex")
+@click.option(
+    "--field",
+    "match_fields",
+    multiple=True,
+    type=click.Choice(["id", "name", "image", "tag", "label", "driver"]),
+    help="Match REGEX against this field only instead of IDs, names and images together. Repeatable.",
+)
+@click.option(
+    "--samples",
+    type=click.IntRange(min=0),
+    default=5,
+    show_default=True,
+    help="Names of selected resources shown per resource type",
+)
+@click.option("--host", metavar="URL", help="Docker daemon to evaluate against  [default: the 'docker_host' setting]")
+def try_pattern(regex: str, match_fields: tuple[str, ...], samples: int, host: str | None) -> None:
+    """Show what REGEX would select on the Docker host, without saving or removing anything.
+
+    Prints how many resources of each type it matches with a few of their names, how long the pattern
+    takes to compile and to search every resource, and warnings for patterns prone to catastrophic
+    backtracking or broad enough to select most of the host.
+    """
+    from .database import CleanupSchema
+    from .docker_client import DockerClient
+    from .explain import explain
+    from .settings import settings
+
+    try:
+        cleanup = CleanupSchema(name="test-pattern", regular_expression=regex, match_fields=list(match_fields))
+        target = host or settings.docker_host
+        with DockerClient(target, timeout=settings.default_timeout) as client:
+            inventory = _inventory_provider(client, None)
+            explanation = explain(cleanup, inventory.get(), samples=samples)
+            inventory.save()
+    except DockerToolsError as e:
+        _report_error(e)
+        return
+    records = _records()
+    if records is not None:
+        records.emit("explain", host=target, **explanation.to_dict())
+    else:
+        _print_explanation(explanation, f"Pattern {_describe(cleanup)} on {target}")
+
+
+@cli.command()
+@click.argument("name")
+@click.option("--force", is_flag=True, help="Skip the confirmation prompt")
+def delete(name, force: bool) -> None:
+    """Delete a cleanup configuration.
+
+    With --output json or ndjson, NAME must match exactly and a ``deleted`` record is printed.
+    """
+    from . import profiling
+    from .database import delete_cleanup, get_cleanup_by_name, get_cleanups_by_names
+
+    records = _records()
+    try:
+        cleanups = get_cleanups_by_names([name]) if records is not None else get_cleanup_by_name(name)
 
         if not cleanups:
-            click.secho(f"No cleanups found matching '{name}'", fg="red")
+            _fail(f"No cleanups found matching '{name}'")
             return
 
         if len(cleanups) > 1:
@@ -112,17 +1021,290 @@ def delete(name) -> None:
         else:
             selected = cleanups[0]
 
-        if click.confirm(f"Delete cleanup '{selected.name}' (ID: {selected.id})?", default=False):
+        with profiling.span("delete.confirm"):
+            confirmed = force or _confirm(f"Delete cleanup '{selected.name}' (ID: {selected.id})?", default=False)
+        if confirmed:
             delete_cleanup(selected.id)
-            click.secho("Cleanup deleted successfully", fg="green")
+            if records is not None:
+                records.emit("deleted", id=selected.id, name=selected.name)
+            else:
+                click.secho("Cleanup deleted successfully", fg="green")
+    except DockerToolsError as e:
+        _report_error(e)
+
+
+_definitions_format_option = click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["toml", "json", "csv"]),
+    help="Format of the definitions  [default: from the file extension, toml on stdout]",
+)
+
+
+@cli.command(name="import")
+@click.argument("file", type=click.Path(exists=True, dir_okay=False, allow_dash=True, path_type=Path))
+@_definitions_format_option
+def import_cleanups(file: Path, file_format: str | None) -> None:
+    """Create or update cleanups from a TOML, JSON or CSV file of definitions; - reads stdin.
+
+    Every definition, regular expression included, is checked first: if any is invalid nothing is imported.
+    Cleanups are matched by name. Existing ones are updated, identical ones skipped and the others created,
+    all in a single transaction.
+    """
+    from .database import import_cleanups, stored_rows
+    from .transfer import detect_format, parse_definitions, read_definitions
+
+    try:
+        file_format = file_format or detect_format(file)
+        with click.open_file(str(file), encoding="utf-8") as f:
+            text = f.read()
+        cleanups, unchanged = parse_definitions(read_definitions(text, file_format), stored_rows())
+        summary = import_cleanups(cleanups, unchanged)
+    except DockerToolsError as e:
+        _report_error(e)
+        return
+    except (OSError, UnicodeDecodeError) as e:
+        _report_error(DockerToolsError(f"Cannot read {file}: {e}"))
+        return
+    records = _records()
+    if records is not None:
+        records.emit("imported", **summary.model_dump())
+        return
+    click.secho(
+        f"Imported {len(cleanups) + unchanged} cleanup(s): {summary.created} created, {summary.updated} updated, "
+        f"{summary.skipped} skipped",
+        fg="green",
+    )
+
+
+@cli.command(name="export")
+@click.argument("file", required=False, type=click.Path(dir_okay=False, allow_dash=True, path_type=Path))
+@_definitions_format_option
+def export_cleanups(file: Path | None, file_format: str | None) -> None:
+    """Write every cleanup definition to FILE, or to stdout, in a format `import` reads back."""
+    from .database import list_cleanups
+    from .transfer import detect_format, format_definitions
+
+    to_stdout = file is None or str(file) == "-"
+    try:
+        file_format = file_format or ("toml" if to_stdout else detect_format(file))
+        cleanups = list_cleanups()
+        document = format_definitions(cleanups, file_format)
+        if to_stdout:
+            click.echo(document, nl=False)
+            return
+        file.write_text(document, encoding="utf-8")
     except DockerToolsError as e:
-        logger.error(str(e))
-        click.secho(f"Error: {e}", fg="red")
+        _report_error(e)
+        return
+    except OSError as e:
+        _report_error(DockerToolsError(f"Cannot write {file}: {e}"))
+        return
+    click.secho(f"Exported {len(cleanups)} cleanup(s) to {file}", fg="green")
+
+
+def _control_socket(path: Path | None) -> Path:
+    """Return the control socket of `serve`: --socket, else the 'control_socket' setting, else the default."""
+    from .settings import Settings, settings
+
+    return path or settings.control_socket or Settings.get_configuration_folder() / "control.sock"
+
+
+_socket_option = click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Control socket of the server  [default: the 'control_socket' setting, else control.sock in the "
+    "configuration folder]",
+)
+
+
+@cli.command()
+@click.option("--host", metavar="URL", help="Docker daemon to clean  [default: the 'docker_host' setting]")
+@_socket_option
+@click.option(
+    "--max-concurrent",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Cleanups run at the same time  [default: the 'max_concurrent_runs' setting, 2]",
+)
+def serve(host: str | None, socket_path: Path | None, max_concurrent: int | None) -> None:
+    """Run in the background: run scheduled cleanups and accept `trigger` and `status` on a control socket.
+
+    The Docker connection, the resource listing and the database stay open between runs. Stop the server
+    with Ctrl+C or SIGTERM; running cleanups are finished first.
+    """
+    from .server import CleanupServer, run_server
+    from .settings import settings
+
+    try:
+        server = CleanupServer(
+            host or settings.docker_host,
+            _control_socket(socket_path),
+            max_concurrent=max_concurrent or settings.max_concurrent_runs,
+            jobs=settings.jobs,
+            batch_size=settings.batch_size,
+            timeout=settings.default_timeout,
+            inventory_ttl=settings.inventory_ttl,
+            watch_events=settings.watch_events,
+            rate_limit=settings.removal_rate_limit,
+        )
+        run_server(server)
+    except DockerToolsError as e:
+        _report_error(e)
+
+
+@cli.command()
+@click.argument("name", required=False)
+@click.argument("expression", required=False)
+@click.option("--jitter", metavar="DURATION", help="Delay each run by a random time up to DURATION, e.g. 5m")
+@click.option("--remove", is_flag=True, help="Remove the schedule of the cleanup")
+@_socket_option
+def schedule(
+    name: str | None, expression: str | None, jitter: str | None, remove: bool, socket_path: Path | None
+) -> None:
+    """Run a cleanup on a schedule while `serve` is running, or list the schedules.
+
+    EXPRESSION is a five-field cron expression such as '0 3 * * *', a macro such as '@daily', or an
+    interval such as '@every 6h'. A running server picks up the change right away.
+    """
+    from .database import delete_schedule, get_cleanups_by_names, list_schedules, set_schedule
+    from .filters import parse_duration
+
+    try:
+        if name is None:
+            _print_schedules(list_schedules())
+            return
+        if remove == bool(expression):
+            raise click.UsageError("Provide either a schedule EXPRESSION or --remove.")
+        cleanups = get_cleanups_by_names([name])
+        if not cleanups:
+            _fail(f"No cleanup named: {name}")
+            return
+        if remove:
+            if delete_schedule(cleanups[0].id):
+                click.secho(f"Removed the schedule of {name}", fg="green")
+            else:
+                click.echo(f"{name} has no schedule")
+        else:
+            saved = set_schedule(cleanups[0].id, expression, parse_duration(jitter) if jitter else 0.0)
+            click.secho(f"Scheduled {name}: {saved.expression}", fg="green")
+    except DockerToolsError as e:
+        _report_error(e)
+        return
+    _notify_server(socket_path)
+
+
+def _notify_server(socket_path: Path | None) -> None:
+    """Ask a running server to reload its schedules; without a server there is nothing to do."""
+    from .exceptions import ControlSocketError
+    from .server import send_request
+
+    path = _control_socket(socket_path)
+    if not path.exists():
+        return
+    try:
+        send_request(path, {"command": "reload"}, timeout=5)
+    except ControlSocketError as e:
+        logger.debug("Server not notified: %s", e)
+
+
+def _print_schedules(schedules: list["ScheduleSchema"], next_runs: dict[str, float | None] | None = None) -> None:
+    """Render schedules as a rich table, with their next run when a server reported it."""
+    from rich.console import Console
+    from rich.table import Table
+
+    if not schedules:
+        click.echo("No schedules found")
+        return
+    table = Table(title="Schedules")
+    table.add_column("Cleanup")
+    table.add_column("Schedule")
+    table.add_column("Jitter", justify="right")
+    if next_runs is not None:
+        table.add_column("Next run")
+    for item in schedules:
+        row = [item.cleanup_name, item.expression, f"{item.jitter:g}s" if item.jitter else "-"]
+        if next_runs is not None:
+            due = next_runs.get(item.cleanup_name)
+            row.append(datetime.datetime.fromtimestamp(due).strftime("%Y-%m-%d %H:%M:%S") if due else "-")
+        table.add_row(*row)
+    Console().print(table)
+
+
+@cli.command()
+@click.argument("names", nargs=-1, required=True)
+@click.option("--no-wait", is_flag=True, help="Return once the server has started the run")
+@_socket_option
+def trigger(names: tuple[str, ...], no_wait: bool, socket_path: Path | None) -> None:
+    """Ask the running server to run cleanups now, together, using its warm connection and listing."""
+    from .server import send_request
+
+    try:
+        answer = send_request(
+            _control_socket(socket_path), {"command": "run", "names": list(names), "wait": not no_wait}
+        )
+    except DockerToolsError as e:
+        _report_error(e)
+        return
+    if no_wait:
+        click.echo(f"Started {', '.join(answer['started'])}")
+        return
+    for resource, result in answer["results"].items():
+        if result["error"] is not None:
+            click.secho(f"Failed to clean {resource}: {result['error']}", fg="red")
+        elif result["failed"]:
+            click.secho(
+                f"Cleaned {resource} with errors ({result['removed']} removed, {result['failed']} failed)", fg="yellow"
+            )
+            for failure in result["failures"]:
+                click.secho(f"  {failure}", fg="yellow")
+        else:
+            click.echo(
+                f"Successfully cleaned {resource} ({result['removed']} removed, "
+                f"{_reclaimed(result['reclaimed'], result.get('sized', True))})"
+            )
+
+
+@cli.command()
+@_socket_option
+def status(socket_path: Path | None) -> None:
+    """Show what the running server is doing and when each scheduled cleanup runs next."""
+    from .database import ScheduleSchema
+    from .server import send_request
+
+    try:
+        answer = send_request(_control_socket(socket_path), {"command": "status"}, timeout=5)
+    except DockerToolsError as e:
+        _report_error(e)
+        return
+    click.echo(f"Server {answer['pid']} on {answer['host']}, up {datetime.timedelta(seconds=int(answer['uptime']))}")
+    click.echo(
+        f"{answer['runs_completed']} run(s) completed; running: {', '.join(answer['running']) or 'nothing'} "
+        f"(at most {answer['max_concurrent']} at a time)"
+    )
+    inventory = answer["inventory"]
+    if inventory["live"]:
+        click.echo(
+            f"Inventory: {inventory['resources']} resource(s) kept current by {inventory['events']} event(s), "
+            f"{inventory['resyncs']} full listing(s)"
+        )
+    schedules = [
+        ScheduleSchema(cleanup_id=0, cleanup_name=item["name"], expression=item["expression"], jitter=item["jitter"])
+        for item in answer["schedules"]
+    ]
+    _print_schedules(schedules, {item["name"]: item["next_run"] for item in answer["schedules"]})
 
 
 @cli.command()
 def about() -> None:
     """Show application information in a rich panel."""
+    from rich.align import Align
+    from rich.console import Console, Group
+    from rich.panel import Panel
+
+    from .settings import settings
+
     console = Console()
     db_path = Path(settings.database_path).absolute()
     db_exists = db_path.exists()
@@ -144,6 +1326,9 @@ def about() -> None:
 @click.option("--force", is_flag=True, help="Skip confirmation prompts")
 def reset(force: bool) -> None:
     """Reset database by renaming current one and creating a new blank database."""
+    from .database import get_manager
+    from .settings import settings
+
     db_path = Path(settings.database_path).absolute()
 
     if not db_path.exists():
@@ -160,6 +1345,8 @@ def reset(force: bool) -> None:
     backup_path = db_path.parent / f"{db_path.stem}_{timestamp}{db_path.suffix}"
 
     try:
+        # Close the shared connection first so the WAL is checkpointed into the file being renamed
+        get_manager().close()
         db_path.rename(backup_path)
         click.echo(f"Renamed existing database to {backup_path.name}")
     except OSError as e:
@@ -168,7 +1355,7 @@ def reset(force: bool) -> None:
 
     try:
         # Reinitialize database manager to create new blank database
-        _manager._initialize()
+        get_manager()._initialize()
         click.secho("Created new blank database successfully.", fg="green")
     except DatabaseError as e:
         click.secho(f"Failed to create new database: {e}", fg="red")
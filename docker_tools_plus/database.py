@@ -1,120 +1,792 @@
+import functools
+import json
 import re
 import sqlite3
+import threading
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
 from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator, model_validator, validator
 
-from .exceptions import DatabaseError, InvalidRegularExpressionError
-from .settings import settings
+from .exceptions import DatabaseError, InvalidCleanupError, InvalidRegularExpressionError
+from .filters import MATCH_FIELDS, match_values, matches_filters, parse_duration, parse_label
+from .patterns import pattern_cache
+from .profiling import traced
+from .schedule import parse_schedule
+
+if TYPE_CHECKING:
+    from .inventory import Resource
+
+# Seconds a writer waits for another process to release its lock before "database is locked" is raised.
+BUSY_TIMEOUT = 5.0
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=67108864",
+    "PRAGMA temp_store=MEMORY",
+)
+CLEANUP_COLUMNS = ("id", "name", "regular_expression", "labels", "until", "min_size", "keep_latest", "match_fields")
+RUN_COLUMNS = (
+    "run_id",
+    "cleanup_id",
+    "cleanup_name",
+    "host",
+    "resource_type",
+    "started_at",
+    "finished_at",
+    "matched",
+    "deleted",
+    "failed",
+    "reclaimed",
+    "duration",
+    "error",
+)
+MIN_PATTERN_LENGTH = 3
+# The trigram tokenizer only indexes strings of at least three characters.
+MIN_SEARCH_LENGTH = 3
 
 
 class CleanupSchema(BaseModel):
-    """Pydantic model for cleanup configurations."""
+    """Pydantic model for cleanup configurations.
+
+    A resource is selected when it matches ``regular_expression`` and every filter, unless it is one of the
+    ``keep_latest`` newest such resources of its type. The pattern may be left empty when filters are set;
+    cleanups made only of label and age filters are run with the daemon's prune endpoints.
+
+    The pattern is searched in the ``match_fields`` of a resource, or by default in its ID, names and image
+    together.
+    """
 
     id: int | None = Field(None, description="Unique identifier for the cleanup")
     name: str = Field(..., min_length=1, max_length=64, description="Name of the cleanup configuration")
-    regular_expression: str = Field(..., min_length=3, description="Regex pattern for matching resources")
+    regular_expression: str = Field("", description="Regex pattern for matching resources")
+    labels: list[str] = Field(
+        default_factory=list, description="Label filters: key, key=value, or !key / !key=value to exclude"
+    )
+    until: str | None = Field(None, description="Only resources created longer ago than this duration, e.g. 24h")
+    min_size: int | None = Field(None, ge=0, description="Only resources of at least this many bytes")
+    keep_latest: int | None = Field(
+        None, ge=1, description="Spare the most recently created matches, this many per resource type"
+    )
+    match_fields: list[str] = Field(
+        default_factory=list, description="Fields the pattern is matched against: id, name, image, tag, label, driver"
+    )
 
     @validator("regular_expression")
     def validate_regex(cls, v: str) -> str:  # noqa: N805
-        try:
-            re.compile(v)
-        except re.error as e:
-            raise InvalidRegularExpressionError(f"Invalid regular expression. '{v}' is not valid.") from e
+        """Compile the pattern, so an invalid one is refused when the cleanup is created."""
+        if v:
+            pattern_cache.get(v)
         return v
 
+    @field_validator("labels")
+    @classmethod
+    def validate_labels(cls, v: list[str]) -> list[str]:
+        """Refuse label filters that are not ``key``, ``key=value``, ``!key`` or ``!key=value``."""
+        for spec in v:
+            parse_label(spec)
+        return v
+
+    @field_validator("match_fields")
+    @classmethod
+    def validate_match_fields(cls, v: list[str]) -> list[str]:
+        """Refuse unknown match fields and drop repeated ones."""
+        unknown = [f for f in v if f not in MATCH_FIELDS]
+        if unknown:
+            raise InvalidCleanupError(f"Invalid match field(s): {', '.join(unknown)}. Use {', '.join(MATCH_FIELDS)}.")
+        return list(dict.fromkeys(v))
+
+    @field_validator("until")
+    @classmethod
+    def validate_until(cls, v: str | None) -> str | None:
+        """Refuse an age that is not a duration such as ``24h`` or ``1h30m``."""
+        if v is not None:
+            parse_duration(v)
+        return v
+
+    @model_validator(mode="after")
+    def validate_selection(self) -> "CleanupSchema":
+        """Require a pattern of at least three characters, unless filters select the resources."""
+        if (self.regular_expression or not self.has_filters) and len(self.regular_expression) < MIN_PATTERN_LENGTH:
+            raise InvalidCleanupError(
+                f"A regular expression needs at least {MIN_PATTERN_LENGTH} characters, "
+                "or set label, until or min_size filters"
+            )
+        if self.match_fields and not self.regular_expression:
+            raise InvalidCleanupError("Match fields only apply to a regular expression")
+        return self
+
+    @property
+    def compiled(self) -> re.Pattern:
+        """Compiled ``regular_expression``, shared through the process-wide pattern cache."""
+        return pattern_cache.get(self.regular_expression)
+
+    @property
+    def has_filters(self) -> bool:
+        """Whether the cleanup narrows its matches by label, age or size."""
+        return bool(self.labels) or self.until is not None or self.min_size is not None
+
+    @property
+    def prunable(self) -> bool:
+        """Whether the cleanup is fully described by filters the daemon's prune endpoints understand."""
+        return not self.regular_expression and self.has_filters and self.min_size is None and self.keep_latest is None
+
+    def matches(self, resource: "Resource") -> bool:
+        """Whether a resource matches the pattern and every filter of the cleanup."""
+        if self.regular_expression and not self.pattern_matches(resource):
+            return False
+        return matches_filters(self, resource)
+
+    def pattern_matches(self, resource: "Resource") -> bool:
+        """Whether the pattern is found in one of the ``match_fields`` of a resource."""
+        return any(self.compiled.search(value) for value in match_values(resource, self.match_fields))
+
+
+class ImportSummary(BaseModel):
+    """How many imported cleanup definitions were new, changed or already stored as they are."""
+
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+
+
+class RunRecord(BaseModel):
+    """What one clean run did to one resource type on one Docker host.
+
+    A run of several cleanups at once is recorded under the joined cleanup names, without a cleanup id,
+    because their patterns are evaluated together.
+    """
+
+    run_id: str = Field(..., description="Shared by every row written by the same run")
+    cleanup_id: int | None = Field(None, description="Cleanup that was run, if the run had only one")
+    cleanup_name: str
+    host: str = ""
+    resource_type: str
+    started_at: float = Field(..., description="Unix timestamp")
+    finished_at: float = Field(..., description="Unix timestamp")
+    matched: int = Field(0, ge=0)
+    deleted: int = Field(0, ge=0)
+    failed: int = Field(0, ge=0)
+    reclaimed: int = Field(0, ge=0, description="Bytes freed")
+    duration: float = Field(0.0, ge=0, description="Wall-clock seconds spent on the resource type")
+    error: str | None = None
+
+
+class ScheduleSchema(BaseModel):
+    """When a cleanup runs under ``docker-tools-plus serve``."""
+
+    cleanup_id: int
+    cleanup_name: str = ""
+    expression: str = Field(..., description="Cron expression, cron macro such as @daily, or @every DURATION")
+    jitter: float = Field(0.0, ge=0, description="Up to this many random seconds are added to every run time")
+
+    @field_validator("expression")
+    @classmethod
+    def validate_expression(cls, v: str) -> str:
+        """Normalize the expression and check that it can be scheduled."""
+        return parse_schedule(v).expression
+
+
+def _create_cleanups_table(conn: sqlite3.Connection) -> None:
+    """Schema v1: the cleanups table."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cleanups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            regular_expression TEXT NOT NULL
+        )
+    """)
+
+
+def _add_unique_name_index(conn: sqlite3.Connection) -> None:
+    """Schema v2: unique cleanup names, so exact lookups are a single index probe.
+
+    Names duplicated by older versions keep the oldest row as-is; the others get their ID appended.
+    """
+    conn.execute("""
+        UPDATE cleanups SET name = name || '-' || id
+        WHERE id NOT IN (SELECT MIN(id) FROM cleanups GROUP BY name)
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_cleanups_name ON cleanups(name)")
+
+
+# Keeps the name search index current one row at a time; bulk imports index their rows in one statement instead.
+_FTS_INSERT_TRIGGER = """CREATE TRIGGER cleanups_fts_insert AFTER INSERT ON cleanups BEGIN
+    INSERT INTO cleanups_fts(rowid, name) VALUES (new.id, new.name);
+END"""
+
+
+def _add_name_search_index(conn: sqlite3.Connection) -> None:
+    """Schema v3: trigram full-text index over cleanup names for substring and fuzzy search.
+
+    The trigram tokenizer needs SQLite 3.34+; on older versions the step is skipped and name searches
+    fall back to ``LIKE``.
+    """
+    conn.execute("SAVEPOINT name_search")
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE cleanups_fts USING fts5(
+                name, content='cleanups', content_rowid='id', tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError:
+        conn.execute("ROLLBACK TO name_search")
+        conn.execute("RELEASE name_search")
+        return
+    for statement in (
+        _FTS_INSERT_TRIGGER,
+        """CREATE TRIGGER cleanups_fts_delete AFTER DELETE ON cleanups BEGIN
+            INSERT INTO cleanups_fts(cleanups_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END""",
+        """CREATE TRIGGER cleanups_fts_update AFTER UPDATE OF name ON cleanups BEGIN
+            INSERT INTO cleanups_fts(cleanups_fts, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO cleanups_fts(rowid, name) VALUES (new.id, new.name);
+        END""",
+        "INSERT INTO cleanups_fts(cleanups_fts) VALUES ('rebuild')",
+    ):
+        conn.execute(statement)
+    conn.execute("RELEASE name_search")
+
+
+def _add_filter_columns(conn: sqlite3.Connection) -> None:
+    """Schema v4: label and age filters, stored as a JSON list and a duration."""
+    conn.execute("ALTER TABLE cleanups ADD COLUMN labels TEXT NOT NULL DEFAULT '[]'")
+    conn.execute("ALTER TABLE cleanups ADD COLUMN until TEXT")
+
+
+def _create_runs_table(conn: sqlite3.Connection) -> None:
+    """Schema v5: one row per clean run, Docker host and resource type."""
+    conn.execute(
+        """
+        CREATE TABLE runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id TEXT NOT NULL,
+            cleanup_id INTEGER,
+            cleanup_name TEXT NOT NULL,
+            host TEXT NOT NULL DEFAULT '',
+            resource_type TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            finished_at REAL NOT NULL,
+            matched INTEGER NOT NULL DEFAULT 0,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            reclaimed INTEGER NOT NULL DEFAULT 0,
+            duration REAL NOT NULL DEFAULT 0,
+            error TEXT
+        )
+        """
+    )
+    conn.execute("CREATE INDEX runs_started_at ON runs(started_at)")
+
+
+def _create_schedules_table(conn: sqlite3.Connection) -> None:
+    """Schema v6: at most one schedule per cleanup, removed with its cleanup."""
+    conn.execute(
+        """
+        CREATE TABLE schedules (
+            cleanup_id INTEGER PRIMARY KEY,
+            expression TEXT NOT NULL,
+            jitter REAL NOT NULL DEFAULT 0
+        )
+        """
+    )
+    conn.execute(
+        """CREATE TRIGGER cleanups_schedule_delete AFTER DELETE ON cleanups BEGIN
+            DELETE FROM schedules WHERE cleanup_id = old.id;
+        END"""
+    )
+
+
+def _add_selection_columns(conn: sqlite3.Connection) -> None:
+    """Schema v7: size filter and number of newest matches to keep."""
+    conn.execute("ALTER TABLE cleanups ADD COLUMN min_size INTEGER")
+    conn.execute("ALTER TABLE cleanups ADD COLUMN keep_latest INTEGER")
+
+
+def _add_match_fields_column(conn: sqlite3.Connection) -> None:
+    """Schema v8: resource fields the pattern is matched against, as a JSON list; empty for the search text."""
+    conn.execute("ALTER TABLE cleanups ADD COLUMN match_fields TEXT NOT NULL DEFAULT '[]'")
+
+
+# Applied in order; ``PRAGMA user_version`` records how many have run against a database.
+MIGRATIONS = (
+    _create_cleanups_table,
+    _add_unique_name_index,
+    _add_name_search_index,
+    _add_filter_columns,
+    _create_runs_table,
+    _create_schedules_table,
+    _add_selection_columns,
+    _add_match_fields_column,
+)
+
+
+def _to_schema(row: tuple) -> CleanupSchema:
+    values = dict(zip(CLEANUP_COLUMNS, row, strict=True))
+    values["labels"] = json.loads(values["labels"])
+    values["match_fields"] = json.loads(values["match_fields"])
+    return CleanupSchema(**values)
+
+
+def cleanup_row(values: Mapping[str, Any]) -> tuple:
+    """The stored columns of the fields of a cleanup, in ``CLEANUP_COLUMNS`` order without the ID.
+
+    Missing fields take their default, so the fields of a definition can be compared with a stored row
+    before the definition is validated.
+    """
+    return (
+        values["name"],
+        values.get("regular_expression") or "",
+        json.dumps(values.get("labels") or []),
+        values.get("until"),
+        values.get("min_size"),
+        values.get("keep_latest"),
+        json.dumps(values.get("match_fields") or []),
+    )
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
 
 class DatabaseManager:
     """Manager for handling database operations related to cleanups."""
 
     def __init__(self, db_path: str) -> None:
+        """Prepare a manager for the database at ``db_path``; the connection is opened on first use."""
         self.db_path = db_path
-        self._initialize()
+        # Compiled patterns of the cleanups this manager returns; shared with CleanupSchema.compiled.
+        self.pattern_cache = pattern_cache
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+        self._has_name_search = False
 
-    def _initialize(self) -> None:
-        """Initialize database and create tables."""
+    @traced("db.open")
+    def _open(self) -> sqlite3.Connection:
+        """Open the database in WAL mode and bring its schema up to date."""
         db_path = Path(self.db_path)
         db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, check_same_thread=False, cached_statements=256)
+        try:
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._migrate(conn)
+            self._has_name_search = (
+                conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'cleanups_fts'").fetchone() is not None
+            )
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Apply the migrations the database has not seen yet, all in one transaction."""
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= len(MIGRATIONS):
+            return
+        with conn:
+            # Take the write lock before re-reading the version so concurrent processes migrate only once
+            conn.execute("BEGIN IMMEDIATE")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Yield the manager's connection inside a transaction, opening it on first use.
+
+        The connection is shared by every call on this manager; the lock serializes access from threads.
+        """
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._open()
+            with self._conn:
+                yield self._conn
 
+    def _initialize(self) -> None:
+        """(Re)open the database and create tables."""
+        self.close()
         try:
-            with sqlite3.connect(db_path) as conn:
-                conn.execute("""
-                    CREATE TABLE IF NOT EXISTS cleanups (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        name TEXT NOT NULL,
-                        regular_expression TEXT NOT NULL
-                    )
-                """)
+            with self._connection():
+                pass
         except sqlite3.Error as e:
-            raise DatabaseError(f"Failed to initialize database: {e}")
+            raise DatabaseError(f"Failed to initialize database: {e}") from e
 
+    def close(self) -> None:
+        """Close the connection; the next call reopens it."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @traced("db.get_cleanup_by_name")
     def get_cleanup_by_name(self, name: str) -> list[CleanupSchema]:
-        """Retrieve cleanups by name pattern."""
+        """Retrieve cleanups by name.
+
+        An exact name match is returned on its own. Otherwise every cleanup whose name contains ``name``
+        is returned, names starting with it first, then by search rank.
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cur = conn.execute("SELECT * FROM cleanups WHERE name LIKE ?", (f"%{name}%",))
-                return [
-                    CleanupSchema(**dict(zip(["id", "name", "regular_expression"], row, strict=False)))
-                    for row in cur.fetchall()
-                ]
+            with self._connection() as conn:
+                row = conn.execute(
+                    f"SELECT {', '.join(CLEANUP_COLUMNS)} FROM cleanups WHERE name = ?",  # noqa: S608
+                    (name,),
+                ).fetchone()
+                if row is not None:
+                    return [_to_schema(row)]
+                return [_to_schema(row) for row in self._substring_search(conn, name)]
         except sqlite3.Error as e:
             raise DatabaseError(f"Database query failed: {e}") from e
 
+    @traced("db.search_cleanups")
+    def search_cleanups(self, text: str, limit: int = 20) -> list[CleanupSchema]:
+        """Rank cleanups by how closely their name resembles ``text``.
+
+        Substring matches come first. When there are none, names sharing the most trigrams with ``text``
+        are returned instead, so small typos still find the intended cleanup.
+        """
+        try:
+            with self._connection() as conn:
+                rows = self._substring_search(conn, text)[:limit]
+                if not rows and self._has_name_search and len(text) >= MIN_SEARCH_LENGTH:
+                    trigrams = dict.fromkeys(text[i : i + 3] for i in range(len(text) - 2))
+                    rows = conn.execute(
+                        f"""
+                        SELECT {", ".join(f"c.{c}" for c in CLEANUP_COLUMNS)}
+                        FROM cleanups_fts JOIN cleanups c ON c.id = cleanups_fts.rowid
+                        WHERE cleanups_fts MATCH ?
+                        ORDER BY cleanups_fts.rank, length(c.name)
+                        LIMIT ?
+                        """,  # noqa: S608
+                        (" OR ".join(map(_fts_phrase, trigrams)), limit),
+                    ).fetchall()
+                return [_to_schema(row) for row in rows]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Database query failed: {e}") from e
+
+    def _substring_search(self, conn: sqlite3.Connection, text: str) -> list[tuple]:
+        prefix = f"{_like_escape(text)}%"
+        if self._has_name_search and len(text) >= MIN_SEARCH_LENGTH:
+            return conn.execute(
+                f"""
+                SELECT {", ".join(f"c.{c}" for c in CLEANUP_COLUMNS)}
+                FROM cleanups_fts JOIN cleanups c ON c.id = cleanups_fts.rowid
+                WHERE cleanups_fts MATCH ?
+                ORDER BY c.name LIKE ? ESCAPE '\\' DESC, cleanups_fts.rank, length(c.name), c.name
+                """,  # noqa: S608
+                (_fts_phrase(text), prefix),
+            ).fetchall()
+        return conn.execute(
+            f"""
+            SELECT {", ".join(CLEANUP_COLUMNS)} FROM cleanups
+            WHERE name LIKE ? ESCAPE '\\'
+            ORDER BY name LIKE ? ESCAPE '\\' DESC, length(name), name
+            """,  # noqa: S608
+            (f"%{prefix}", prefix),
+        ).fetchall()
+
+    @traced("db.get_cleanups_by_names")
+    def get_cleanups_by_names(self, names: list[str]) -> list[CleanupSchema]:
+        """Retrieve cleanups whose name exactly matches one of the given names."""
+        if not names:
+            return []
+        try:
+            with self._connection() as conn:
+                placeholders = ", ".join("?" for _ in names)
+                cur = conn.execute(
+                    f"SELECT {', '.join(CLEANUP_COLUMNS)} FROM cleanups WHERE name IN ({placeholders})",  # noqa: S608
+                    list(names),
+                )
+                return [_to_schema(row) for row in cur.fetchall()]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Database query failed: {e}") from e
+
+    @traced("db.list_cleanups")
     def list_cleanups(self) -> list[CleanupSchema]:
         """List all cleanups."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cur = conn.execute("SELECT * FROM cleanups")
-                return [
-                    CleanupSchema(**dict(zip(["id", "name", "regular_expression"], row, strict=False)))
-                    for row in cur.fetchall()
-                ]
+            with self._connection() as conn:
+                cur = conn.execute(f"SELECT {', '.join(CLEANUP_COLUMNS)} FROM cleanups")  # noqa: S608
+                return [_to_schema(row) for row in cur.fetchall()]
         except sqlite3.Error as e:
             raise DatabaseError(f"Database query failed: {e}") from e
 
+    @traced("db.delete_cleanup")
     def delete_cleanup(self, cleanup_id: int) -> None:
         """Delete a cleanup by ID."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connection() as conn:
                 conn.execute("DELETE FROM cleanups WHERE id = ?", (cleanup_id,))
-                conn.commit()
         except sqlite3.Error as e:
             raise DatabaseError(f"Failed to delete cleanup: {e}") from e
 
-    def create_cleanup(self, name: str, regex: str) -> CleanupSchema:
+    @traced("db.create_cleanup")
+    def create_cleanup(  # noqa: PLR0913, PLR0917
+        self,
+        name: str,
+        regex: str,
+        labels: list[str] | None = None,
+        until: str | None = None,
+        min_size: int | None = None,
+        keep_latest: int | None = None,
+        match_fields: list[str] | None = None,
+    ) -> CleanupSchema:
         """Create a new cleanup entry."""
+        columns = CLEANUP_COLUMNS[1:]
         try:
-            CleanupSchema(name=name, regular_expression=regex)  # Validate input
-            with sqlite3.connect(self.db_path) as conn:
-                cur = conn.execute("INSERT INTO cleanups (name, regular_expression) VALUES (?, ?)", (name, regex))
-                cleanup_id = cur.lastrowid
-                conn.commit()
-
-                cur = conn.execute("SELECT * FROM cleanups WHERE id = ?", (cleanup_id,))
-                row = cur.fetchone()
-                return CleanupSchema(**dict(zip(["id", "name", "regular_expression"], row, strict=False)))
+            cleanup = CleanupSchema(
+                name=name,
+                regular_expression=regex,
+                labels=labels or [],
+                until=until,
+                min_size=min_size,
+                keep_latest=keep_latest,
+                match_fields=match_fields or [],
+            )
+            with self._connection() as conn:
+                cur = conn.execute(
+                    f"INSERT INTO cleanups ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",  # noqa: S608
+                    cleanup_row(dict(cleanup)),
+                )
+            return cleanup.model_copy(update={"id": cur.lastrowid})
+        except sqlite3.IntegrityError as e:
+            raise DatabaseError(f"A cleanup named '{name}' already exists.") from e
         except sqlite3.Error as e:
             raise DatabaseError(f"Failed to create cleanup: {e}") from e
         except InvalidRegularExpressionError:
             raise
 
+    @staticmethod
+    def _stored_rows(conn: sqlite3.Connection) -> dict[str, tuple]:
+        query = f"SELECT {', '.join(CLEANUP_COLUMNS[1:])} FROM cleanups"  # noqa: S608
+        return {row[0]: row for row in conn.execute(query)}
+
+    @traced("db.stored_rows")
+    def stored_rows(self) -> dict[str, tuple]:
+        """Return the stored columns of every cleanup by name, as :func:`cleanup_row` builds them.
+
+        Comparing rows tells which definitions are already stored as they are without compiling any pattern.
+        """
+        try:
+            with self._connection() as conn:
+                return self._stored_rows(conn)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Database query failed: {e}") from e
+
+    @traced("db.import_cleanups")
+    def import_cleanups(self, cleanups: list[CleanupSchema], skipped: int = 0) -> ImportSummary:
+        """Create or update cleanups by name, all in one transaction.
+
+        A cleanup whose name is already stored is updated in place, keeping its ID and schedule; one identical
+        to the stored row is skipped. The names of the new rows are added to the search index with a single
+        statement rather than by the per-row trigger.
+
+        Args:
+            cleanups: Cleanups to store.
+            skipped: Definitions the caller already left out because they match their stored row.
+        """
+        columns = CLEANUP_COLUMNS[1:]
+        rows = [cleanup_row(dict(cleanup)) for cleanup in cleanups]
+        try:
+            with self._connection() as conn:
+                stored = self._stored_rows(conn)
+                changed = [row for row in rows if stored.get(row[0]) != row]
+                last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM cleanups").fetchone()[0]
+                if self._has_name_search:
+                    conn.execute("DROP TRIGGER cleanups_fts_insert")
+                conn.executemany(
+                    f"""
+                    INSERT INTO cleanups ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})
+                    ON CONFLICT (name) DO UPDATE SET {", ".join(f"{c} = excluded.{c}" for c in columns[1:])}
+                    """,  # noqa: S608
+                    changed,
+                )
+                if self._has_name_search:
+                    conn.execute(
+                        "INSERT INTO cleanups_fts(rowid, name) SELECT id, name FROM cleanups WHERE id > ?", (last_id,)
+                    )
+                    conn.execute(_FTS_INSERT_TRIGGER)
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to import cleanups: {e}") from e
+        created = sum(1 for row in changed if row[0] not in stored)
+        return ImportSummary(
+            created=created, updated=len(changed) - created, skipped=skipped + len(rows) - len(changed)
+        )
+
+    @traced("db.record_runs")
+    def record_runs(self, records: list[RunRecord]) -> None:
+        """Store the rows of a clean run."""
+        if not records:
+            return
+        placeholders = ", ".join("?" for _ in RUN_COLUMNS)
+        try:
+            with self._connection() as conn:
+                conn.executemany(
+                    f"INSERT INTO runs ({', '.join(RUN_COLUMNS)}) VALUES ({placeholders})",  # noqa: S608
+                    [tuple(getattr(record, c) for c in RUN_COLUMNS) for record in records],
+                )
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to record run: {e}") from e
+
+    @traced("db.list_runs")
+    def list_runs(self, since: float | None = None, cleanup_name: str | None = None) -> list[RunRecord]:
+        """List recorded run rows, oldest first.
+
+        Args:
+            since: Only rows of runs started at or after this Unix timestamp.
+            cleanup_name: Only rows recorded under this cleanup name.
+        """
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        if cleanup_name is not None:
+            clauses.append("cleanup_name = ?")
+            params.append(cleanup_name)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        try:
+            with self._connection() as conn:
+                cur = conn.execute(
+                    f"SELECT {', '.join(RUN_COLUMNS)} FROM runs {where} ORDER BY started_at, id",  # noqa: S608
+                    params,
+                )
+                return [RunRecord(**dict(zip(RUN_COLUMNS, row, strict=True))) for row in cur.fetchall()]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Database query failed: {e}") from e
+
+    @traced("db.set_schedule")
+    def set_schedule(self, cleanup_id: int, expression: str, jitter: float = 0.0) -> ScheduleSchema:
+        """Create or replace the schedule of a cleanup."""
+        try:
+            schedule = ScheduleSchema(cleanup_id=cleanup_id, expression=expression, jitter=jitter)
+            with self._connection() as conn:
+                row = conn.execute("SELECT name FROM cleanups WHERE id = ?", (cleanup_id,)).fetchone()
+                if row is None:
+                    raise DatabaseError(f"No cleanup with ID {cleanup_id}.")
+                conn.execute(
+                    """
+                    INSERT INTO schedules (cleanup_id, expression, jitter) VALUES (?, ?, ?)
+                    ON CONFLICT (cleanup_id) DO UPDATE SET expression = excluded.expression, jitter = excluded.jitter
+                    """,
+                    (cleanup_id, schedule.expression, schedule.jitter),
+                )
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to save schedule: {e}") from e
+        return schedule.model_copy(update={"cleanup_name": row[0]})
 
-# Create a global instance for the default database
-_manager = DatabaseManager(settings.database_path)
+    @traced("db.delete_schedule")
+    def delete_schedule(self, cleanup_id: int) -> bool:
+        """Remove the schedule of a cleanup; returns whether there was one."""
+        try:
+            with self._connection() as conn:
+                return conn.execute("DELETE FROM schedules WHERE cleanup_id = ?", (cleanup_id,)).rowcount > 0
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Failed to delete schedule: {e}") from e
+
+    @traced("db.list_schedules")
+    def list_schedules(self) -> list[ScheduleSchema]:
+        """List every schedule with the name of its cleanup."""
+        try:
+            with self._connection() as conn:
+                cur = conn.execute(
+                    """
+                    SELECT s.cleanup_id, c.name, s.expression, s.jitter
+                    FROM schedules s JOIN cleanups c ON c.id = s.cleanup_id
+                    ORDER BY c.name
+                    """
+                )
+                return [
+                    ScheduleSchema(cleanup_id=row[0], cleanup_name=row[1], expression=row[2], jitter=row[3])
+                    for row in cur.fetchall()
+                ]
+        except sqlite3.Error as e:
+            raise DatabaseError(f"Database query failed: {e}") from e
+
+
+@functools.cache
+def get_manager() -> DatabaseManager:
+    """Return the manager for the configured database, creating it on first use."""
+    from .settings import settings
+
+    return DatabaseManager(settings.database_path)
 
 
 # Public functions for backward compatibility
 def get_cleanup_by_name(name: str) -> list[CleanupSchema]:
-    return _manager.get_cleanup_by_name(name)
+    """Call :meth:`DatabaseManager.get_cleanup_by_name` on the manager of the configured database."""
+    return get_manager().get_cleanup_by_name(name)
+
+
+def get_cleanups_by_names(names: list[str]) -> list[CleanupSchema]:
+    """Call :meth:`DatabaseManager.get_cleanups_by_names` on the manager of the configured database."""
+    return get_manager().get_cleanups_by_names(names)
+
+
+def search_cleanups(text: str, limit: int = 20) -> list[CleanupSchema]:
+    """Call :meth:`DatabaseManager.search_cleanups` on the manager of the configured database."""
+    return get_manager().search_cleanups(text, limit)
 
 
 def list_cleanups() -> list[CleanupSchema]:
-    return _manager.list_cleanups()
+    """Call :meth:`DatabaseManager.list_cleanups` on the manager of the configured database."""
+    return get_manager().list_cleanups()
 
 
 def delete_cleanup(cleanup_id: int):
-    return _manager.delete_cleanup(cleanup_id)
+    """Call :meth:`DatabaseManager.delete_cleanup` on the manager of the configured database."""
+    return get_manager().delete_cleanup(cleanup_id)
+
+
+def create_cleanup(  # noqa: PLR0913, PLR0917
+    name: str,
+    regex: str,
+    labels: list[str] | None = None,
+    until: str | None = None,
+    min_size: int | None = None,
+    keep_latest: int | None = None,
+    match_fields: list[str] | None = None,
+) -> CleanupSchema:
+    """Call :meth:`DatabaseManager.create_cleanup` on the manager of the configured database."""
+    return get_manager().create_cleanup(name, regex, labels, until, min_size, keep_latest, match_fields)
+
+
+def stored_rows() -> dict[str, tuple]:
+    """Call :meth:`DatabaseManager.stored_rows` on the manager of the configured database."""
+    return get_manager().stored_rows()
+
+
+def import_cleanups(cleanups: list[CleanupSchema], skipped: int = 0) -> ImportSummary:
+    """Call :meth:`DatabaseManager.import_cleanups` on the manager of the configured database."""
+    return get_manager().import_cleanups(cleanups, skipped)
+
+
+def record_runs(records: list[RunRecord]) -> None:
+    """Call :meth:`DatabaseManager.record_runs` on the manager of the configured database."""
+    return get_manager().record_runs(records)
+
+
+def list_runs(since: float | None = None, cleanup_name: str | None = None) -> list[RunRecord]:
+    """Call :meth:`DatabaseManager.list_runs` on the manager of the configured database."""
+    return get_manager().list_runs(since, cleanup_name)
+
+
+def set_schedule(cleanup_id: int, expression: str, jitter: float = 0.0) -> ScheduleSchema:
+    """Call :meth:`DatabaseManager.set_schedule` on the manager of the configured database."""
+    return get_manager().set_schedule(cleanup_id, expression, jitter)
+
+
+def delete_schedule(cleanup_id: int) -> bool:
+    """Call :meth:`DatabaseManager.delete_schedule` on the manager of the configured database."""
+    return get_manager().delete_schedule(cleanup_id)
 
 
-def create_cleanup(name: str, regex: str) -> CleanupSchema:
-    return _manager.create_cleanup(name, regex)
+def list_schedules() -> list[ScheduleSchema]:
+    """Call :meth:`DatabaseManager.list_schedules` on the manager of the configured database."""
+    return get_manager().list_schedules()
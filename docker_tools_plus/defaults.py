@@ -0,0 +1,12 @@
+"""Default values shared by the settings and the modules they configure.
+
+Kept free of imports, so loading the settings does not load the Docker client, the engine or the cache.
+"""
+
+DEFAULT_DOCKER_HOST = "unix:///var/run/docker.sock"
+# Resources removed concurrently by a clean run
+DEFAULT_JOBS = 8
+# Matches handed to the removal workers at a time
+DEFAULT_BATCH_SIZE = 100
+# Seconds an inventory cached on disk is reused by later processes
+DEFAULT_CACHE_TTL = 300.0
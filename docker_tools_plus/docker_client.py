@@ -0,0 +1,400 @@
+import codecs
+import contextlib
+import http.client
+import json
+import socket
+import threading
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, Any
+from urllib.parse import quote, urlencode, urlsplit
+
+from .defaults import DEFAULT_DOCKER_HOST
+from .exceptions import DockerAPIError, DockerCommandError
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+# Port of the daemon's unencrypted TCP socket
+DEFAULT_TCP_PORT = 2375
+# Bytes read from the socket at a time while streaming a listing
+STREAM_CHUNK_SIZE = 64 * 1024
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = " \t\n\r"
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection that talks to a Unix domain socket instead of a TCP port."""
+
+    def __init__(self, socket_path: str, timeout: float | None = None) -> None:
+        """Prepare a connection to the socket at ``socket_path``; it is opened on first use."""
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        """Open the Unix socket used by this connection."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class DockerClient:
+    """Minimal Docker Engine API client.
+
+    ``base_url`` is a ``unix://`` socket path or an unencrypted ``tcp://host:port`` endpoint.
+    A single HTTP/1.1 keep-alive connection is opened lazily and reused for every request,
+    so a cleanup run costs one socket connection instead of one ``docker`` process per command.
+    Connections are kept per thread, so one client can be shared by a pool of workers.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_DOCKER_HOST, timeout: float | None = None) -> None:
+        """Prepare a client for the daemon at ``base_url``, a ``unix://`` or ``tcp://`` host.
+
+        Raises:
+            DockerCommandError: If the host is not a ``unix://`` or ``tcp://`` URL.
+        """
+        self.base_url = base_url
+        self.socket_path: str | None = None
+        self.address: tuple[str, int] | None = None
+        if base_url.startswith("unix://"):
+            self.socket_path = base_url[len("unix://") :]
+        elif base_url.startswith("tcp://"):
+            url = urlsplit(base_url)
+            if not url.hostname:
+                raise DockerCommandError(f"Invalid Docker host '{base_url}'. Use tcp://HOST[:PORT].")
+            self.address = (url.hostname, url.port or DEFAULT_TCP_PORT)
+        else:
+            raise DockerCommandError(
+                f"Unsupported Docker host '{base_url}'. Only unix:// and tcp:// hosts are supported."
+            )
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "Self":
+        """Return the client; its connections are closed on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the connections of the client."""
+        self.close()
+
+    def close(self) -> None:
+        """Close every connection opened by this client."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def _new_connection(self, timeout: float | None) -> http.client.HTTPConnection:
+        if self.socket_path is not None:
+            return UnixHTTPConnection(self.socket_path, timeout=timeout)
+        return http.client.HTTPConnection(*self.address, timeout=timeout)
+
+    def _get_connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = self._new_connection(self.timeout)
+            self._local.connection = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _drop_connection(self) -> None:
+        conn = getattr(self._local, "connection", None)
+        if conn is not None:
+            conn.close()
+            self._local.connection = None
+            with self._lock:
+                self._connections.remove(conn)
+
+    def _send(self, method: str, path: str, params: dict[str, Any] | None = None) -> http.client.HTTPResponse:
+        """Send a request and return the response once its status is known, raising on error statuses."""
+        url = f"{path}?{urlencode(params)}" if params else path
+        # A keep-alive connection may have been closed by the daemon since the last request;
+        # in that case reconnect once before giving up.
+        for attempt in range(2):
+            reused = getattr(self._local, "connection", None) is not None
+            conn = self._get_connection()
+            try:
+                conn.request(method, url)
+                response = conn.getresponse()
+                if response.status >= 400:  # noqa: PLR2004
+                    body = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                self._drop_connection()
+                if reused and attempt == 0:
+                    continue
+                raise DockerCommandError(f"Cannot reach Docker daemon at {self.base_url}: {e}") from e
+            break
+
+        if response.status >= 400:  # noqa: PLR2004
+            raise DockerAPIError(f"{method} {path} failed: {_error_message(body)}", response.status)
+        return response
+
+    def _request(self, method: str, path: str, params: dict[str, Any] | None = None) -> Any:  # noqa: ANN401
+        """Send a request and return the decoded JSON body (or ``None`` for empty bodies)."""
+        response = self._send(method, path, params)
+        try:
+            body = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self._drop_connection()
+            raise DockerCommandError(f"Cannot reach Docker daemon at {self.base_url}: {e}") from e
+        if not body:
+            return None
+        return json.loads(body)
+
+    def _stream(
+        self, path: str, params: dict[str, Any] | None = None, key: str | None = None
+    ) -> Iterator[dict[str, Any]]:
+        """Yield the objects of a JSON array response one by one, as they arrive.
+
+        Args:
+            path: Endpoint answering with a JSON array.
+            params: Query parameters.
+            key: For endpoints answering with an object, the top-level key holding the array.
+        """
+        response = self._send("GET", path, params)
+        finished = False
+        try:
+            yield from _iter_json_array(iter(lambda: response.read1(STREAM_CHUNK_SIZE), b""), key)
+            finished = True
+        except (OSError, http.client.HTTPException) as e:
+            raise DockerCommandError(f"Cannot reach Docker daemon at {self.base_url}: {e}") from e
+        finally:
+            if not finished:
+                # The rest of the response is still on the wire, so the connection cannot be reused
+                self._drop_connection()
+            else:
+                response.read()
+
+    def iter_containers(
+        self, filters: dict[str, list[str]] | None = None, size: bool = False
+    ) -> Iterator[dict[str, Any]]:
+        """Stream all containers, including stopped ones, optionally only those matching ``filters``.
+
+        With ``size``, each container comes with the size of its writable layer as ``SizeRw``; the daemon
+        computes it for every container listed, which makes the listing much slower.
+        """
+        params = {"all": "1"}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        if size:
+            params["size"] = "1"
+        return self._stream("/containers/json", params)
+
+    def iter_volumes(self, filters: dict[str, list[str]] | None = None) -> Iterator[dict[str, Any]]:
+        """Stream all volumes, optionally only those matching ``filters``."""
+        return self._stream("/volumes", {"filters": json.dumps(filters)} if filters else None, key="Volumes")
+
+    def iter_images(self) -> Iterator[dict[str, Any]]:
+        """Stream all top-level images."""
+        return self._stream("/images/json")
+
+    def list_containers(self, size: bool = False) -> list[dict[str, Any]]:
+        """List all containers, including stopped ones, with the size of their writable layer if ``size``."""
+        return list(self.iter_containers(size=size))
+
+    def list_volumes(self) -> list[dict[str, Any]]:
+        """List all volumes."""
+        return list(self.iter_volumes())
+
+    def list_images(self) -> list[dict[str, Any]]:
+        """List all top-level images."""
+        return list(self.iter_images())
+
+    def inspect_image(self, reference: str) -> dict[str, Any]:
+        """Return the details of an image, by ID or by reference."""
+        return self._request("GET", f"/images/{quote(reference, safe=':')}/json")
+
+    def info(self) -> dict[str, Any]:
+        """Return the system information of the daemon: its ID, clock and object counts among others."""
+        return self._request("GET", "/info")
+
+    def disk_usage(self, object_type: str | None = None) -> dict[str, Any]:
+        """Return what ``docker system df`` reports; with ``object_type``, e.g. ``volume``, only about those objects.
+
+        It is the only endpoint reporting the size of volumes. Daemons older than API 1.42 ignore
+        ``object_type`` and compute everything.
+        """
+        return self._request("GET", "/system/df", {"type": object_type} if object_type else None) or {}
+
+    def events(
+        self, filters: dict[str, list[str]] | None = None, since: float | None = None, until: float | None = None
+    ) -> "EventStream":
+        """Subscribe to the daemon's event stream, from now on or from ``since``.
+
+        The stream has a connection of its own, without a timeout, since it may stay quiet for hours. With
+        ``until`` it only replays the events up to that time, then ends; it is then read with the client
+        timeout. Times are seconds since the epoch, on the daemon's clock.
+
+        Raises:
+            DockerCommandError: If the daemon cannot be reached.
+            DockerAPIError: If the daemon rejects the subscription.
+        """
+        conn = self._new_connection(None if until is None else self.timeout)
+        params = {"filters": json.dumps(filters)} if filters else {}
+        for key, value in (("since", since), ("until", until)):
+            if value is not None:
+                params[key] = f"{value:.9f}"
+        url = f"/events?{urlencode(params)}" if params else "/events"
+        try:
+            conn.request("GET", url)
+            response = conn.getresponse()
+            if response.status >= 400:  # noqa: PLR2004
+                raise DockerAPIError(f"GET /events failed: {_error_message(response.read())}", response.status)
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise DockerCommandError(f"Cannot reach Docker daemon at {self.base_url}: {e}") from e
+        except DockerAPIError:
+            conn.close()
+            raise
+        return EventStream(conn, response, self.base_url)
+
+    def remove_container(self, container_id: str) -> None:
+        """Remove a container by ID."""
+        self._request("DELETE", f"/containers/{quote(container_id, safe=':')}")
+
+    def remove_volume(self, name: str) -> None:
+        """Remove a volume by name."""
+        self._request("DELETE", f"/volumes/{quote(name, safe=':')}")
+
+    def remove_image(self, image_id: str) -> list[dict[str, str]]:
+        """Remove an image by ID and return the untagged/deleted entries reported by the daemon."""
+        return self._request("DELETE", f"/images/{quote(image_id, safe=':')}") or []
+
+    def prune_containers(self, filters: dict[str, list[str]]) -> dict[str, Any]:
+        """Remove every stopped container matching the filters, server-side in one call."""
+        return self._request("POST", "/containers/prune", {"filters": json.dumps(filters)}) or {}
+
+    def prune_volumes(self, filters: dict[str, list[str]]) -> dict[str, Any]:
+        """Remove every unused volume matching the filters, server-side in one call."""
+        return self._request("POST", "/volumes/prune", {"filters": json.dumps(filters)}) or {}
+
+    def prune_images(self, filters: dict[str, list[str]]) -> dict[str, Any]:
+        """Remove every unused image matching the filters, server-side in one call."""
+        return self._request("POST", "/images/prune", {"filters": json.dumps(filters)}) or {}
+
+
+class EventStream:
+    """Events of a daemon, one decoded JSON object per event, as they happen.
+
+    Iterating blocks until the next event. :meth:`close` may be called from another thread to end the
+    iteration; otherwise it ends when the daemon closes the stream.
+    """
+
+    def __init__(self, conn: http.client.HTTPConnection, response: http.client.HTTPResponse, base_url: str) -> None:
+        """Read the events from ``response``; ``conn`` is closed with the stream."""
+        self._conn = conn
+        self._response = response
+        self._base_url = base_url
+        self._closed = False
+
+    def __enter__(self) -> "Self":
+        """Return the stream; it is closed on exit."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close the stream and its connection."""
+        self.close()
+        self._conn.close()
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        """Yield the events as the daemon sends them.
+
+        Raises:
+            DockerCommandError: If the stream breaks before :meth:`close` is called.
+        """
+        try:
+            # The daemon writes one JSON object per line
+            while line := self._response.readline():
+                if line.strip():
+                    yield json.loads(line)
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            if not self._closed:
+                raise DockerCommandError(f"Lost the event stream of {self._base_url}: {e}") from e
+
+    def close(self) -> None:
+        """Stop the stream; a blocked iteration returns. Safe to call from any thread.
+
+        Only the socket is shut down, which unblocks a read in progress; the connection itself is closed when
+        the stream is left as a context manager, by the thread reading it.
+        """
+        self._closed = True
+        sock = self._conn.sock
+        if sock is not None:
+            with contextlib.suppress(OSError):
+                sock.shutdown(socket.SHUT_RDWR)
+
+
+def _iter_json_array(chunks: Iterable[bytes], key: str | None = None) -> Iterator[Any]:
+    """Incrementally decode the elements of a JSON array spread over ``chunks``.
+
+    Only the element being decoded is buffered, so memory use does not grow with the length of the array.
+    With ``key``, the array is the value of that key in a top-level object; ``null`` counts as empty.
+    """
+    chunks = iter(chunks)
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer, position, eof = "", 0, False
+
+    def fill() -> bool:
+        nonlocal buffer, position, eof
+        chunk = next(chunks, None)
+        eof = chunk is None
+        buffer = buffer[position:] + text_decoder.decode(chunk or b"", final=eof)
+        position = 0
+        return not eof
+
+    def skip(characters: str) -> str:
+        """Advance past ``characters`` and return the next character, or "" at the end of the data."""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in characters:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if not fill():
+                return ""
+
+    if key is not None:
+        marker = json.dumps(key)
+        while (found := buffer.find(marker, position)) < 0:
+            position = max(position, len(buffer) - len(marker))
+            if not fill():
+                return
+        position = found + len(marker)
+        if skip(_JSON_WHITESPACE + ":") != "[":
+            return  # the key is null
+    elif skip(_JSON_WHITESPACE) != "[":
+        raise ValueError("Expected a JSON array")
+    position += 1
+
+    while skip(_JSON_WHITESPACE + ",") not in ("]", ""):
+        while True:
+            try:
+                element, end = _JSON_DECODER.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if fill():
+                    continue
+                raise
+            # A number or literal may continue in the next chunk
+            if end < len(buffer) or eof or buffer[position] in '{["':
+                break
+            if not fill():
+                break
+        position = end
+        yield element
+
+
+def _error_message(body: bytes) -> str:
+    try:
+        return json.loads(body)["message"]
+    except (ValueError, KeyError, TypeError):
+        return body.decode(errors="replace").strip()
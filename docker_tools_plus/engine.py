@@ -0,0 +1,578 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, TypeVar
+
+from . import profiling
+from .defaults import DEFAULT_BATCH_SIZE, DEFAULT_JOBS
+from .exceptions import DockerAPIError, DockerCommandError
+from .filters import prune_filters
+from .images import ImageGraph
+from .inventory import RESOURCE_TYPES, Inventory, InventoryProvider, Resource, iter_resources, resource_matcher
+from .plan import REMOVAL_PHASES, CleanupPlan
+
+if TYPE_CHECKING:
+    from .database import CleanupSchema
+    from .docker_client import DockerClient
+
+# Key of the removed objects in the answer of each ``/<type>/prune`` endpoint
+PRUNE_DELETED_KEYS = {"containers": "ContainersDeleted", "volumes": "VolumesDeleted", "images": "ImagesDeleted"}
+# Status of the daemon's refusals to remove a resource, e.g. an image with several tags or with child images
+CONFLICT = 409
+
+
+T = TypeVar("T")
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Split an iterable into lists of ``size`` items, consuming it lazily."""
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def largest_first(matches: dict[str, list[Resource]], target: int) -> dict[str, list[Resource]]:
+    """Pick the largest of the matches until their sizes add up to at least ``target`` bytes.
+
+    The matches are turned into a heap in linear time and popped largest first, so only the resources picked
+    are ever ordered. Resources of unknown size count for nothing and are never picked.
+
+    Returns:
+        The picked resources, ``{resource_type: [resources]}`` like ``matches``, largest first.
+    """
+    heap = [
+        (-resource.size, position, resource)
+        for position, resource in enumerate(itertools.chain.from_iterable(matches.values()))
+        if resource.size > 0
+    ]
+    heapq.heapify(heap)
+    picked: dict[str, list[Resource]] = {resource_type: [] for resource_type in matches}
+    freed = 0
+    while heap and freed < target:
+        _, _, resource = heapq.heappop(heap)
+        picked[resource.kind].append(resource)
+        freed += resource.size
+    return picked
+
+
+def _matcher(
+    cleanups: Sequence["CleanupSchema"], resource_type: str, snapshot: Inventory | None
+) -> Callable[[Resource], bool]:
+    """Select the matches of a snapshot through its field columns, or build a matcher for a streamed listing."""
+    if snapshot is None:
+        return resource_matcher(cleanups)
+    selected = {resource.id for resource in snapshot.match_any(cleanups, [resource_type])[resource_type]}
+    return lambda resource: resource.id in selected
+
+
+def _needs_sizes(cleanups: Sequence["CleanupSchema"]) -> bool:
+    """Whether selecting the matches of the cleanups takes the sizes of containers and volumes."""
+    return any(cleanup.min_size is not None for cleanup in cleanups)
+
+
+def _tag_matcher(cleanups: Sequence["CleanupSchema"]) -> Callable[[Resource], bool]:
+    """Whether any of the cleanups selects an image named after one of its tags only."""
+    return lambda image: any(cleanup.matches(image) for cleanup in cleanups)
+
+
+def _finish(results: dict[str, "CleanupResult"], phase: Iterable[str]) -> None:
+    finished_at = time.time()
+    for resource_type in (t for t in phase if t in results):
+        results[resource_type].finished_at = finished_at
+
+
+class RateLimiter:
+    """Space out calls so that at most ``rate`` of them start per second, whichever thread makes them."""
+
+    def __init__(self, rate: float) -> None:
+        """Allow ``rate`` calls per second."""
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Block until the next call may start."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+@dataclass
+class CleanupResult:
+    """Outcome of cleaning one resource type."""
+
+    resource_type: str
+    removed: list[Resource] = field(default_factory=list)
+    failures: list[tuple[Resource, DockerCommandError]] = field(default_factory=list)
+    error: DockerCommandError | None = None
+    # Bytes freed; for images removed one by one, the bytes each adds on top of its parent
+    reclaimed: int = 0
+    # False when containers or volumes were removed without their sizes listed, so ``reclaimed`` misses them
+    sized: bool = True
+    matched: int = 0
+    started_at: float | None = None
+    finished_at: float | None = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the resource type was cleaned without any error."""
+        return self.error is None and not self.failures
+
+    @property
+    def duration(self) -> float:
+        """Wall-clock seconds spent on the resource type, or 0 if it was never started."""
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+
+RemovalListener = Callable[[Resource, DockerCommandError | None], None]
+
+
+class CleanupEngine:
+    """Match Docker resources against cleanup patterns and remove them through the Engine API.
+
+    ``on_removal`` is called with each resource and the error that prevented its removal, or ``None``, as
+    soon as the outcome is known, so a caller can report progress while a run is still going.
+    ``rate_limit`` caps the removal requests sent to the daemon per second, all workers together.
+    Once ``cancel`` is set, runs stop handing out batches: the removals under way finish, and the
+    resources not attempted yet are left in place.
+    """
+
+    def __init__(
+        self,
+        client: "DockerClient",
+        inventory: InventoryProvider | None = None,
+        on_removal: RemovalListener | None = None,
+        rate_limit: float | None = None,
+        cancel: threading.Event | None = None,
+    ) -> None:
+        """Prepare an engine for the host of ``client``.
+
+        Args:
+            client: Client of the host to clean.
+            inventory: Provider of the snapshots to match against; one listing the host when omitted.
+            on_removal: Called with each resource removed or failed, from the thread that removed it.
+            rate_limit: Most removal calls to start per second; unlimited when omitted.
+            cancel: Set to stop the run between batches.
+        """
+        self.client = client
+        self.inventory = inventory if inventory is not None else InventoryProvider(client)
+        self.on_removal = on_removal
+        self.cancel = cancel
+        self._limiter = RateLimiter(rate_limit) if rate_limit else None
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether the run was asked to stop through ``cancel``."""
+        return self.cancel is not None and self.cancel.is_set()
+
+    def list_resources(self, resource_type: str) -> list[Resource]:
+        """List all resources of the given type from the current inventory snapshot."""
+        return self.inventory.get().of_type(resource_type)
+
+    def find_matches(self, cleanup: "CleanupSchema", resource_type: str) -> list[Resource]:
+        """Return the resources of the given type whose identifying text matches the cleanup pattern."""
+        return self.inventory.get().match([cleanup], [resource_type])[0][resource_type]
+
+    def remove(self, resource: Resource, matches: Callable[[Resource], bool] | None = None) -> None:
+        """Remove a single resource.
+
+        Args:
+            resource: The resource to remove.
+            matches: Whether the cleanups select an image under a given tag. An image with several tags is only
+                removed if they all are selected; without it, such an image is kept.
+        """
+        with profiling.timer(f"docker.remove.{resource.kind}"):
+            if resource.kind == "containers":
+                self._throttled(self.client.remove_container, resource.id)
+            elif resource.kind == "volumes":
+                self._throttled(self.client.remove_volume, resource.id)
+            else:
+                self._remove_image(resource, matches)
+
+    def _throttled(self, remove: Callable[[str], object], key: str) -> None:
+        if self._limiter is not None:
+            self._limiter.wait()
+        remove(key)
+
+    def _remove_image(self, image: Resource, matches: Callable[[Resource], bool] | None) -> None:
+        """Remove an image by ID, untagging it first when the daemon refuses because it has several tags.
+
+        Forcing the removal would do, but it also removes images that stopped containers still use. The tags
+        are read again when the daemon refuses, as they may have changed since the image was listed. When the
+        cleanups select the image under every tag, all tags but one are removed, then the image by ID. When
+        they don't, only the selected tags are removed and the image is kept for the others.
+
+        Raises:
+            DockerCommandError: If the image is kept because some of its tags are not selected.
+        """
+        try:
+            self._throttled(self.client.remove_image, image.id)
+        except DockerAPIError as e:
+            if e.status_code != CONFLICT or "multiple repositories" not in str(e):
+                raise
+            tags = self.client.inspect_image(image.id).get("RepoTags") or []
+            selected = [t for t in tags if matches is not None and matches(replace(image, names=(t,)))]
+            kept = [t for t in tags if t not in selected]
+            if kept:
+                for tag in selected:
+                    self._throttled(self.client.remove_image, tag)
+                raise DockerCommandError(f"{image.name} is kept for its tags not selected: {', '.join(kept)}") from e
+            for tag in tags[1:]:
+                self._throttled(self.client.remove_image, tag)
+            self._throttled(self.client.remove_image, image.id)
+
+    def prune(self, resource_type: str, filters: dict[str, list[str]]) -> tuple[list[Resource], int]:
+        """Remove every unused resource of a type matching the filters with one ``/<type>/prune`` call.
+
+        Returns:
+            The removed resources and the bytes the daemon reports as reclaimed.
+        """
+        with profiling.span("docker.prune", resource_type=resource_type):
+            if resource_type == "containers":
+                report = self.client.prune_containers(filters)
+            elif resource_type == "volumes":
+                report = self.client.prune_volumes(filters)
+            else:
+                report = self.client.prune_images(filters)
+        deleted = report.get(PRUNE_DELETED_KEYS[resource_type]) or []
+        if resource_type == "images":
+            # Untagged references are reported next to the deleted images and layers
+            deleted = [entry["Deleted"] for entry in deleted if entry.get("Deleted")]
+        return [Resource(kind=resource_type, id=item) for item in deleted], report.get("SpaceReclaimed") or 0
+
+    def _remove_quietly(
+        self, resource: Resource, matches: Callable[[Resource], bool] | None = None
+    ) -> DockerCommandError | None:
+        try:
+            self.remove(resource, matches)
+        except DockerCommandError as e:
+            return e
+        return None
+
+    def remove_all(
+        self, resources: Iterable[Resource], jobs: int = 1, pool: ThreadPoolExecutor | None = None
+    ) -> tuple[list[Resource], list[tuple[Resource, DockerCommandError]]]:
+        """Remove resources concurrently with at most ``jobs`` workers.
+
+        Args:
+            resources: Resources to remove.
+            jobs: Maximum number of concurrent removals when no ``pool`` is given.
+            pool: Executor to run the removals on, so several batches can share the same worker threads.
+
+        Returns:
+            The removed resources and a list of ``(resource, error)`` pairs for the ones that failed.
+        """
+        resources = list(resources)
+        if pool is not None:
+            outcomes = list(pool.map(self._remove_quietly, resources))
+        elif jobs <= 1 or len(resources) <= 1:
+            outcomes = [self._remove_quietly(r) for r in resources]
+        else:
+            with ThreadPoolExecutor(max_workers=min(jobs, len(resources))) as executor:
+                outcomes = list(executor.map(self._remove_quietly, resources))
+
+        removed = [r for r, error in zip(resources, outcomes, strict=True) if error is None]
+        failures = [(r, error) for r, error in zip(resources, outcomes, strict=True) if error is not None]
+        return removed, failures
+
+    def clean(
+        self,
+        cleanup: "CleanupSchema",
+        resource_types: Iterable[str] = RESOURCE_TYPES,
+        jobs: int = DEFAULT_JOBS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> dict[str, CleanupResult]:
+        """Remove every resource of the given types matching the cleanup.
+
+        Containers are removed before volumes and images; volumes and images are removed in the same phase.
+        A failure on one resource is recorded in the result and does not stop the others.
+        """
+        return self.clean_many([cleanup], resource_types, jobs, batch_size)
+
+    def clean_many(
+        self,
+        cleanups: Sequence["CleanupSchema"],
+        resource_types: Iterable[str] = RESOURCE_TYPES,
+        jobs: int = DEFAULT_JOBS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> dict[str, CleanupResult]:
+        """Remove every resource of the given types matching any of the cleanups.
+
+        Resources are streamed from the daemon, matched as they arrive with a combined regular expression and
+        removed in batches of ``batch_size`` while the listing continues, so memory use does not depend on
+        the size of the inventory. A fresh inventory snapshot is used instead of listing again when there is one.
+        Cleanups made only of label and age filters are handed to the daemon's prune endpoints instead,
+        falling back to removing the matches one by one when the daemon cannot express or rejects the filters.
+        Containers and volumes are only listed with their sizes when a ``min_size`` filter needs them. A run
+        that streamed every type is handed to :meth:`InventoryProvider.adopt`, without the resources it removed.
+        """
+        resource_types = [t for t in RESOURCE_TYPES if t in set(resource_types)]
+        prunable = [c for c in cleanups if c.prunable]
+        matched = [c for c in cleanups if not c.prunable]
+        results = {t: CleanupResult(t) for t in resource_types}
+        sizes = _needs_sizes(cleanups)
+        snapshot = self.inventory.current(sizes)
+        if snapshot is None and any(c.keep_latest is not None for c in cleanups):
+            # Which matches are the latest is only known once everything is listed
+            try:
+                snapshot = self.inventory.get(sizes)
+            except DockerCommandError as e:
+                for result in results.values():
+                    result.error = e
+                return results
+        started = time.monotonic()
+        listed: dict[str, list[Resource]] = {}
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            for position, phase in enumerate(REMOVAL_PHASES):
+                if self.cancelled:
+                    break
+                with profiling.span("engine.phase", phase=position + 1):
+                    streams: dict[str, Iterator[Resource]] = {}
+                    for resource_type in (t for t in phase if t in results):
+                        result = results[resource_type]
+                        result.started_at = time.time()
+                        pruned, fallback = self._prune_cleanups(prunable, resource_type, result)
+                        if result.error is None and (matched or fallback):
+                            matcher = _matcher([*matched, *fallback], resource_type, snapshot)
+                            matches = profiling.timed(matcher, "engine.match")
+                            streams[resource_type] = self._stream_matches(
+                                resource_type,
+                                matches,
+                                pruned,
+                                result,
+                                snapshot,
+                                sizes,
+                                listed.setdefault(resource_type, [])
+                                if snapshot is None or resource_type == "images"
+                                else None,
+                            )
+                    # Images are removed once all are listed, as the order depends on the children of each one
+                    images = streams.pop("images", None)
+                    self._remove_stream(itertools.chain.from_iterable(streams.values()), results, pool, batch_size)
+                    if images is not None:
+                        selects = _tag_matcher([*matched, *prunable])
+                        self._remove_images(
+                            list(images), ImageGraph(listed["images"]), results, pool, batch_size, selects
+                        )
+                    _finish(results, phase)
+
+                # Later phases depend on this one; don't go on against a daemon that cannot be listed
+                error = next((results[t].error for t in phase if t in results and results[t].error), None)
+                if error is not None:
+                    for later in REMOVAL_PHASES[position + 1 :]:
+                        for resource_type in (t for t in later if t in results):
+                            results[resource_type].error = error
+                    break
+        complete = listed.keys() == set(RESOURCE_TYPES) and not any(r.error for r in results.values())
+        if snapshot is None and complete and not self.cancelled:
+            removed = {r.id for result in results.values() for r in result.removed}
+            self.inventory.adopt(
+                Inventory(
+                    (r for resources in listed.values() for r in resources if r.id not in removed), started, sizes
+                )
+            )
+        return results
+
+    def _stream_matches(  # noqa: PLR0913, PLR0917
+        self,
+        resource_type: str,
+        matches: Callable[[Resource], bool],
+        skip: set[str],
+        result: CleanupResult,
+        snapshot: Inventory | None,
+        sizes: bool = False,
+        listed: list[Resource] | None = None,
+    ) -> Iterator[Resource]:
+        """Yield the matching resources of one type, recording a listing failure in ``result``.
+
+        Every resource listed that is still there, matching or not, is also appended to ``listed`` if given.
+        """
+        # The daemon only sizes containers and volumes on request; images always come with their size
+        unsized = resource_type != "images" and not sizes and (snapshot is None or not snapshot.sized)
+        try:
+            if snapshot is not None:
+                listing = snapshot.of_type(resource_type)
+            else:
+                listing = profiling.timed_iter(
+                    iter_resources(self.client, resource_type, sizes), f"docker.list.{resource_type}"
+                )
+            for resource in listing:
+                if resource.id in skip:
+                    continue
+                if listed is not None:
+                    listed.append(resource)
+                if matches(resource):
+                    result.matched += 1
+                    if unsized:
+                        result.sized = False
+                    yield resource
+        except DockerCommandError as e:
+            result.error = e
+
+    def _prune_cleanups(
+        self,
+        cleanups: Sequence["CleanupSchema"],
+        resource_type: str,
+        result: CleanupResult,
+    ) -> tuple[set[str], list["CleanupSchema"]]:
+        """Prune the resources of one type selected by filter-only cleanups and record them in ``result``.
+
+        Returns:
+            The IDs of the pruned resources, and the cleanups that could not be pruned and need their
+            matches removed one by one.
+        """
+        pruned_ids: set[str] = set()
+        fallback = []
+        for cleanup in cleanups:
+            filters = prune_filters(cleanup, resource_type)
+            if filters is None:
+                fallback.append(cleanup)
+                continue
+            try:
+                pruned, reclaimed = self.prune(resource_type, filters)
+            except DockerAPIError:
+                fallback.append(cleanup)
+                continue
+            except DockerCommandError as e:
+                result.error = e
+                return pruned_ids, []
+            pruned_ids.update(r.id for r in pruned)
+            for resource in pruned:
+                self.inventory.discard(resource)
+                if self.on_removal is not None:
+                    self.on_removal(resource, None)
+            result.removed += pruned
+            result.matched += len(pruned)
+            result.reclaimed += reclaimed
+        return pruned_ids, fallback
+
+    def _remove_stream(
+        self,
+        resources: Iterable[Resource],
+        results: dict[str, CleanupResult],
+        pool: ThreadPoolExecutor,
+        batch_size: int,
+        matches: Callable[[Resource], bool] | None = None,
+    ) -> None:
+        """Remove resources on ``pool`` in batches, consuming ``resources`` only as fast as batches complete."""
+        pending: deque[tuple[Resource, Future]] = deque()
+        for batch in batched(resources, batch_size):
+            if self.cancelled:
+                break
+            pending.extend((resource, pool.submit(self._remove_quietly, resource, matches)) for resource in batch)
+            # Finish the previous batch while this one runs, so at most two batches are held at a time
+            while len(pending) > len(batch):
+                self._record(*pending.popleft(), results)
+        while pending:
+            self._record(*pending.popleft(), results)
+
+    def _remove_images(  # noqa: PLR0913, PLR0917
+        self,
+        images: list[Resource],
+        graph: ImageGraph,
+        results: dict[str, CleanupResult],
+        pool: ThreadPoolExecutor,
+        batch_size: int,
+        matches: Callable[[Resource], bool],
+    ) -> None:
+        """Remove images on ``pool`` children first, one wave of :meth:`ImageGraph.waves` after the other.
+
+        An image is not attempted when a descendant is kept or could not be removed, since the daemon would
+        refuse it. ``matches`` tells which tags of an image with several tags are selected. Each image removed
+        counts for the bytes it adds on top of its parent, see :meth:`ImageGraph.own_size`.
+        """
+        if not images:
+            return
+        result = results["images"]
+        waves, blocked = graph.waves(images)
+        for image in blocked:
+            self._record_outcome(image, DockerCommandError(f"{image.name} has child images that are kept"), results)
+        removed = len(result.removed)
+        failed: set[str] = set()
+        for wave in waves:
+            if self.cancelled:
+                break
+            for image in (image for image in wave if image.id in failed):
+                error = DockerCommandError(f"{image.name} has child images that could not be removed")
+                self._record_outcome(image, error, results)
+            failures = len(result.failures)
+            removable = (image for image in wave if image.id not in failed)
+            self._remove_stream(removable, results, pool, batch_size, matches)
+            for image, _ in result.failures[failures:]:
+                failed.update(graph.ancestors(image.id))
+        # Each removal was recorded with the full size of the image, its parent's layers included
+        result.reclaimed -= sum(image.size - graph.own_size(image) for image in result.removed[removed:])
+
+    def _record(self, resource: Resource, removal: Future, results: dict[str, CleanupResult]) -> None:
+        self._record_outcome(resource, removal.result(), results)
+
+    def _record_outcome(
+        self, resource: Resource, error: DockerCommandError | None, results: dict[str, CleanupResult]
+    ) -> None:
+        result = results[resource.kind]
+        if self.on_removal is not None:
+            self.on_removal(resource, error)
+        if error is not None:
+            result.failures.append((resource, error))
+            return
+        self.inventory.discard(resource)
+        result.removed.append(resource)
+        result.reclaimed += resource.size
+
+    def plan(
+        self,
+        cleanups: Sequence["CleanupSchema"],
+        resource_types: Iterable[str] = RESOURCE_TYPES,
+        free_at_least: int | None = None,
+    ) -> CleanupPlan:
+        """Compute what :meth:`clean_many` would remove, without removing anything.
+
+        Containers and volumes are listed with their sizes, so the plan tells how much it would reclaim.
+
+        Args:
+            cleanups: Cleanups whose matches are removed.
+            resource_types: Resource types to clean.
+            free_at_least: Only plan the largest matches, until they add up to this many bytes.
+
+        Raises:
+            DockerCommandError: If the daemon cannot be listed.
+        """
+        resource_types = [t for t in RESOURCE_TYPES if t in set(resource_types)]
+        inventory = self.inventory.get(sizes=True)
+        with profiling.span("engine.match"):
+            matches = inventory.match_any(cleanups, resource_types)
+        if free_at_least is not None:
+            matches = largest_first(matches, free_at_least)
+        return CleanupPlan.build(cleanups, matches, docker_host=self.client.base_url)
+
+    def execute(
+        self, plan: CleanupPlan, jobs: int = DEFAULT_JOBS, batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> dict[str, CleanupResult]:
+        """Remove the resources of a plan, one removal phase after the other, images children first.
+
+        A failure on one resource is recorded in the result and does not stop the others.
+        """
+        results = {t: CleanupResult(t, matched=len(plan.of_type(t))) for t in plan.resource_types}
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            for position, (phase, batch) in enumerate(zip(REMOVAL_PHASES, plan.phases(), strict=True)):
+                if self.cancelled:
+                    break
+                with profiling.span("engine.phase", phase=position + 1):
+                    for resource_type in (t for t in phase if t in results):
+                        results[resource_type].started_at = time.time()
+                    images = [resource for resource in batch if resource.kind == "images"]
+                    self._remove_stream((r for r in batch if r.kind != "images"), results, pool, batch_size)
+                    selects = _tag_matcher(plan.cleanups)
+                    self._remove_images(images, ImageGraph(images), results, pool, batch_size, selects)
+                    _finish(results, phase)
+        return results
@@ -22,7 +22,40 @@ class DatabaseError(DockerToolsError):
     pass
 
 
+class InvalidPlanError(DockerToolsError):
+    """Raised when a saved cleanup plan cannot be read or does not match the daemon."""
+
+    pass
+
+
 class DockerCommandError(DockerToolsError):
     """Raised when a Docker command fails."""
 
     pass
+
+
+class DockerAPIError(DockerCommandError):
+    """Raised when the Docker Engine API answers with an error status."""
+
+    def __init__(self, message: str, status_code: int) -> None:
+        """Keep the HTTP status the daemon answered with in ``status_code``."""
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ProfileExportError(DockerToolsError):
+    """Raised when a profile cannot be written or sent to a collector."""
+
+    pass
+
+
+class InvalidScheduleError(DockerToolsError):
+    """Raised when a cleanup schedule is not a valid cron expression or interval."""
+
+    pass
+
+
+class ControlSocketError(DockerToolsError):
+    """Raised when the control socket of a running server cannot be reached or answers with an error."""
+
+    pass
@@ -0,0 +1,123 @@
+import re
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from .database import CleanupSchema
+from .inventory import RESOURCE_TYPES, Inventory
+from .patterns import backtracking_risks
+
+DEFAULT_SAMPLES = 5
+# A cleanup selecting more than this share of the resources of a host is probably broader than meant
+BROAD_SELECTION_SHARE = 0.5
+
+
+@dataclass
+class TypeMatches:
+    """What a cleanup selects among the resources of one type."""
+
+    resource_type: str
+    total: int
+    matched: int
+    # Bytes the daemon reports for the selected resources; 0 when it does not report sizes
+    size: int
+    # Names of the first selected resources, in inventory order
+    samples: list[str]
+
+
+@dataclass
+class Explanation:
+    """What a cleanup would select on a host, and what evaluating its pattern costs."""
+
+    cleanup: CleanupSchema
+    # Seconds to compile the pattern, with the ``re`` cache emptied first
+    compile_seconds: float
+    # Seconds spent searching the pattern in every value it is matched against
+    match_seconds: float
+    # Values the pattern was searched in; a resource has one per match field and value
+    searched: int
+    types: list[TypeMatches]
+    warnings: list[str]
+
+    @property
+    def matched(self) -> int:
+        """Resources selected, all types together."""
+        return sum(t.matched for t in self.types)
+
+    @property
+    def total(self) -> int:
+        """Resources on the host, all types together."""
+        return sum(t.total for t in self.types)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Describe the explanation with built-in types, e.g. to serialize it to JSON."""
+        return {
+            "cleanup": self.cleanup.name,
+            "regular_expression": self.cleanup.regular_expression,
+            "match_fields": list(self.cleanup.match_fields),
+            "compile_seconds": round(self.compile_seconds, 6),
+            "match_seconds": round(self.match_seconds, 6),
+            "searched": self.searched,
+            "types": {
+                t.resource_type: {"total": t.total, "matched": t.matched, "size": t.size, "samples": t.samples}
+                for t in self.types
+            },
+            "warnings": self.warnings,
+        }
+
+
+def _time_search(pattern: re.Pattern, inventory: Inventory, fields: Iterable[str]) -> tuple[float, int]:
+    """Search a pattern once in every value it is matched against; return the seconds taken and the values searched."""
+    fields = tuple(fields)
+    columns = [value for t in RESOURCE_TYPES for values in inventory.column(t, fields) for value in values]
+    search = pattern.search
+    started = time.perf_counter()
+    for value in columns:
+        search(value)
+    return time.perf_counter() - started, len(columns)
+
+
+def explain(cleanup: CleanupSchema, inventory: Inventory, samples: int = DEFAULT_SAMPLES) -> Explanation:
+    """Evaluate a cleanup against an inventory without removing anything.
+
+    The selection is the one :meth:`Inventory.match` makes for a clean, filters and ``keep_latest`` included.
+    The timings are for the pattern alone: compiling it, then searching it once in every value of the fields
+    it is matched against.
+
+    Args:
+        cleanup: The cleanup to evaluate; it does not need to be saved.
+        inventory: Snapshot of the resources of a host.
+        samples: Names of selected resources to keep per type.
+    """
+    compile_seconds = match_seconds = 0.0
+    searched = 0
+    warnings = []
+    if cleanup.regular_expression:
+        re.purge()
+        started = time.perf_counter()
+        pattern = re.compile(cleanup.regular_expression)
+        compile_seconds = time.perf_counter() - started
+        match_seconds, searched = _time_search(pattern, inventory, cleanup.match_fields)
+        warnings.extend(f"The pattern has {risk}" for risk in backtracking_risks(cleanup.regular_expression))
+        if pattern.search("") is not None:
+            warnings.append("The pattern matches an empty string, so it matches every resource on its own")
+
+    selection = inventory.match([cleanup])[0]
+    types = [
+        TypeMatches(
+            resource_type=t,
+            total=len(inventory.of_type(t)),
+            matched=len(selection[t]),
+            size=sum(r.size for r in selection[t]),
+            samples=[r.name for r in selection[t][:samples]],
+        )
+        for t in RESOURCE_TYPES
+    ]
+    explanation = Explanation(cleanup, compile_seconds, match_seconds, searched, types, warnings)
+    if explanation.total and explanation.matched / explanation.total > BROAD_SELECTION_SHARE:
+        warnings.append(
+            f"The cleanup selects {explanation.matched} of the {explanation.total} resources of the host; "
+            "check it is not broader than meant"
+        )
+    return explanation
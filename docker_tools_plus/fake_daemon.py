@@ -0,0 +1,440 @@
+"""In-process fake of the Docker Engine API, served over a Unix socket or TCP.
+
+Used by the test suite and by ``docker-tools-plus bench``. It implements only what the client needs:
+listing, inspecting, removing and pruning containers, volumes and images, the system information, the
+disk usage and the event stream. Like the real daemon, it only reports the size of containers when
+listing them with ``size=1``, and the size of volumes in the disk usage.
+"""
+
+import datetime
+import json
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from urllib.parse import parse_qs, unquote, urlparse
+
+if TYPE_CHECKING:
+    from typing_extensions import Self
+
+# Bytes written at a time when ``chunk_delay`` slows a response down.
+RESPONSE_CHUNK_SIZE = 4096
+# Events kept for replays from ``since``, as the daemon does; older ones are lost
+EVENT_BUFFER = 256
+# Event type of each resource type
+EVENT_TYPES = {"containers": "container", "volumes": "volume", "images": "image"}
+
+
+class FakeDockerDaemon:
+    """Serve a tiny subset of the Docker Engine API from in-memory containers, volumes and images.
+
+    Use it as a context manager; ``base_url`` is the host to give to :class:`~.docker_client.DockerClient`.
+    """
+
+    def __init__(
+        self,
+        containers: list[dict] | None = None,
+        volumes: list[dict] | None = None,
+        images: list[dict] | None = None,
+        tcp: bool = False,
+        latency: float = 0.0,
+    ) -> None:
+        """Serve the given resources once entered.
+
+        Args:
+            containers: Container objects, as listed by the daemon.
+            volumes: Volume objects, as listed by the daemon.
+            images: Image objects, as listed by the daemon.
+            tcp: Listen on a local TCP port instead of a Unix socket.
+            latency: Seconds to wait before answering each request.
+        """
+        self.containers = {c["Id"]: c for c in containers or []}
+        self.volumes = {v["Name"]: v for v in volumes or []}
+        self.images = {i["Id"]: i for i in images or []}
+        self.requests: list[tuple[str, str]] = []
+        self.connections = 0
+        self.fail_deletes: dict[str, int] = {}
+        # Resource types whose prune endpoint answers 400, like daemons that reject a filter
+        self.reject_prunes: set[str] = set()
+        # Seconds to wait before answering any request, to simulate a remote or busy daemon
+        self.latency = latency
+        # Seconds to wait between chunks of a response body, to simulate a slow listing
+        self.chunk_delay = 0.0
+        # ("start" | "end", method, path) in the order requests were received and fully answered
+        self.timeline: list[tuple[str, str, str]] = []
+        self.lock = threading.Lock()
+        # Every event emitted, in order; streams wait on ``events_changed`` for new ones
+        self.events: list[dict] = []
+        self.events_changed = threading.Condition(self.lock)
+        # Reported by /info; a restarted or different daemon has another ID
+        self.daemon_id = "FAKE:DAEMON"
+        self._stream_generation = 0
+        self._closed = False
+        self.tcp = tcp
+        self._usage: tuple[int, set[str], set[str]] | None = None
+        self._tmpdir = tempfile.mkdtemp(prefix="dtp", dir="/tmp")
+        self.socket_path = str(Path(self._tmpdir) / "docker.sock")
+        self.base_url = f"unix://{self.socket_path}"
+        self._server = None
+        self._thread = None
+
+    def __enter__(self) -> "Self":
+        """Start serving in a background thread."""
+        daemon = self
+
+        class Handler(_Handler):
+            fake = daemon
+
+        if self.tcp:
+            self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+            self.base_url = f"tcp://127.0.0.1:{self._server.server_address[1]}"
+        else:
+            self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Stop serving, ending the open event streams."""
+        with self.lock:
+            self._closed = True
+            self.events_changed.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+        shutil.rmtree(self._tmpdir, ignore_errors=True)
+
+    def _stores(self) -> dict[str, dict[str, dict]]:
+        return {"containers": self.containers, "volumes": self.volumes, "images": self.images}
+
+    def handle(self, method: str, path: str, query: str) -> tuple[int, Any]:  # noqa: PLR0911, PLR0912
+        """Return ``(status, payload)`` for a request."""
+        with self.lock:
+            self.requests.append((method, path))
+            self.timeline.append(("start", method, path))
+            parts = [unquote(p) for p in path.strip("/").split("/")]
+            params = parse_qs(query)
+            filters = json.loads(params.get("filters", ["{}"])[0])
+            if method == "DELETE" and parts[-1] in self.fail_deletes:
+                return self.fail_deletes[parts[-1]], {"message": f"cannot remove {parts[-1]}"}
+            if method == "GET" and parts == ["containers", "json"]:
+                ids = filters.get("id")
+                containers = [c for c in self.containers.values() if not ids or c["Id"].startswith(tuple(ids))]
+                if params.get("size") != ["1"]:
+                    containers = [_without(c, "SizeRw", "SizeRootFs") for c in containers]
+                return 200, containers
+            if method == "GET" and parts == ["volumes"]:
+                names = filters.get("name")
+                volumes = [v for v in self.volumes.values() if not names or any(n in v["Name"] for n in names)]
+                return 200, {"Volumes": [_without(v, "UsageData") for v in volumes], "Warnings": None}
+            if method == "GET" and parts == ["images", "json"]:
+                return 200, list(self.images.values())
+            if method == "GET" and parts == ["info"]:
+                return 200, self._info()
+            if method == "GET" and parts == ["system", "df"]:
+                return 200, self._disk_usage(params.get("type"))
+            if method == "GET" and len(parts) == 3 and parts[0] == "images" and parts[2] == "json":  # noqa: PLR2004
+                return self._inspect_image(parts[1])
+            if method == "POST" and len(parts) == 2 and parts[1] == "prune":  # noqa: PLR2004
+                return self._prune(parts[0], filters)
+            if method == "DELETE" and len(parts) == 2 and parts[0] == "images":  # noqa: PLR2004
+                return self._delete_image(parts[1])
+            if method == "DELETE" and len(parts) == 2:  # noqa: PLR2004
+                store = self._stores().get(parts[0])
+                if store is None or parts[1] not in store:
+                    return 404, {"message": f"No such object: {parts[1]}"}
+                if self._in_use(parts[0], parts[1]):
+                    return 409, {"message": f"{parts[1]} is in use by a container"}
+                self._delete(parts[0], parts[1])
+                return 204, None
+            return 404, {"message": f"page not found: {path}"}
+
+    def create(self, kind: str, obj: dict) -> None:
+        """Add a container, volume or image as if it was created on the daemon, and emit its event."""
+        with self.lock:
+            key = obj["Name"] if kind == "volumes" else obj["Id"]
+            self._stores()[kind][key] = obj
+            self._usage = None
+            self._emit(kind, "pull" if kind == "images" else "create", key)
+
+    def emit(self, kind: str, action: str, actor_id: str) -> None:
+        """Emit an event without changing anything, e.g. the ``tag`` event of an image changed in place."""
+        with self.lock:
+            self._emit(kind, action, actor_id)
+
+    def drop_event_streams(self) -> None:
+        """End every open event stream, as a daemon restart would."""
+        with self.lock:
+            self._stream_generation += 1
+            self.events_changed.notify_all()
+
+    def subscribe(self, since: float | None = None) -> tuple[int, int]:
+        """Return the position a new event stream starts from and the generation of streams it belongs to.
+
+        The stream starts from now on, or with the first event emitted at or after ``since`` among the last
+        :data:`EVENT_BUFFER`.
+        """
+        with self.lock:
+            self.requests.append(("GET", "/events"))
+            position = len(self.events)
+            if since is not None:
+                position = next((i for i, e in enumerate(self.events) if e["timeNano"] >= since * 1e9), position)
+                position = max(position, len(self.events) - EVENT_BUFFER)
+            return position, self._stream_generation
+
+    def events_until(self, position: int, until: float) -> list[dict]:
+        """Return the events after ``position`` emitted up to ``until``, without waiting for more."""
+        with self.lock:
+            return [e for e in self.events[position:] if e["timeNano"] <= until * 1e9]
+
+    def next_events(self, position: int, generation: int) -> list[dict] | None:
+        """Wait for the events after ``position``; ``None`` once the daemon stops or drops the streams."""
+        with self.events_changed:
+            self.events_changed.wait_for(
+                lambda: len(self.events) > position or self._closed or self._stream_generation != generation
+            )
+            if self._closed or self._stream_generation != generation:
+                return None
+            return self.events[position:]
+
+    def _emit(self, kind: str, action: str, actor_id: str) -> None:
+        now = time.time_ns()
+        self.events.append(
+            {
+                "Type": EVENT_TYPES[kind],
+                "Action": action,
+                "Actor": {"ID": actor_id, "Attributes": {}},
+                "time": now // 1_000_000_000,
+                "timeNano": now,
+            }
+        )
+        self.events_changed.notify_all()
+
+    def _delete(self, kind: str, key: str) -> None:
+        obj = self._stores()[kind].pop(key)
+        if kind == "containers":
+            self._usage = None
+            self._emit(kind, "destroy", key)
+        elif kind == "volumes":
+            self._emit(kind, "destroy", key)
+        else:
+            for tag in obj.get("RepoTags") or ():
+                if tag != "<none>:<none>":
+                    self._emit(kind, "untag", key)
+            self._emit(kind, "delete", key)
+
+    def _disk_usage(self, object_types: list[str] | None) -> dict[str, Any]:
+        """Answer ``/system/df``, only about ``object_types`` if given, as daemons since API 1.42 do."""
+        images = list(self.images.values())
+        volumes = [{**v, "UsageData": v.get("UsageData") or {"Size": 0, "RefCount": 0}} for v in self.volumes.values()]
+        usage = {
+            "image": {"LayersSize": sum(i.get("Size", 0) for i in images), "Images": images},
+            "container": {"Containers": list(self.containers.values())},
+            "volume": {"Volumes": volumes},
+        }
+        return {
+            key: value
+            for object_type, part in usage.items()
+            if not object_types or object_type in object_types
+            for key, value in part.items()
+        }
+
+    def _delete_image(self, reference: str) -> tuple[int, Any]:
+        """Remove an image by ID, or untag it by tag, refusing what the real daemon refuses without force."""
+        found = self.images.get(reference) or next(
+            (i for i in self.images.values() if reference in (i.get("RepoTags") or ())), None
+        )
+        if found is None:
+            return 404, {"message": f"No such image: {reference}"}
+        key = found["Id"]
+        tags = [t for t in found.get("RepoTags") or () if t != "<none>:<none>"]
+        if reference != key and len(tags) > 1:
+            found["RepoTags"] = [t for t in tags if t != reference]
+            self._emit("images", "untag", key)
+            return 200, [{"Untagged": reference}]
+        if len(tags) > 1:
+            return 409, {
+                "message": f"conflict: unable to delete {key} (must be forced) - image is referenced in multiple "
+                "repositories"
+            }
+        if any(i.get("ParentId") == key for i in self.images.values()):
+            return 409, {
+                "message": f"conflict: unable to delete {key} (cannot be forced) - image has dependent child images"
+            }
+        if self._in_use("images", key):
+            return 409, {"message": f"{key} is in use by a container"}
+        self._delete("images", key)
+        return 200, [*({"Untagged": tag} for tag in tags), {"Deleted": key}]
+
+    def _info(self) -> dict[str, Any]:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        return {
+            "ID": self.daemon_id,
+            "Containers": len(self.containers),
+            "Images": len(self.images),
+            "SystemTime": now.isoformat().replace("+00:00", "Z"),
+        }
+
+    def _inspect_image(self, reference: str) -> tuple[int, Any]:
+        found = self.images.get(reference) or next(
+            (i for i in self.images.values() if reference in (i.get("RepoTags") or ())), None
+        )
+        if found is None:
+            return 404, {"message": f"No such image: {reference}"}
+        created = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(found.get("Created", 0)))
+        return 200, {
+            "Id": found["Id"],
+            "RepoTags": [t for t in found.get("RepoTags") or () if t != "<none>:<none>"],
+            "Created": created,
+            "Size": found.get("Size", 0),
+            "Config": {"Labels": found.get("Labels")},
+        }
+
+    def _prune(self, kind: str, filters: dict[str, list[str]]) -> tuple[int, Any]:
+        if kind in self.reject_prunes or (kind == "volumes" and "until" in filters):
+            return 400, {"message": "invalid filter"}
+        store = self._stores()[kind]
+        deleted, reclaimed = [], 0
+        for key, obj in list(store.items()):
+            labels = obj.get("Labels") or {}
+            if not all(_label_matches(labels, spec) for spec in filters.get("label", [])):
+                continue
+            if any(_label_matches(labels, spec) for spec in filters.get("label!", [])):
+                continue
+            if "until" in filters and obj.get("Created", 0) > time.time() - _seconds(filters["until"][0]):
+                continue
+            if kind == "containers" and obj.get("State") == "running":
+                continue
+            if kind == "images" and filters.get("dangling") != ["false"] and obj["RepoTags"] != ["<none>:<none>"]:
+                continue
+            if self._in_use(kind, key):
+                continue
+            self._delete(kind, key)
+            deleted.append(key)
+            reclaimed += obj.get("SizeRw") or obj.get("Size") or (obj.get("UsageData") or {}).get("Size", 0)
+        if kind == "images":
+            deleted = [{"Deleted": key} for key in deleted]
+        names = {"containers": "ContainersDeleted", "volumes": "VolumesDeleted", "images": "ImagesDeleted"}
+        return 200, {names[kind]: deleted or None, "SpaceReclaimed": reclaimed}
+
+    def _in_use(self, kind: str, key: str) -> bool:
+        if kind == "containers":
+            return False
+        # Indexed once per set of containers, so removing N volumes or images stays O(N)
+        if self._usage is None or self._usage[0] != len(self.containers):
+            volumes = {m.get("Name") for c in self.containers.values() for m in c.get("Mounts") or ()}
+            images = {c.get("ImageID") for c in self.containers.values()}
+            self._usage = (len(self.containers), volumes, images)
+        return key in (self._usage[1] if kind == "volumes" else self._usage[2])
+
+
+def _without(obj: dict, *keys: str) -> dict:
+    return {key: value for key, value in obj.items() if key not in keys}
+
+
+def _label_matches(labels: dict[str, str], spec: str) -> bool:
+    key, sep, value = spec.partition("=")
+    return key in labels and (not sep or labels[key] == value)
+
+
+def _seconds(duration: str) -> int:
+    return int(duration[:-1]) * {"h": 3600, "m": 60, "s": 1}[duration[-1]]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    fake: FakeDockerDaemon
+
+    def setup(self) -> None:
+        super().setup()
+        with self.fake.lock:
+            self.fake.connections += 1
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        pass
+
+    def _dispatch(self) -> None:
+        url = urlparse(self.path)
+        if self.command == "GET" and url.path == "/events":
+            self._stream_events(url.query)
+            return
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+        status, payload = self.fake.handle(self.command, url.path, url.query)
+        body = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.fake.chunk_delay:
+            for start in range(0, len(body), RESPONSE_CHUNK_SIZE):
+                self.wfile.write(body[start : start + RESPONSE_CHUNK_SIZE])
+                self.wfile.flush()
+                time.sleep(self.fake.chunk_delay)
+        else:
+            self.wfile.write(body)
+        with self.fake.lock:
+            self.fake.timeline.append(("end", self.command, url.path))
+
+    def _stream_events(self, query: str) -> None:
+        """Send the events emitted from now on, or from ``since``, in chunks.
+
+        The stream ends once the events up to ``until`` are sent, or when the daemon stops or drops the streams.
+        """
+        params = parse_qs(query)
+        filters = json.loads(params.get("filters", ["{}"])[0])
+        since, until = (float(params[key][0]) if key in params else None for key in ("since", "until"))
+        position, generation = self.fake.subscribe(since)
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.wfile.flush()
+        try:
+            if until is not None:
+                body = b"".join(
+                    json.dumps(e).encode() + b"\n"
+                    for e in self.fake.events_until(position, until)
+                    if _event_matches(e, filters)
+                )
+                if body:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(body), body))
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            while (events := self.fake.next_events(position, generation)) is not None:
+                position += len(events)
+                body = b"".join(json.dumps(e).encode() + b"\n" for e in events if _event_matches(e, filters))
+                if body:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(body), body))
+                    self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            pass
+
+    do_GET = do_POST = do_DELETE = _dispatch  # noqa: N815
+
+
+def _event_matches(event: dict, filters: dict[str, list[str]]) -> bool:
+    return event["Type"] in filters.get("type", [event["Type"]]) and event["Action"] in filters.get(
+        "event", [event["Action"]]
+    )
+
+
+def container(container_id: str, name: str, image: str = "alpine:latest", **extra: Any) -> dict:  # noqa: ANN401
+    """Build a container as listed by ``GET /containers/json``."""
+    return {"Id": container_id, "Names": [f"/{name}"], "Image": image, "Labels": {}, **extra}
+
+
+def volume(name: str, **extra: Any) -> dict:  # noqa: ANN401
+    """Build a volume as listed by ``GET /volumes``."""
+    return {"Name": name, "Driver": "local", "Labels": None, **extra}
+
+
+def image(image_id: str, *tags: str, **extra: Any) -> dict:  # noqa: ANN401
+    """Build an image as listed by ``GET /images/json``."""
+    return {"Id": image_id, "RepoTags": list(tags) or ["<none>:<none>"], "Labels": None, **extra}
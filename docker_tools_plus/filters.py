@@ -0,0 +1,168 @@
+import datetime
+import re
+import time
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
+
+from .exceptions import InvalidCleanupError
+
+if TYPE_CHECKING:
+    from .database import CleanupSchema
+    from .inventory import Resource
+
+# Resource fields a cleanup pattern can be matched against instead of the whole search text
+MATCH_FIELDS = ("id", "name", "image", "tag", "label", "driver")
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+_SIZE = re.compile(r"(\d+(?:\.\d+)?)\s*([kmgt]i?)?b?", re.IGNORECASE)
+# Decimal units, as printed by ``docker system df``, and binary ones
+_SIZE_UNITS = {
+    "": 1,
+    "k": 10**3,
+    "m": 10**6,
+    "g": 10**9,
+    "t": 10**12,
+    "ki": 2**10,
+    "mi": 2**20,
+    "gi": 2**30,
+    "ti": 2**40,
+}
+
+
+def parse_duration(text: str) -> float:
+    """Parse a Go-style duration such as ``24h`` or ``1h30m``, as accepted by the daemon's ``until`` filter.
+
+    Returns:
+        The duration in seconds.
+
+    Raises:
+        InvalidCleanupError: If ``text`` is not a duration.
+    """
+    position, seconds = 0, 0.0
+    for part in _DURATION_PART.finditer(text):
+        if part.start() != position:
+            break
+        seconds += float(part.group(1)) * _DURATION_UNITS[part.group(2)]
+        position = part.end()
+    if not text or position != len(text):
+        raise InvalidCleanupError(f"Invalid duration '{text}'. Use a number followed by h, m or s, e.g. 24h.")
+    return seconds
+
+
+def parse_size(text: str) -> int:
+    """Parse a size such as ``500MB``, ``20GB`` or ``1.5GiB``; a bare number is a count of bytes.
+
+    Returns:
+        The size in bytes.
+
+    Raises:
+        InvalidCleanupError: If ``text`` is not a size.
+    """
+    match = _SIZE.fullmatch(text.strip())
+    if match is None:
+        raise InvalidCleanupError(f"Invalid size '{text}'. Use a number followed by kB, MB, GB or TB, e.g. 20GB.")
+    return int(float(match.group(1)) * _SIZE_UNITS[(match.group(2) or "").lower()])
+
+
+def parse_label(spec: str) -> tuple[str, str | None, bool]:
+    """Split a label filter into ``(key, value, negated)``.
+
+    ``key`` and ``key=value`` select resources with that label; a leading ``!`` selects those without it.
+    """
+    negated = spec.startswith("!")
+    key, sep, value = spec.removeprefix("!").partition("=")
+    if not key:
+        raise InvalidCleanupError(f"Invalid label filter '{spec}'. Use key, key=value, !key or !key=value.")
+    return key, value if sep else None, negated
+
+
+def image_tag(reference: str) -> str:
+    """Return the tag of an image reference such as ``registry:5000/app:1.2``, or ``""`` when it has none."""
+    if reference.startswith("sha256:") or "@" in reference:
+        return ""
+    name, _, tag = reference.rpartition(":")
+    return tag if name and "/" not in tag else ""
+
+
+def field_values(resource: "Resource", field: str) -> tuple[str, ...]:
+    """Return the values of one of the :data:`MATCH_FIELDS` of a resource.
+
+    ``image`` is the image a container runs, or the references of an image; ``tag`` their tags only;
+    ``label`` is every label as ``key=value``; ``driver`` is the driver of a volume.
+    """
+    if field == "id":
+        return (resource.id,)
+    if field == "name":
+        return resource.names
+    if field == "label":
+        return tuple(f"{key}={value}" for key, value in resource.labels.items())
+    if field == "driver":
+        return (resource.driver,) if resource.driver else ()
+    references = resource.names if resource.kind == "images" else (resource.image,) if resource.image else ()
+    if field == "image":
+        return references
+    return tuple(tag for tag in map(image_tag, references) if tag)
+
+
+def match_values(resource: "Resource", fields: Sequence[str]) -> tuple[str, ...]:
+    """Return the text a cleanup pattern is searched in.
+
+    These are the values of ``fields``, or by default the resource's ``search_text``.
+    """
+    if not fields:
+        return (resource.search_text,)
+    if len(fields) == 1:
+        return field_values(resource, fields[0])
+    return tuple(value for field in fields for value in field_values(resource, field))
+
+
+def parse_timestamp(value: str | float | None) -> float:
+    """Convert a Unix timestamp or an RFC 3339 date (as used for volumes) to seconds since the epoch."""
+    if not value:
+        return 0.0
+    if isinstance(value, int | float):
+        return float(value)
+    # Python before 3.11 accepts neither a trailing Z nor nanoseconds
+    text = re.sub(r"(\.\d{6})\d+", r"\1", value.replace("Z", "+00:00"))
+    try:
+        return datetime.datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def matches_filters(cleanup: "CleanupSchema", resource: "Resource", now: float | None = None) -> bool:
+    """Whether a resource passes the label, age and size filters of a cleanup."""
+    for spec in cleanup.labels:
+        key, value, negated = parse_label(spec)
+        present = key in resource.labels and (value is None or resource.labels[key] == value)
+        if present == negated:
+            return False
+    if cleanup.until is not None:
+        now = time.time() if now is None else now
+        if not resource.created or resource.created > now - parse_duration(cleanup.until):
+            return False
+    return cleanup.min_size is None or resource.size >= cleanup.min_size
+
+
+def prune_filters(cleanup: "CleanupSchema", resource_type: str) -> dict[str, list[str]] | None:
+    """Translate the filters of a cleanup into the ``filters`` of a ``/<type>/prune`` call.
+
+    Returns:
+        The filters, or ``None`` when the daemon cannot prune this resource type with them
+        (volumes have no ``until`` filter).
+    """
+    filters: dict[str, list[str]] = {}
+    for spec in cleanup.labels:
+        key, value, negated = parse_label(spec)
+        filters.setdefault("label!" if negated else "label", []).append(key if value is None else f"{key}={value}")
+    if cleanup.until is not None:
+        if resource_type == "volumes":
+            return None
+        filters["until"] = [cleanup.until]
+    if resource_type == "images":
+        # Without it only dangling images are pruned
+        filters["dangling"] = ["false"]
+    elif resource_type == "volumes":
+        # Since API 1.42 only anonymous volumes are pruned unless asked otherwise
+        filters["all"] = ["true"]
+    return filters
@@ -0,0 +1,168 @@
+import asyncio
+import functools
+import threading
+import time
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from . import profiling
+from .docker_client import DockerClient
+from .engine import DEFAULT_BATCH_SIZE, DEFAULT_JOBS, CleanupEngine, CleanupResult
+from .exceptions import DockerCommandError, DockerToolsError
+from .inventory import RESOURCE_TYPES, Resource
+
+if TYPE_CHECKING:
+    from .database import CleanupSchema
+
+# Called with the host, the resource and the error that prevented its removal, or None
+HostRemovalListener = Callable[[str, Resource, DockerCommandError | None], None]
+
+
+@dataclass
+class HostResult:
+    """Outcome of running cleanups against one Docker daemon."""
+
+    host: str
+    results: dict[str, CleanupResult] = field(default_factory=dict)
+    error: DockerToolsError | None = None
+    duration: float = 0.0
+
+    @property
+    def removed(self) -> int:
+        """Number of resources removed on the host."""
+        return sum(len(result.removed) for result in self.results.values())
+
+    @property
+    def failed(self) -> int:
+        """Number of resources the host refused to remove."""
+        return sum(len(result.failures) for result in self.results.values())
+
+    @property
+    def reclaimed(self) -> int:
+        """Bytes freed on the host."""
+        return sum(result.reclaimed for result in self.results.values())
+
+    @property
+    def sized(self) -> bool:
+        """Whether :attr:`reclaimed` counts every resource removed; see :attr:`CleanupResult.sized`."""
+        return all(result.sized for result in self.results.values())
+
+    @property
+    def first_error(self) -> DockerToolsError | None:
+        """The error that stopped the host or one of its resource types, if any."""
+        if self.error is not None:
+            return self.error
+        return next((result.error for result in self.results.values() if result.error is not None), None)
+
+    @property
+    def ok(self) -> bool:
+        """Whether every resource type was cleaned without any error."""
+        return self.error is None and all(result.ok for result in self.results.values())
+
+
+def clean_host(  # noqa: PLR0913
+    host: str,
+    cleanups: Sequence["CleanupSchema"],
+    resource_types: Iterable[str] = RESOURCE_TYPES,
+    *,
+    jobs: int = DEFAULT_JOBS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    timeout: float | None = None,
+    on_removal: HostRemovalListener | None = None,
+    rate_limit: float | None = None,
+    cancel: threading.Event | None = None,
+) -> HostResult:
+    """Run cleanups against one daemon over its own connections.
+
+    ``timeout`` bounds every socket operation, so an unreachable or stalled host fails on its own.
+    ``on_removal`` is told about each resource of the host as soon as it is removed or fails to be.
+    ``rate_limit`` caps the removal requests per second sent to the host. Setting ``cancel`` stops the
+    run after the batch of removals under way.
+    """
+    start = time.perf_counter()
+    outcome = HostResult(host)
+    try:
+        with profiling.span("fleet.host", host=host), DockerClient(host, timeout=timeout) as client:
+            listener = functools.partial(on_removal, host) if on_removal is not None else None
+            engine = CleanupEngine(client, on_removal=listener, rate_limit=rate_limit, cancel=cancel)
+            outcome.results = engine.clean_many(cleanups, resource_types, jobs, batch_size)
+    except DockerToolsError as e:
+        outcome.error = e
+    outcome.duration = time.perf_counter() - start
+    return outcome
+
+
+async def clean_hosts(  # noqa: PLR0913
+    hosts: Iterable[str],
+    cleanups: Sequence["CleanupSchema"],
+    resource_types: Iterable[str] = RESOURCE_TYPES,
+    *,
+    jobs: int = DEFAULT_JOBS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    timeout: float | None = None,
+    on_removal: HostRemovalListener | None = None,
+    rate_limit: float | None = None,
+    deadline: float | None = None,
+) -> list[HostResult]:
+    """Run cleanups against every host concurrently.
+
+    Each host is cleaned by the synchronous engine on a thread of its own, so a slow daemon never holds
+    up the others. Results are returned in the order the hosts were given, duplicates removed.
+    ``timeout`` only bounds each socket operation; ``deadline`` bounds the whole run of each host, in
+    seconds. A host past its deadline is stopped after the batch of removals under way, and reported
+    with an error next to what it removed until then.
+    """
+    hosts = list(dict.fromkeys(hosts))
+    resource_types = list(resource_types)
+    if not hosts:
+        return []
+    loop = asyncio.get_running_loop()
+    run = functools.partial(
+        clean_host, jobs=jobs, batch_size=batch_size, timeout=timeout, on_removal=on_removal, rate_limit=rate_limit
+    )
+
+    async def run_host(executor: ThreadPoolExecutor, host: str) -> HostResult:
+        cancel = threading.Event()
+        outcome = loop.run_in_executor(executor, functools.partial(run, cancel=cancel), host, cleanups, resource_types)
+        try:
+            # Shielded, so the host's thread can be told to stop and its partial results collected
+            return await asyncio.wait_for(asyncio.shield(outcome), deadline)
+        except asyncio.TimeoutError:
+            cancel.set()
+            result = await outcome
+            if result.error is None:
+                result.error = DockerCommandError(f"Cleaning {host} did not finish within {deadline:g}s")
+            return result
+
+    with ThreadPoolExecutor(max_workers=len(hosts), thread_name_prefix="docker-host") as executor:
+        return list(await asyncio.gather(*(run_host(executor, host) for host in hosts)))
+
+
+def run_fleet(  # noqa: PLR0913
+    hosts: Iterable[str],
+    cleanups: Sequence["CleanupSchema"],
+    resource_types: Iterable[str] = RESOURCE_TYPES,
+    *,
+    jobs: int = DEFAULT_JOBS,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    timeout: float | None = None,
+    on_removal: HostRemovalListener | None = None,
+    rate_limit: float | None = None,
+    deadline: float | None = None,
+) -> list[HostResult]:
+    """Blocking entry point for :func:`clean_hosts`."""
+    return asyncio.run(
+        clean_hosts(
+            hosts,
+            cleanups,
+            resource_types,
+            jobs=jobs,
+            batch_size=batch_size,
+            timeout=timeout,
+            on_removal=on_removal,
+            rate_limit=rate_limit,
+            deadline=deadline,
+        )
+    )
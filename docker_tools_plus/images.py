@@ -0,0 +1,73 @@
+from collections.abc import Iterable, Iterator, Sequence
+
+from .inventory import Resource
+
+
+class ImageGraph:
+    """Parent/child links between images, from the parent each image reports.
+
+    The daemon refuses to remove an image while a child image built on top of it exists, so images are
+    removed in waves: the leaves first, then the images whose children all went in earlier waves. Images
+    pulled from a registry have no parent; only images built or committed locally do.
+    """
+
+    def __init__(self, images: Iterable[Resource]) -> None:
+        """Link the images of a host, all of them, not only those to remove."""
+        images = list(images)
+        self.parents = {image.id: image.parent for image in images}
+        self.sizes = {image.id: image.size for image in images}
+
+    def own_size(self, image: Resource) -> int:
+        """Bytes of the layers an image adds on top of its parent.
+
+        The size the daemon reports for an image includes the layers of its parent, so adding up the sizes of
+        a child and its parent counts the parent's layers twice. Layers shared by images without a common
+        parent, e.g. a base image pulled under two names, cannot be told apart and are counted for each.
+        """
+        return max(image.size - self.sizes.get(image.parent, 0), 0)
+
+    def ancestors(self, image_id: str) -> Iterator[str]:
+        """Yield the parent of an image, then the parent of that one, and so on."""
+        seen = {image_id}
+        parent = self.parents.get(image_id, "")
+        while parent and parent not in seen:
+            seen.add(parent)
+            yield parent
+            parent = self.parents.get(parent, "")
+
+    def waves(self, images: Sequence[Resource]) -> tuple[list[list[Resource]], list[Resource]]:
+        """Order the removal of images so that each one comes after all of its children.
+
+        Args:
+            images: The images to remove; the graph may know more, which are kept.
+
+        Returns:
+            The waves, leaves first: the images of a wave only have children in earlier waves, so they can be
+            removed concurrently. Then the images that cannot be removed because a descendant is kept.
+        """
+        selected = {image.id: image for image in images}
+        blocked: set[str] = set()
+        for image_id in self.parents.keys() - selected.keys():
+            for ancestor in self.ancestors(image_id):
+                if ancestor in blocked:
+                    break
+                if ancestor in selected:
+                    blocked.add(ancestor)
+
+        removable = [image for image in selected.values() if image.id not in blocked]
+        pending = dict.fromkeys((image.id for image in removable), 0)
+        for image in removable:
+            if image.parent in pending:
+                pending[image.parent] += 1
+        waves = []
+        wave = [image for image in removable if not pending[image.id]]
+        while wave:
+            waves.append(wave)
+            following = []
+            for image in wave:
+                if image.parent in pending:
+                    pending[image.parent] -= 1
+                    if not pending[image.parent]:
+                        following.append(selected[image.parent])
+            wave = following
+        return waves, [image for image in selected.values() if image.id in blocked]
@@ -0,0 +1,603 @@
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from . import profiling
+from .exceptions import DockerAPIError, DockerToolsError
+from .filters import match_values, matches_filters, parse_timestamp
+from .patterns import PatternIndex, combine_patterns
+
+if TYPE_CHECKING:
+    from .database import CleanupSchema
+    from .docker_client import DockerClient, EventStream
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_TYPES = ("containers", "volumes", "images")
+DEFAULT_INVENTORY_TTL = 5.0
+# Resource type of each event type the inventory follows
+EVENT_TYPES = {"container": "containers", "volume": "volumes", "image": "images"}
+# Event actions that change what a listing would show; start, stop, exec and the like do not
+EVENT_ACTIONS = ("create", "destroy", "rename", "pull", "import", "load", "tag", "untag", "delete")
+REMOVAL_ACTIONS = ("destroy", "delete")
+# Seconds to wait before subscribing again after the event stream was lost
+RECONNECT_DELAY = 1.0
+
+
+@dataclass(frozen=True, slots=True)
+class Resource:
+    """A Docker container, volume or image as seen by the cleanup engine."""
+
+    kind: str
+    id: str
+    names: tuple[str, ...] = ()
+    image: str = ""
+    labels: dict[str, str] = field(default_factory=dict, compare=False, hash=False)
+    size: int = field(default=0, compare=False)
+    created: float = field(default=0.0, compare=False)
+    driver: str = field(default="", compare=False)
+    # ID of the image an image was built on top of; only images built or committed locally have one
+    parent: str = field(default="", compare=False)
+
+    @property
+    def name(self) -> str:
+        """Primary display name of the resource."""
+        return self.names[0] if self.names else self.id
+
+    @property
+    def search_text(self) -> str:
+        """Text a cleanup pattern is matched against.
+
+        Mirrors the columns the old ``docker ... ls | grep`` pipelines saw that identify a resource.
+        """
+        return " ".join((self.id, *self.names, self.image)).strip()
+
+
+def container_from_api(data: dict[str, Any]) -> Resource:
+    """Build a container resource from a ``/containers/json`` entry; it is only sized if listed with ``size``."""
+    return Resource(
+        kind="containers",
+        id=data["Id"],
+        names=tuple(n.lstrip("/") for n in data.get("Names") or ()),
+        image=data.get("Image", ""),
+        labels=data.get("Labels") or {},
+        size=data.get("SizeRw") or 0,
+        created=parse_timestamp(data.get("Created")),
+    )
+
+
+def volume_from_api(data: dict[str, Any]) -> Resource:
+    """Build a volume resource from a ``/volumes`` entry; only :func:`volume_usage` fills in its size."""
+    # The daemon reports -1 when it has not computed the usage of a volume
+    size = max((data.get("UsageData") or {}).get("Size", 0), 0)
+    return Resource(
+        kind="volumes",
+        id=data["Name"],
+        names=(data["Name"],),
+        labels=data.get("Labels") or {},
+        size=size,
+        created=parse_timestamp(data.get("CreatedAt")),
+        driver=data.get("Driver") or "",
+    )
+
+
+def image_from_api(data: dict[str, Any]) -> Resource:
+    """Build an image resource from an ``/images/json`` entry."""
+    tags = tuple(t for t in data.get("RepoTags") or () if t != "<none>:<none>")
+    return Resource(
+        kind="images",
+        id=data["Id"],
+        names=tags,
+        labels=data.get("Labels") or {},
+        size=data.get("Size", 0),
+        created=parse_timestamp(data.get("Created")),
+        parent=data.get("ParentId") or "",
+    )
+
+
+def image_from_inspect(data: dict[str, Any]) -> Resource:
+    """Build an image resource from an ``/images/{id}/json`` answer."""
+    return image_from_api(
+        {
+            "Id": data["Id"],
+            "RepoTags": data.get("RepoTags"),
+            "Labels": (data.get("Config") or {}).get("Labels"),
+            "Size": data.get("Size", 0),
+            "Created": data.get("Created"),
+            "ParentId": data.get("Parent"),
+        }
+    )
+
+
+def volume_usage(client: "DockerClient") -> dict[str, dict[str, Any]]:
+    """Return the ``UsageData`` of every volume, which only ``/system/df`` computes, by volume name."""
+    with profiling.span("docker.disk_usage"):
+        volumes = client.disk_usage("volume").get("Volumes") or ()
+    return {v["Name"]: v.get("UsageData") for v in volumes}
+
+
+def fetch_resource(client: "DockerClient", resource_type: str, key: str, sizes: bool = False) -> Resource | None:
+    """Fetch one resource as it is now, by ID (or name for a volume), or ``None`` if it is gone.
+
+    Containers and volumes are only sized with ``sizes``; see :func:`iter_resources`.
+    """
+    # The filters match prefixes and substrings; the listings are read to the end so the connection is reused
+    if resource_type == "containers":
+        listing = client.iter_containers({"id": [key]}, size=sizes)
+        found = [container_from_api(d) for d in listing if d["Id"] == key]
+        return found[0] if found else None
+    if resource_type == "volumes":
+        found = [d for d in client.iter_volumes({"name": [key]}) if d["Name"] == key]
+        if not found:
+            return None
+        usage = volume_usage(client).get(key) if sizes else None
+        return volume_from_api({**found[0], "UsageData": usage})
+    try:
+        return image_from_inspect(client.inspect_image(key))
+    except DockerAPIError as e:
+        if e.status_code == 404:  # noqa: PLR2004
+            return None
+        raise
+
+
+def iter_resources(client: "DockerClient", resource_type: str, sizes: bool = False) -> Iterator[Resource]:
+    """Stream the resources of one type from the daemon as they are decoded.
+
+    Images always come with their size. Containers and volumes only do with ``sizes``, as the daemon
+    computes them on request, for every container or volume, which is slow on a busy host: listing
+    containers then asks for their sizes, and the sizes of volumes are read from ``/system/df`` first.
+    Otherwise their size is 0.
+    """
+    if resource_type == "containers":
+        return map(container_from_api, client.iter_containers(size=sizes))
+    if resource_type == "volumes":
+        if not sizes:
+            return map(volume_from_api, client.iter_volumes())
+        usage = volume_usage(client)
+        return (volume_from_api({**d, "UsageData": usage.get(d["Name"])}) for d in client.iter_volumes())
+    return map(image_from_api, client.iter_images())
+
+
+def latest_matches(cleanup: "CleanupSchema", inventory: "Inventory") -> set[str]:
+    """Return the IDs of the resources a cleanup spares: its ``keep_latest`` newest matches of each type."""
+    if cleanup.keep_latest is None:
+        return set()
+    return {
+        resource.id
+        for resource_type in RESOURCE_TYPES
+        for resource in heapq.nlargest(
+            cleanup.keep_latest,
+            filter(cleanup.matches, inventory.of_type(resource_type)),
+            key=lambda r: r.created,
+        )
+    }
+
+
+def pattern_groups(cleanups: Sequence["CleanupSchema"]) -> list[tuple[tuple[str, ...], list[re.Pattern]]]:
+    """Combine the patterns of the plain cleanups, those without filters, per set of fields they match.
+
+    Returns:
+        The fields and the compiled patterns searched in them, one entry per distinct ``match_fields``.
+    """
+    groups: dict[tuple[str, ...], list[CleanupSchema]] = defaultdict(list)
+    for cleanup in cleanups:
+        if not cleanup.has_filters and cleanup.keep_latest is None:
+            groups[tuple(cleanup.match_fields)].append(cleanup)
+    return [(fields, combine_patterns(group)) for fields, group in groups.items()]
+
+
+def resource_matcher(
+    cleanups: Sequence["CleanupSchema"], inventory: "Inventory | None" = None
+) -> Callable[[Resource], bool]:
+    """Build a predicate selecting the resources matched by at least one of the cleanups.
+
+    Plain patterns are merged into one regular expression per set of fields they match; cleanups with
+    filters are checked one by one. Cleanups keeping their latest matches need the ``inventory`` to tell
+    which matches are the latest.
+
+    Raises:
+        ValueError: If a cleanup keeps its latest matches and no inventory is given.
+    """
+    ranked = [c for c in cleanups if c.keep_latest is not None]
+    if ranked and inventory is None:
+        raise ValueError("Cleanups keeping their latest matches need an inventory")
+    groups = pattern_groups(cleanups)
+    filtered = [c for c in cleanups if c.has_filters and c.keep_latest is None]
+    spared = [(c, latest_matches(c, inventory)) for c in ranked]
+
+    def matches(resource: Resource) -> bool:
+        return (
+            any(
+                pattern.search(value)
+                for fields, patterns in groups
+                for value in match_values(resource, fields)
+                for pattern in patterns
+            )
+            or any(c.matches(resource) for c in filtered)
+            or any(resource.id not in kept and c.matches(resource) for c, kept in spared)
+        )
+
+    return matches
+
+
+class Inventory:
+    """Snapshot of every container, volume and image on a daemon, indexed for lookups.
+
+    Resources are indexed by ID, by name, by image reference (the image a container runs and the tags
+    of an image) and by label (both ``key`` and ``key=value``). The values cleanup patterns are matched
+    against are kept in columns, one per resource type and set of fields, built on first use and dropped
+    when resources of that type change. ``sized`` tells whether containers and volumes were listed with their
+    sizes, see :func:`iter_resources`.
+    """
+
+    def __init__(self, resources: Iterable[Resource], fetched_at: float | None = None, sized: bool = False) -> None:
+        """Index ``resources``, listed at ``fetched_at`` (:func:`time.monotonic`, now when omitted)."""
+        self.fetched_at = time.monotonic() if fetched_at is None else fetched_at
+        self.sized = sized
+        self._resources: dict[str, dict[str, Resource]] = {t: {} for t in RESOURCE_TYPES}
+        self.by_id: dict[str, Resource] = {}
+        self.by_name: dict[str, list[Resource]] = defaultdict(list)
+        self.by_image: dict[str, list[Resource]] = defaultdict(list)
+        self.by_label: dict[str, list[Resource]] = defaultdict(list)
+        self._columns: dict[tuple[str, tuple[str, ...]], list[tuple[str, ...]]] = {}
+        for resource in resources:
+            self._add(resource)
+
+    @classmethod
+    def fetch(cls, client: "DockerClient", sizes: bool = False) -> "Inventory":
+        """List every container, volume and image once and build a snapshot, sizing them all with ``sizes``."""
+        with profiling.span("inventory.fetch"):
+            return cls(
+                (
+                    resource
+                    for t in RESOURCE_TYPES
+                    for resource in profiling.timed_iter(iter_resources(client, t, sizes), f"docker.list.{t}")
+                ),
+                sized=sizes,
+            )
+
+    def _index_keys(self, resource: Resource) -> Iterable[tuple[dict[str, list[Resource]], str]]:
+        for name in resource.names:
+            yield self.by_name, name
+        if resource.kind == "containers" and resource.image:
+            yield self.by_image, resource.image
+        elif resource.kind == "images":
+            for tag in resource.names:
+                yield self.by_image, tag
+        for key, value in resource.labels.items():
+            yield self.by_label, key
+            yield self.by_label, f"{key}={value}"
+
+    def _add(self, resource: Resource) -> None:
+        self._drop_columns(resource.kind)
+        self._resources[resource.kind][resource.id] = resource
+        self.by_id[resource.id] = resource
+        for index, key in self._index_keys(resource):
+            index[key].append(resource)
+
+    def add(self, resource: Resource) -> None:
+        """Add a resource to the snapshot, replacing the one with the same ID."""
+        self.discard(resource)
+        self._add(resource)
+
+    def copy(self) -> "Inventory":
+        """Return an independent snapshot of the same resources, without decoding or indexing them again."""
+        clone = Inventory((), self.fetched_at, self.sized)
+        clone._resources = {t: dict(resources) for t, resources in self._resources.items()}
+        clone.by_id = dict(self.by_id)
+        clone.by_name = defaultdict(list, {key: list(entries) for key, entries in self.by_name.items()})
+        clone.by_image = defaultdict(list, {key: list(entries) for key, entries in self.by_image.items()})
+        clone.by_label = defaultdict(list, {key: list(entries) for key, entries in self.by_label.items()})
+        # Columns are replaced rather than modified, so they can be shared
+        clone._columns = dict(self._columns)
+        return clone
+
+    def discard(self, resource: Resource) -> None:
+        """Drop a resource from the snapshot, e.g. after it was removed from the daemon."""
+        resource = self._resources[resource.kind].pop(resource.id, None)
+        if resource is None:
+            return
+        self._drop_columns(resource.kind)
+        self.by_id.pop(resource.id, None)
+        for index, key in self._index_keys(resource):
+            entries = [r for r in index.get(key, ()) if r.id != resource.id]
+            if entries:
+                index[key] = entries
+            else:
+                index.pop(key, None)
+
+    def of_type(self, resource_type: str) -> list[Resource]:
+        """Return every resource of the given type."""
+        return list(self._resources[resource_type].values())
+
+    def column(self, resource_type: str, fields: Sequence[str] = ()) -> list[tuple[str, ...]]:
+        """Return the values of the given fields of every resource of a type, in :meth:`of_type` order.
+
+        See :func:`~docker_tools_plus.filters.match_values`; no fields stands for the search text.
+        """
+        key = (resource_type, tuple(fields))
+        column = self._columns.get(key)
+        if column is None:
+            column = self._columns[key] = [match_values(r, fields) for r in self._resources[resource_type].values()]
+        return column
+
+    def _drop_columns(self, resource_type: str) -> None:
+        if self._columns:
+            self._columns = {key: column for key, column in self._columns.items() if key[0] != resource_type}
+
+    def __len__(self) -> int:
+        """Resources in the snapshot, all types together."""
+        return len(self.by_id)
+
+    @property
+    def age(self) -> float:
+        """Seconds since the snapshot was taken."""
+        return time.monotonic() - self.fetched_at
+
+    def usable(self, ttl: float, sizes: bool = False) -> bool:
+        """Whether the snapshot is younger than ``ttl`` seconds and, if ``sizes``, sized."""
+        return self.age < ttl and (self.sized or not sizes)
+
+    def matched_by(
+        self, cleanups: Sequence["CleanupSchema"], resource_types: Iterable[str] = RESOURCE_TYPES
+    ) -> dict[str, list[int]]:
+        """Tell which cleanups match each resource, in a single pass over the resources.
+
+        The patterns of the cleanups matching the same fields are searched through a :class:`PatternIndex`,
+        so a resource is not searched once per cleanup; the filters are only checked for the cleanups whose
+        pattern was found.
+
+        Returns:
+            The positions of the matching cleanups, in order, by ID of every resource matched by at least one.
+        """
+        groups: dict[tuple[str, ...], list[int]] = defaultdict(list)
+        for position, cleanup in enumerate(cleanups):
+            if cleanup.regular_expression:
+                groups[tuple(cleanup.match_fields)].append(position)
+        indexes = [
+            (fields, positions, PatternIndex([cleanups[p].regular_expression for p in positions]))
+            for fields, positions in groups.items()
+        ]
+        unpatterned = [position for position, cleanup in enumerate(cleanups) if not cleanup.regular_expression]
+        spared = [latest_matches(cleanup, self) for cleanup in cleanups]
+        matched: dict[str, list[int]] = {}
+        for resource_type in resource_types:
+            columns = [(self.column(resource_type, fields), positions, index) for fields, positions, index in indexes]
+            for row, resource in enumerate(self._resources[resource_type].values()):
+                found = [positions[i] for column, positions, index in columns for i in index.search_any(column[row])]
+                if not found and not unpatterned:
+                    continue
+                selected = [
+                    p
+                    for p in sorted(found + unpatterned)
+                    if resource.id not in spared[p]
+                    and (not cleanups[p].has_filters or matches_filters(cleanups[p], resource))
+                ]
+                if selected:
+                    matched[resource.id] = selected
+        return matched
+
+    def match(
+        self, cleanups: Sequence["CleanupSchema"], resource_types: Iterable[str] = RESOURCE_TYPES
+    ) -> list[dict[str, list[Resource]]]:
+        """Evaluate every cleanup against the snapshot in a single pass over the resources.
+
+        Returns:
+            One ``{resource_type: [matching resources]}`` mapping per cleanup, in the order given.
+        """
+        resource_types = list(resource_types)
+        results: list[dict[str, list[Resource]]] = [{t: [] for t in resource_types} for _ in cleanups]
+        matched = self.matched_by(cleanups, resource_types)
+        for resource_type in resource_types:
+            for resource in self._resources[resource_type].values():
+                for position in matched.get(resource.id, ()):
+                    results[position][resource_type].append(resource)
+        return results
+
+    def match_any(
+        self, cleanups: Sequence["CleanupSchema"], resource_types: Iterable[str] = RESOURCE_TYPES
+    ) -> dict[str, list[Resource]]:
+        """Return the resources matched by at least one of the cleanups, each resource listed once.
+
+        Plain patterns are searched in the field columns, so the values are not extracted again for every run.
+        """
+        groups = pattern_groups(cleanups)
+        others = [c for c in cleanups if c.has_filters or c.keep_latest is not None]
+        matches = resource_matcher(others, self) if others else None
+        selected = {}
+        for resource_type in resource_types:
+            columns = [(self.column(resource_type, fields), patterns) for fields, patterns in groups]
+            selected[resource_type] = [
+                resource
+                for position, resource in enumerate(self._resources[resource_type].values())
+                if any(
+                    pattern.search(value)
+                    for column, patterns in columns
+                    for value in column[position]
+                    for pattern in patterns
+                )
+                or (matches is not None and matches(resource))
+            ]
+        return selected
+
+
+class InventoryProvider:
+    """Hand out inventory snapshots, re-listing the daemon only when the current one is older than ``ttl``."""
+
+    def __init__(self, client: "DockerClient", ttl: float = DEFAULT_INVENTORY_TTL) -> None:
+        """List the host of ``client`` when a snapshot older than ``ttl`` seconds is asked for."""
+        self.client = client
+        self.ttl = ttl
+        self._snapshot: Inventory | None = None
+        self._lock = threading.Lock()
+
+    def get(self, sizes: bool = False) -> Inventory:
+        """Return a snapshot no older than ``ttl`` seconds, with the sizes of containers and volumes if ``sizes``."""
+        with self._lock:
+            if self._snapshot is None or not self._snapshot.usable(self.ttl, sizes):
+                self._snapshot = Inventory.fetch(self.client, sizes)
+            return self._snapshot
+
+    def discard(self, resource: Resource) -> None:
+        """Drop a removed resource from the current snapshot, if there is one."""
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot.discard(resource)
+
+    def current(self, sizes: bool = False) -> Inventory | None:
+        """Return the snapshot if it is still fresh, and sized if ``sizes``, without listing the daemon."""
+        with self._lock:
+            if self._snapshot is not None and self._snapshot.usable(self.ttl, sizes):
+                return self._snapshot
+            return None
+
+    def invalidate(self) -> None:
+        """Force the next call to :meth:`get` to re-list the daemon."""
+        with self._lock:
+            self._snapshot = None
+
+    def adopt(self, inventory: Inventory) -> None:
+        """Keep an inventory a run streamed itself; only providers with a cache on disk keep anything."""
+
+    def save(self) -> None:
+        """Keep the current snapshot for later processes; only providers with a cache on disk keep anything."""
+
+
+class EventInventoryProvider(InventoryProvider):
+    """Keep one inventory current from the daemon's event stream, so runs do not list the daemon again.
+
+    Once :meth:`start` is called, a background thread subscribes to ``/events``, lists everything once, then
+    applies every create, destroy, rename and tag event by fetching (or dropping) the one resource it is
+    about. The daemon is listed again only when the stream is (re)connected, or when an event cannot be
+    applied and the inventory may have missed a change. While there is no stream, :meth:`get` falls back to
+    listing the daemon as :class:`InventoryProvider` does.
+    """
+
+    def __init__(
+        self, client: "DockerClient", ttl: float = DEFAULT_INVENTORY_TTL, reconnect_delay: float = RECONNECT_DELAY
+    ) -> None:
+        """Follow the host of ``client``, waiting ``reconnect_delay`` seconds before resubscribing to its events."""
+        super().__init__(client, ttl)
+        self.reconnect_delay = reconnect_delay
+        self.events_applied = 0
+        self.resyncs = 0
+        # Kept current by the watcher thread; runs get copies of it, so it never changes under them
+        self._live: Inventory | None = None
+        self._changed = False
+        self._stream: EventStream | None = None
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def live(self) -> bool:
+        """Whether the inventory is currently kept up to date by the event stream."""
+        return self._live is not None
+
+    def start(self) -> None:
+        """Start following the event stream in a background thread."""
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._watch, name="inventory-events", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop following the event stream and wait for the background thread to end."""
+        self._stopping.set()
+        with self._lock:
+            stream = self._stream
+        if stream is not None:
+            stream.close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def get(self, sizes: bool = False) -> Inventory:
+        """Return the inventory kept by the event stream, or a snapshot no older than ``ttl`` without one.
+
+        The inventory kept by the event stream is not sized; with ``sizes``, a sized snapshot is listed instead.
+        """
+        with self._lock:
+            if self._live is not None and not sizes:
+                return self._published()
+        return super().get(sizes)
+
+    def current(self, sizes: bool = False) -> Inventory | None:
+        """Return the inventory kept by the event stream, or the snapshot if it is still fresh."""
+        with self._lock:
+            if self._live is not None and not sizes:
+                return self._published()
+        return super().current(sizes)
+
+    def discard(self, resource: Resource) -> None:
+        """Drop a removed resource without waiting for its event."""
+        with self._lock:
+            if self._live is not None:
+                self._live.discard(resource)
+            if self._snapshot is not None:
+                self._snapshot.discard(resource)
+
+    def _published(self) -> Inventory:
+        # Copied again only after an event changed something
+        if self._changed or self._snapshot is None:
+            self._snapshot = self._live.copy()
+            self._changed = False
+        return self._snapshot
+
+    def _watch(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._follow()
+            except DockerToolsError as e:
+                logger.warning("Lost the events of %s: %s", self.client.base_url, e)
+            with self._lock:
+                self._stream = None
+                self._live = self._snapshot = None
+            self._stopping.wait(self.reconnect_delay)
+
+    def _follow(self) -> None:
+        """Subscribe, list everything, then apply events until the stream ends."""
+        stream = self.client.events({"type": list(EVENT_TYPES), "event": list(EVENT_ACTIONS)})
+        with self._lock:
+            self._stream = stream
+        with stream:
+            if self._stopping.is_set():
+                return
+            # Listed after subscribing, so a change made during the listing arrives as an event afterwards
+            self._resync()
+            for event in stream:
+                if not self._apply(event):
+                    self._resync()
+
+    def _resync(self) -> None:
+        inventory = Inventory.fetch(self.client)
+        with self._lock:
+            self._live = inventory
+            self._changed = True
+            self.resyncs += 1
+
+    def _apply(self, event: dict[str, Any]) -> bool:
+        """Apply one event to the live inventory; returns False if the resource it is about cannot be fetched."""
+        resource_type = EVENT_TYPES.get(event.get("Type"))
+        key = (event.get("Actor") or {}).get("ID")
+        if resource_type is None or not key:
+            return True
+        resource = None
+        if event.get("Action") not in REMOVAL_ACTIONS:
+            try:
+                resource = fetch_resource(self.client, resource_type, key)
+            except DockerToolsError as e:
+                logger.warning("Cannot apply the %s event of %s %s: %s", event.get("Action"), resource_type, key, e)
+                return False
+        with self._lock:
+            if resource is None:
+                self._live.discard(Resource(resource_type, key))
+            else:
+                self._live.add(resource)
+            self._changed = True
+            self.events_applied += 1
+        return True
@@ -0,0 +1,81 @@
+import json
+import threading
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Any
+
+import click
+
+if TYPE_CHECKING:
+    from .engine import CleanupResult
+    from .exceptions import DockerCommandError
+    from .inventory import Resource
+    from .plan import CleanupPlan
+
+OUTPUT_FORMATS = ("text", "json", "ndjson")
+
+
+class RecordStream:
+    """Write machine-readable records to stdout as soon as they are produced.
+
+    Every record is a JSON object whose ``event`` key tells what it describes. ``ndjson`` writes one object
+    per line; ``json`` writes them as the elements of a single array, one per line, closed by :meth:`close`,
+    so the output is also a valid JSON document once the command ends. Records can be emitted from several
+    threads, e.g. while cleaning several hosts.
+    """
+
+    def __init__(self, output_format: str) -> None:
+        """Write records as ``json`` or ``ndjson``."""
+        self.output_format = output_format
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields: Any) -> None:  # noqa: ANN401
+        """Write one record."""
+        line = json.dumps({"event": event, **fields}, default=str)
+        with self._lock:
+            if self.output_format == "json":
+                line = ("," if self.count else "[") + line
+            click.echo(line)
+            self.count += 1
+
+    def close(self) -> None:
+        """End the output; closes the array of the ``json`` format."""
+        if self.output_format == "json":
+            click.echo("]" if self.count else "[]")
+
+    def removal(self, host: str, resource: "Resource", error: "DockerCommandError | None") -> None:
+        """Record the outcome of removing one resource: a ``removed`` or a ``failed`` event."""
+        fields = {"host": host, "resource_type": resource.kind, "id": resource.id, "name": resource.name}
+        if error is None:
+            self.emit("removed", **fields, size=resource.size)
+        else:
+            self.emit("failed", **fields, error=str(error))
+
+    def results(self, host: str, results: Mapping[str, "CleanupResult"]) -> None:
+        """Record a ``result`` event summing up each resource type cleaned on a host."""
+        for resource_type, result in results.items():
+            self.emit(
+                "result",
+                host=host,
+                resource_type=resource_type,
+                matched=result.matched,
+                removed=len(result.removed),
+                failed=len(result.failures),
+                reclaimed=result.reclaimed,
+                sized=result.sized,
+                duration=round(result.duration, 6),
+                error=str(result.error) if result.error is not None else None,
+            )
+
+    def plan(self, plan: "CleanupPlan") -> None:
+        """Record a ``planned`` event for each resource of a plan, in removal order."""
+        for resource in plan.resources:
+            self.emit(
+                "planned",
+                host=plan.docker_host,
+                resource_type=resource.kind,
+                id=resource.id,
+                name=resource.name,
+                size=resource.size,
+                phase=resource.phase + 1,
+            )
@@ -0,0 +1,325 @@
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from collections.abc import Iterable, Sequence
+from typing import TYPE_CHECKING
+
+from .exceptions import InvalidRegularExpressionError
+
+try:  # The regular expression parser is only exposed as sre_parse before Python 3.11
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_constants
+    import sre_parse
+
+if TYPE_CHECKING:
+    from .database import CleanupSchema
+
+DEFAULT_PATTERN_CACHE_SIZE = 1024
+# Numbered/named backreferences and conditionals on a group change meaning once patterns are merged into
+# one alternation.
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+_GLOBAL_FLAGS = re.compile(r"^\(\?[aiLmsux]+\)")
+
+
+class PatternCache:
+    """Thread-safe LRU cache of compiled regular expressions keyed by pattern text."""
+
+    def __init__(self, maxsize: int = DEFAULT_PATTERN_CACHE_SIZE) -> None:
+        """Keep at most ``maxsize`` compiled patterns, dropping the least recently used first."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._patterns: OrderedDict[str, re.Pattern] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pattern: str) -> re.Pattern:
+        """Return the compiled pattern, compiling it at most once while it stays in the cache.
+
+        Raises:
+            InvalidRegularExpressionError: If the pattern does not compile.
+        """
+        with self._lock:
+            compiled = self._patterns.get(pattern)
+            if compiled is not None:
+                self._patterns.move_to_end(pattern)
+                self.hits += 1
+                return compiled
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise InvalidRegularExpressionError(f"Invalid regular expression. '{pattern}' is not valid.") from e
+        with self._lock:
+            self.misses += 1
+            self._patterns[pattern] = compiled
+            if len(self._patterns) > self.maxsize:
+                self._patterns.popitem(last=False)
+        return compiled
+
+    def clear(self) -> None:
+        """Drop every cached pattern and reset the counters."""
+        with self._lock:
+            self._patterns.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        """Compiled patterns in the cache."""
+        return len(self._patterns)
+
+
+# Shared by every CleanupSchema and DatabaseManager in the process.
+pattern_cache = PatternCache()
+
+
+def combine_patterns(cleanups: Sequence["CleanupSchema"]) -> list[re.Pattern]:
+    """Compile the cleanup patterns into as few regular expressions as possible.
+
+    Patterns are merged into a single ``(?:a)|(?:b)|...`` alternation so each resource is searched once.
+    Patterns that cannot be merged safely (backreferences, global inline flags, duplicate group names)
+    are compiled on their own.
+    """
+    sources = list(dict.fromkeys(c.regular_expression for c in cleanups))
+    mergeable = [p for p in sources if not _BACKREFERENCE.search(p) and not _GLOBAL_FLAGS.match(p)]
+    separate = [p for p in sources if p not in mergeable]
+    if len(mergeable) > 1:
+        try:
+            combined = pattern_cache.get("|".join(f"(?:{p})" for p in mergeable))
+        except InvalidRegularExpressionError:
+            pass
+        else:
+            return [combined, *map(pattern_cache.get, separate)]
+    return [pattern_cache.get(p) for p in sources]
+
+
+_REPEATS = tuple(
+    getattr(sre_constants, op) for op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") if hasattr(sre_constants, op)
+)
+
+
+def _shortest(literals: tuple[str, ...] | None) -> int:
+    return min(map(len, literals)) if literals else 0
+
+
+def _literals(items: Iterable[tuple]) -> tuple[str, ...] | None:
+    """Literals one of which every match of a parsed pattern contains, preferring the longest."""
+    best, run = None, []
+    for op, av in (*items, (None, None)):
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        candidates = [("".join(run),) if run else None]
+        run = []
+        if op is sre_constants.SUBPATTERN and not av[1] & re.IGNORECASE:
+            candidates.append(_literals(av[-1]))
+        elif op is sre_constants.BRANCH:
+            branches = [_literals(branch) for branch in av[1]]
+            if all(branches):
+                candidates.append(tuple(dict.fromkeys(literal for branch in branches for literal in branch)))
+        elif op in _REPEATS and av[0] >= 1:
+            candidates.append(_literals(av[2]))
+        best = max([best, *candidates], key=_shortest)
+    return best
+
+
+def required_literals(pattern: str) -> tuple[str, ...]:
+    """Return literal strings one of which is found in every text the pattern matches.
+
+    ``ci_(build|test)_[0-9]+`` gives ``("build", "test")``. Patterns that can match without any
+    literal, such as ``[a-z]+``, or that ignore case give an empty tuple.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return ()
+    if parsed.state.flags & re.IGNORECASE:
+        return ()
+    return _literals(parsed) or ()
+
+
+def _trie_pattern(literals: Iterable[str]) -> str:
+    """Render literals as a regular expression walking their trie, longest literal first."""
+    trie: dict = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: dict) -> str:
+        branches = [re.escape(char) + render(child) for char, child in node.items() if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return render(trie)
+
+
+class PatternIndex:
+    """Tell which of many patterns match a text with a cost that barely grows with the number of patterns.
+
+    The literals every match of a pattern must contain (see :func:`required_literals`) are put in a trie,
+    rendered as one regular expression. A text is scanned once with it; only the patterns whose literals
+    were found, and those without any literal, are then searched for real. Texts containing none of the
+    literals are rejected by a single search.
+    """
+
+    def __init__(self, patterns: Sequence[str]) -> None:
+        """Index ``patterns`` by the literals a match must contain."""
+        self.patterns = list(patterns)
+        self._compiled = [pattern_cache.get(pattern) for pattern in self.patterns]
+        owners: dict[str, list[int]] = defaultdict(list)
+        self.unindexed: list[int] = []
+        for position, pattern in enumerate(self.patterns):
+            literals = required_literals(pattern)
+            for literal in literals:
+                owners[literal].append(position)
+            if not literals:
+                self.unindexed.append(position)
+        # The scan reports the longest literal starting at each position; the shorter ones are its prefixes
+        self._owners = {
+            literal: sorted({p for end in range(1, len(literal) + 1) for p in owners.get(literal[:end], ())})
+            for literal in owners
+        }
+        self._any_literal = self._scan = None
+        if owners:
+            trie = _trie_pattern(owners)
+            self._any_literal = pattern_cache.get(trie)
+            self._scan = pattern_cache.get(f"(?=({trie}))")
+
+    def search(self, text: str) -> list[int]:
+        """Return the positions of the patterns found in the text, in order."""
+        candidates = self.unindexed
+        if self._any_literal is not None and self._any_literal.search(text) is not None:
+            found = {p for match in self._scan.finditer(text) for p in self._owners[match.group(1)]}
+            candidates = sorted(found.union(self.unindexed))
+        return [p for p in candidates if self._compiled[p].search(text)]
+
+    def search_any(self, texts: Sequence[str]) -> list[int]:
+        """Return the positions of the patterns found in at least one of the texts, in order."""
+        if len(texts) == 1:
+            return self.search(texts[0])
+        found: set[int] = set()
+        for text in texts:
+            found.update(self.search(text))
+        return sorted(found)
+
+
+NESTED_QUANTIFIERS = "nested quantifiers, as in (a+)+: a search that fails can take exponential time"
+OVERLAPPING_ALTERNATION = (
+    "a repeated alternation whose branches can start with the same text, as in (a|a)*: "
+    "a search that fails can take exponential time"
+)
+CONSECUTIVE_QUANTIFIERS = (
+    "consecutive quantifiers over the same characters, as in .*.*: searches can take polynomial time"
+)
+# Repeats that give characters back when the rest of the pattern fails; possessive ones never do
+_BACKTRACKING_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+
+
+def _first_chars(items: Sequence[tuple]) -> set[str] | None:  # noqa: PLR0911
+    """Characters a match of a parsed sequence can start with; ``None`` when it could be almost any."""
+    for op, av in items:
+        if op is sre_constants.AT:
+            continue
+        if op is sre_constants.LITERAL:
+            return {chr(av)}
+        if op is sre_constants.IN:
+            chars = set()
+            for item_op, item in av:
+                if item_op is sre_constants.LITERAL:
+                    chars.add(chr(item))
+                elif item_op is sre_constants.RANGE and item[1] - item[0] < 256:  # noqa: PLR2004
+                    chars.update(map(chr, range(item[0], item[1] + 1)))
+                else:
+                    return None
+            return chars
+        if op is sre_constants.SUBPATTERN:
+            return _first_chars(av[-1])
+        if op is sre_constants.BRANCH:
+            branches = [_first_chars(branch) for branch in av[1]]
+            return None if None in branches else set().union(*branches)
+        if op in _REPEATS and av[0] >= 1:
+            return _first_chars(av[2])
+        return None
+    return None
+
+
+def _overlap(first: set[str] | None, second: set[str] | None) -> bool:
+    return first is None or second is None or bool(first & second)
+
+
+def _children(op: object, av: object) -> list[Sequence[tuple]]:
+    if op is sre_constants.SUBPATTERN:
+        return [av[-1]]
+    if op is _ATOMIC_GROUP:
+        return [av]
+    if op is sre_constants.BRANCH:
+        return list(av[1])
+    if op in _REPEATS:
+        return [av[2]]
+    return []
+
+
+def _repeats_unbounded(items: Sequence[tuple]) -> bool:
+    """Whether a parsed sequence holds a backtracking repeat without an upper bound, outside atomic groups."""
+    for op, av in items:
+        if op in _BACKTRACKING_REPEATS and av[1] == sre_constants.MAXREPEAT:
+            return True
+        if op is not _ATOMIC_GROUP and any(map(_repeats_unbounded, _children(op, av))):
+            return True
+    return False
+
+
+def _alternations(items: Sequence[tuple]) -> list[list[Sequence[tuple]]]:
+    """The branches of each alternation of a sequence, looking into groups but not into nested repeats."""
+    found = []
+    for op, av in items:
+        if op is sre_constants.BRANCH:
+            found.append(list(av[1]))
+        elif op is sre_constants.SUBPATTERN:
+            found.extend(_alternations(av[-1]))
+    return found
+
+
+def _ambiguous(branches: Sequence[Sequence[tuple]]) -> bool:
+    # The parser factors common prefixes out, so (a|a) arrives as a(|): two empty branches are ambiguous too
+    starts = [_first_chars(branch) if branch else {""} for branch in branches]
+    return any(_overlap(a, b) for i, a in enumerate(starts) for b in starts[i + 1 :])
+
+
+def _collect_risks(items: Sequence[tuple], risks: set[str]) -> None:
+    previous: set[str] | None | bool = False
+    for op, av in items:
+        if op in _BACKTRACKING_REPEATS and av[1] == sre_constants.MAXREPEAT:
+            body = av[2]
+            if _repeats_unbounded(body):
+                risks.add(NESTED_QUANTIFIERS)
+            if any(map(_ambiguous, _alternations(body))):
+                risks.add(OVERLAPPING_ALTERNATION)
+            chars = _first_chars(body)
+            if previous is not False and _overlap(previous, chars):
+                risks.add(CONSECUTIVE_QUANTIFIERS)
+            previous = chars
+        else:
+            previous = False
+        for child in _children(op, av):
+            _collect_risks(child, risks)
+
+
+def backtracking_risks(pattern: str) -> list[str]:
+    r"""Describe the constructs of a pattern that can make Python's regular expression engine backtrack a lot.
+
+    Python's ``re`` has no protection against catastrophic backtracking: on a name that almost matches,
+    ``(\w+_?)+$`` takes exponential time. The check is conservative; a warning is a reason to look at the
+    pattern, not proof that it is slow.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return []
+    risks: set[str] = set()
+    _collect_risks(parsed, risks)
+    return [risk for risk in (NESTED_QUANTIFIERS, OVERLAPPING_ALTERNATION, CONSECUTIVE_QUANTIFIERS) if risk in risks]
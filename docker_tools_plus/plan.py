@@ -0,0 +1,137 @@
+import datetime
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Literal
+
+from pydantic import BaseModel, Field, ValidationError
+
+from .database import CleanupSchema
+from .exceptions import InvalidPlanError
+from .inventory import RESOURCE_TYPES, Resource
+
+# Containers must be gone before the volumes and images they use can be removed.
+REMOVAL_PHASES = (("containers",), ("volumes", "images"))
+PLAN_VERSION = 1
+_SIZE_UNITS = ("B", "kB", "MB", "GB", "TB")
+
+
+def removal_phase(resource_type: str) -> int:
+    """Return the position of a resource type in :data:`REMOVAL_PHASES`."""
+    return next(position for position, phase in enumerate(REMOVAL_PHASES) if resource_type in phase)
+
+
+def format_size(size: int) -> str:
+    """Format a byte count the way ``docker system df`` does, e.g. ``1.5GB``."""
+    value = float(size)
+    for unit in _SIZE_UNITS:
+        if value < 1000 or unit == _SIZE_UNITS[-1]:  # noqa: PLR2004
+            return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1000
+    return f"{size}B"
+
+
+class PlannedResource(BaseModel):
+    """A resource a plan will remove."""
+
+    kind: Literal["containers", "volumes", "images"]
+    id: str
+    name: str
+    size: int = Field(0, ge=0, description="Bytes reported by the daemon when the plan was made; 0 if unknown")
+    phase: int = Field(
+        ..., ge=0, le=len(REMOVAL_PHASES) - 1, description="Removal phase; a phase starts once the previous one is done"
+    )
+    parent: str = Field("", description="ID of the image an image was built on; removed after its children")
+
+    @classmethod
+    def from_resource(cls, resource: Resource) -> "PlannedResource":
+        """Describe an inventory resource."""
+        return cls(
+            kind=resource.kind,
+            id=resource.id,
+            name=resource.name,
+            size=resource.size,
+            phase=removal_phase(resource.kind),
+            parent=resource.parent,
+        )
+
+    def to_resource(self) -> Resource:
+        """Rebuild the inventory resource the engine removes."""
+        return Resource(kind=self.kind, id=self.id, names=(self.name,), size=self.size, parent=self.parent)
+
+
+class CleanupPlan(BaseModel):
+    """The resources a cleanup run would remove, in dependency order.
+
+    A plan is computed from a single inventory snapshot and can be saved as JSON and executed later.
+    """
+
+    version: Literal[1] = PLAN_VERSION
+    created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+    docker_host: str = ""
+    cleanups: list[CleanupSchema] = Field(default_factory=list)
+    resource_types: list[Literal["containers", "volumes", "images"]] = Field(default_factory=lambda: [*RESOURCE_TYPES])
+    resources: list[PlannedResource] = Field(default_factory=list)
+
+    @classmethod
+    def build(
+        cls,
+        cleanups: Sequence[CleanupSchema],
+        matches: dict[str, list[Resource]],
+        docker_host: str = "",
+    ) -> "CleanupPlan":
+        """Build a plan from the matches of an inventory snapshot.
+
+        Args:
+            cleanups: The cleanups the matches were computed for.
+            matches: ``{resource_type: [resources]}``, as returned by ``Inventory.match_any``.
+            docker_host: Daemon the snapshot was taken from.
+        """
+        resource_types = [t for t in RESOURCE_TYPES if t in matches]
+        resources = [
+            PlannedResource.from_resource(resource)
+            for resource_type in sorted(resource_types, key=removal_phase)
+            for resource in matches[resource_type]
+        ]
+        return cls(docker_host=docker_host, cleanups=list(cleanups), resource_types=resource_types, resources=resources)
+
+    @classmethod
+    def load(cls, path: Path) -> "CleanupPlan":
+        """Read a plan saved with :meth:`save`.
+
+        Raises:
+            InvalidPlanError: If the file cannot be read or is not a valid plan.
+        """
+        try:
+            return cls.model_validate_json(Path(path).read_bytes())
+        except OSError as e:
+            raise InvalidPlanError(f"Cannot read plan file {path}: {e}") from e
+        except ValidationError as e:
+            raise InvalidPlanError(f"Invalid plan file {path}: {e}") from e
+
+    def save(self, path: Path) -> None:
+        """Write the plan as JSON."""
+        Path(path).write_text(self.to_json() + "\n")
+
+    def to_json(self) -> str:
+        """Serialize the plan as indented JSON."""
+        return self.model_dump_json(indent=2)
+
+    def phases(self) -> list[list[Resource]]:
+        """Return the resources to remove, one list per entry of :data:`REMOVAL_PHASES`."""
+        phases: list[list[Resource]] = [[] for _ in REMOVAL_PHASES]
+        for planned in self.resources:
+            phases[planned.phase].append(planned.to_resource())
+        return phases
+
+    def of_type(self, resource_type: str) -> list[PlannedResource]:
+        """Return the planned resources of one type."""
+        return [r for r in self.resources if r.kind == resource_type]
+
+    @property
+    def total_size(self) -> int:
+        """Bytes the plan would reclaim, as far as the daemon reported them."""
+        return sum(r.size for r in self.resources)
+
+    def __len__(self) -> int:
+        """Resources the plan removes."""
+        return len(self.resources)
@@ -0,0 +1,367 @@
+"""Timing spans for finding where a command spends its time.
+
+Coarse phases (a command, a database query, a removal phase) are recorded as spans; per-resource work
+(decoding a listing, matching, removing) is added up in aggregates, so profiling a cleanup of 100k
+resources does not keep 100k spans in memory. When profiling is off, every helper costs one global lookup.
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, TypeVar
+
+from . import __version__
+from .exceptions import ProfileExportError
+
+T = TypeVar("T")
+EXPORT_FORMATS = ("jsonl", "otlp")
+# OTLP span kind "internal"
+_OTLP_SPAN_KIND_INTERNAL = 1
+_NOOP = contextlib.nullcontext()
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+_profiler: "Profiler | None" = None
+# Timestamps are taken from the monotonic clock and shifted to the epoch once, so nested spans stay nested
+_EPOCH_OFFSET_NS = time.time_ns() - time.perf_counter_ns()
+
+
+def _now_ns() -> int:
+    return time.perf_counter_ns() + _EPOCH_OFFSET_NS
+
+
+@dataclass
+class Span:
+    """A timed phase. Timestamps are nanoseconds since the Unix epoch."""
+
+    name: str
+    span_id: str
+    parent_id: str | None
+    start_ns: int
+    end_ns: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        """Seconds the span lasted."""
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+@dataclass
+class Aggregate:
+    """Calls to a hot-path operation, added up instead of recorded one by one."""
+
+    name: str
+    calls: int = 0
+    total_ns: int = 0
+    max_ns: int = 0
+    first_start_ns: int = 0
+    last_end_ns: int = 0
+
+    @property
+    def total(self) -> float:
+        """Seconds spent in all calls."""
+        return self.total_ns / 1e9
+
+
+class Profiler:
+    """Collect the spans and aggregates of one command."""
+
+    def __init__(self) -> None:
+        """Start an empty profile with a new trace ID."""
+        self.trace_id = os.urandom(16).hex()
+        self.spans: list[Span] = []
+        self.aggregates: dict[str, Aggregate] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:  # noqa: ANN401
+        """Time the enclosed block as a child of the enclosing span of the same thread."""
+        parent = _current_span.get()
+        span = Span(name, os.urandom(8).hex(), parent.span_id if parent else None, _now_ns(), attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            span.end_ns = _now_ns()
+            _current_span.reset(token)
+            with self._lock:
+                self.spans.append(span)
+
+    @property
+    def root(self) -> Span | None:
+        """The span of the command, ``cli.<command>``; spans opened on worker threads have no parent either."""
+        roots = [span for span in self.spans if span.parent_id is None]
+        command = next((span for span in roots if span.name.startswith("cli.")), None)
+        return command or min(roots, key=lambda span: span.start_ns, default=None)
+
+    def add(self, name: str, start_ns: int, elapsed_ns: int) -> None:
+        """Add one call of ``elapsed_ns`` nanoseconds, started at ``start_ns`` (epoch), to an aggregate."""
+        with self._lock:
+            aggregate = self.aggregates.get(name)
+            if aggregate is None:
+                aggregate = self.aggregates[name] = Aggregate(name, first_start_ns=start_ns)
+            aggregate.calls += 1
+            aggregate.total_ns += elapsed_ns
+            aggregate.max_ns = max(aggregate.max_ns, elapsed_ns)
+            aggregate.first_start_ns = min(aggregate.first_start_ns, start_ns)
+            aggregate.last_end_ns = max(aggregate.last_end_ns, start_ns + elapsed_ns)
+
+    def breakdown(self) -> list[tuple[str, int, float, float]]:
+        """Return ``(name, calls, total seconds, max seconds)`` per span name and aggregate, costliest first."""
+        rows: dict[str, list] = {}
+        for span in self.spans:
+            row = rows.setdefault(span.name, [span.name, 0, 0.0, 0.0])
+            row[1] += 1
+            row[2] += span.duration
+            row[3] = max(row[3], span.duration)
+        for aggregate in self.aggregates.values():
+            rows[aggregate.name] = [aggregate.name, aggregate.calls, aggregate.total, aggregate.max_ns / 1e9]
+        return sorted((tuple(row) for row in rows.values()), key=lambda row: row[2], reverse=True)
+
+    def records(self) -> list[dict]:
+        """Return one JSON-serializable record per span and aggregate, in start order."""
+        records = [
+            {
+                "type": "span",
+                "trace_id": self.trace_id,
+                "span_id": span.span_id,
+                "parent_id": span.parent_id,
+                "name": span.name,
+                "start_ns": span.start_ns,
+                "end_ns": span.end_ns,
+                "duration": span.duration,
+                "attributes": span.attributes,
+            }
+            for span in self.spans
+        ]
+        records += [
+            {
+                "type": "aggregate",
+                "trace_id": self.trace_id,
+                "name": aggregate.name,
+                "start_ns": aggregate.first_start_ns,
+                "end_ns": aggregate.last_end_ns,
+                "calls": aggregate.calls,
+                "total": aggregate.total,
+                "max": aggregate.max_ns / 1e9,
+            }
+            for aggregate in self.aggregates.values()
+        ]
+        return sorted(records, key=lambda record: record["start_ns"])
+
+    def to_otlp(self) -> dict:
+        """Encode the profile as an OTLP/JSON ``ExportTraceServiceRequest``.
+
+        Aggregates become one span each, from their first call to their last, with the number of calls and the
+        time spent in them as attributes. They and the spans opened on worker threads, which have no parent of
+        their own, are children of the :attr:`root` span, so the trace has a single root.
+        """
+        root = self.root.span_id if self.root is not None else None
+        spans = [
+            _otlp_span(
+                self.trace_id,
+                s.span_id,
+                s.parent_id if s.parent_id is not None or s.span_id == root else root,
+                s.name,
+                s.start_ns,
+                s.end_ns,
+                s.attributes,
+            )
+            for s in self.spans
+        ]
+        spans += [
+            _otlp_span(
+                self.trace_id,
+                os.urandom(8).hex(),
+                root,
+                a.name,
+                a.first_start_ns,
+                a.last_end_ns,
+                {"calls": a.calls, "total_seconds": a.total, "max_seconds": a.max_ns / 1e9},
+            )
+            for a in self.aggregates.values()
+        ]
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": _otlp_attributes({"service.name": "docker-tools-plus"})},
+                    "scopeSpans": [{"scope": {"name": "docker_tools_plus", "version": __version__}, "spans": spans}],
+                }
+            ]
+        }
+
+    def export(self, target: str, export_format: str = "jsonl") -> None:
+        """Write the profile to a file, or POST it as OTLP/JSON to an ``http(s)://`` collector endpoint.
+
+        Raises:
+            ProfileExportError: If the target cannot be written or the collector does not accept the profile.
+        """
+        if target.startswith(("http://", "https://")):
+            if export_format != "otlp":
+                raise ProfileExportError("Profiles can only be sent to a collector in the otlp format.")
+            _post(target, json.dumps(self.to_otlp()).encode())
+            return
+        if export_format == "otlp":
+            content = json.dumps(self.to_otlp()) + "\n"
+        else:
+            content = "".join(json.dumps(record) + "\n" for record in self.records())
+        try:
+            with Path(target).open("a") as file:
+                file.write(content)
+        except OSError as e:
+            raise ProfileExportError(f"Cannot write profile to {target}: {e}") from e
+
+
+class _Timer:
+    """Context manager adding the time spent in its block to an aggregate."""
+
+    __slots__ = ("name", "profiler", "start_ns")
+
+    def __init__(self, profiler: Profiler, name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start_ns = _now_ns()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.profiler.add(self.name, self.start_ns, _now_ns() - self.start_ns)
+
+
+def start() -> Profiler:
+    """Start profiling; spans and timers record into the returned profiler until :func:`stop`."""
+    global _profiler  # noqa: PLW0603
+    _profiler = Profiler()
+    return _profiler
+
+
+def stop() -> Profiler | None:
+    """Stop profiling and return the profiler that was active, if any."""
+    global _profiler  # noqa: PLW0603
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def active() -> Profiler | None:
+    """Return the active profiler, or ``None`` when profiling is off."""
+    return _profiler
+
+
+def span(name: str, **attributes: Any) -> contextlib.AbstractContextManager:  # noqa: ANN401
+    """Time the enclosed block as a span; a shared no-op when profiling is off."""
+    profiler = _profiler
+    return _NOOP if profiler is None else profiler.span(name, **attributes)
+
+
+def timer(name: str) -> contextlib.AbstractContextManager:
+    """Add the time spent in the enclosed block to the aggregate ``name``; a shared no-op when profiling is off."""
+    profiler = _profiler
+    return _NOOP if profiler is None else _Timer(profiler, name)
+
+
+def traced(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorate a function so every call is recorded as a span named ``name``."""
+
+    def decorate(func: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:  # noqa: ANN401
+            profiler = _profiler
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def timed(func: Callable[..., T], name: str) -> Callable[..., T]:
+    """Return ``func``, timed into the aggregate ``name`` when profiling is on."""
+    profiler = _profiler
+    if profiler is None:
+        return func
+
+    def wrapper(*args: Any, **kwargs: Any) -> T:  # noqa: ANN401
+        with _Timer(profiler, name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def timed_iter(items: Iterable[T], name: str) -> Iterator[T]:
+    """Iterate over ``items``, adding the time spent producing each item to the aggregate ``name``.
+
+    Only the producer is timed, not the code consuming the items. When profiling is off the items are
+    returned untouched.
+    """
+    profiler = _profiler
+    iterator = iter(items)
+    if profiler is None:
+        return iterator
+    return _timed_iter(profiler, iterator, name)
+
+
+def _timed_iter(profiler: Profiler, iterator: Iterator[T], name: str) -> Iterator[T]:
+    while True:
+        timer = _Timer(profiler, name)
+        with timer:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict]:
+    def value(v: Any) -> dict:  # noqa: ANN401
+        if isinstance(v, bool):
+            return {"boolValue": v}
+        if isinstance(v, int):
+            return {"intValue": str(v)}
+        if isinstance(v, float):
+            return {"doubleValue": v}
+        return {"stringValue": str(v)}
+
+    return [{"key": key, "value": value(v)} for key, v in attributes.items()]
+
+
+def _otlp_span(  # noqa: PLR0913, PLR0917
+    trace_id: str,
+    span_id: str,
+    parent_id: str | None,
+    name: str,
+    start_ns: int,
+    end_ns: int,
+    attributes: dict[str, Any],
+) -> dict:
+    span = {
+        "traceId": trace_id,
+        "spanId": span_id,
+        "name": name,
+        "kind": _OTLP_SPAN_KIND_INTERNAL,
+        "startTimeUnixNano": str(start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": _otlp_attributes(attributes),
+    }
+    if parent_id:
+        span["parentSpanId"] = parent_id
+    return span
+
+
+def _post(url: str, body: bytes) -> None:
+    import urllib.error
+    import urllib.request
+
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")  # noqa: S310
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:  # noqa: S310
+            response.read()
+    except (urllib.error.URLError, OSError) as e:
+        raise ProfileExportError(f"Cannot send profile to {url}: {e}") from e
@@ -0,0 +1,170 @@
+import datetime
+import random
+from dataclasses import dataclass
+
+from .exceptions import InvalidCleanupError, InvalidScheduleError
+from .filters import parse_duration
+
+CRON_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+# (name, lowest, highest) of the five cron fields
+CRON_FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day of month", 1, 31), ("month", 1, 12), ("day of week", 0, 7))
+CRON_FIELD_COUNT = len(CRON_FIELDS)
+# A schedule that cannot fire within this many days (e.g. "0 0 31 2 *") is rejected
+MAX_LOOKAHEAD_DAYS = 366 * 5
+
+
+def _parse_field(text: str, name: str, lowest: int, highest: int) -> frozenset[int]:
+    values: set[int] = set()
+    for part in text.split(","):
+        spec, _, step_text = part.partition("/")
+        try:
+            step = int(step_text) if step_text else 1
+            if spec == "*":
+                start, end = lowest, highest
+            elif "-" in spec:
+                start, end = (int(bound) for bound in spec.split("-", 1))
+            else:
+                start = int(spec)
+                end = highest if step_text else start
+        except ValueError:
+            raise InvalidScheduleError(f"Invalid {name} '{part}' in cron expression.") from None
+        if step < 1 or not lowest <= start <= end <= highest:
+            raise InvalidScheduleError(f"Invalid {name} '{part}': values must be between {lowest} and {highest}.")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronSchedule:
+    """A five-field cron expression (minute, hour, day of month, month, day of week), in local time.
+
+    Fields accept ``*``, numbers, ranges ``a-b``, steps ``*/n`` or ``a-b/n`` and lists. As in cron, when both
+    the day of month and the day of week are restricted, a day matching either one is selected; Sunday is
+    0 or 7.
+    """
+
+    expression: str
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days: frozenset[int]
+    months: frozenset[int]
+    weekdays: frozenset[int]
+    any_day: bool
+    any_weekday: bool
+
+    @classmethod
+    def parse(cls, expression: str) -> "CronSchedule":
+        """Parse a cron expression or one of the ``@daily``-style macros.
+
+        Raises:
+            InvalidScheduleError: If the expression is not valid.
+        """
+        fields = CRON_MACROS.get(expression, expression).split()
+        if len(fields) != CRON_FIELD_COUNT:
+            raise InvalidScheduleError(
+                f"Invalid schedule '{expression}'. Use a cron expression with five fields, e.g. '*/15 * * * *', "
+                "or an interval such as '@every 1h'."
+            )
+        minutes, hours, days, months, weekdays = (
+            _parse_field(text, *spec) for text, spec in zip(fields, CRON_FIELDS, strict=True)
+        )
+        schedule = cls(
+            expression,
+            minutes,
+            hours,
+            days,
+            months,
+            frozenset(day % 7 for day in weekdays),
+            any_day=fields[2] == "*",
+            any_weekday=fields[4] == "*",
+        )
+        schedule.next_after(datetime.datetime(2000, 1, 1).timestamp())
+        return schedule
+
+    def _day_matches(self, day: datetime.date) -> bool:
+        in_month = day.day in self.days
+        in_week = day.isoweekday() % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, timestamp: float) -> float:
+        """Return the first matching minute strictly after ``timestamp``, as a Unix timestamp.
+
+        Raises:
+            InvalidScheduleError: If the expression never matches, e.g. February 31st.
+        """
+        moment = datetime.datetime.fromtimestamp(timestamp).replace(second=0, microsecond=0)
+        moment += datetime.timedelta(minutes=1)
+        limit = moment + datetime.timedelta(days=MAX_LOOKAHEAD_DAYS)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1) + datetime.timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(moment.date()):
+                moment = moment.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + datetime.timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += datetime.timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        raise InvalidScheduleError(f"The schedule '{self.expression}' never runs.")
+
+
+@dataclass(frozen=True)
+class IntervalSchedule:
+    """Run every ``seconds``, counted from the previous run."""
+
+    expression: str
+    seconds: float
+
+    @classmethod
+    def parse(cls, expression: str) -> "IntervalSchedule":
+        """Parse ``@every DURATION``, e.g. ``@every 1h30m``.
+
+        Raises:
+            InvalidScheduleError: If the duration is not valid or is zero.
+        """
+        duration = expression.removeprefix("@every").strip()
+        try:
+            seconds = parse_duration(duration)
+        except InvalidCleanupError as e:
+            raise InvalidScheduleError(str(e)) from e
+        if seconds <= 0:
+            raise InvalidScheduleError(f"Invalid schedule '{expression}': the interval must be positive.")
+        return cls(expression, seconds)
+
+    def next_after(self, timestamp: float) -> float:
+        """Return the time of the run following one at ``timestamp``."""
+        return timestamp + self.seconds
+
+
+Schedule = CronSchedule | IntervalSchedule
+
+
+def parse_schedule(expression: str) -> Schedule:
+    """Parse a schedule: ``@every DURATION``, a cron macro such as ``@daily``, or a five-field cron expression.
+
+    Raises:
+        InvalidScheduleError: If the expression is not valid.
+    """
+    expression = " ".join(expression.split())
+    if expression.startswith("@every"):
+        return IntervalSchedule.parse(expression)
+    return CronSchedule.parse(expression)
+
+
+def next_run(schedule: Schedule, after: float, jitter: float = 0.0) -> float:
+    """Return when a schedule next fires after ``after``, delayed by up to ``jitter`` random seconds.
+
+    Jitter spreads cleanups sharing a schedule so they do not all hit the daemon at the same moment.
+    """
+    return schedule.next_after(after) + (random.uniform(0, jitter) if jitter else 0.0)  # noqa: S311
@@ -0,0 +1,373 @@
+"""Long-running ``serve`` mode: scheduled cleanups and a control socket.
+
+The server keeps one Docker connection pool, one inventory and one database connection warm for every run;
+the inventory follows the daemon's event stream, so runs match against it without listing the daemon.
+Scheduled and triggered runs share a cap on concurrent runs, and a cleanup never runs twice at once.
+Clients talk to it over a Unix socket with one JSON request and one JSON answer per connection, each on its
+own line.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import signal
+import socket
+import stat
+import time
+from collections.abc import Coroutine, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from . import database
+from .docker_client import DockerClient
+from .engine import DEFAULT_BATCH_SIZE, DEFAULT_JOBS, CleanupEngine, CleanupResult
+from .exceptions import ControlSocketError, DockerToolsError
+from .inventory import DEFAULT_INVENTORY_TTL, EventInventoryProvider, InventoryProvider
+from .schedule import next_run, parse_schedule
+from .stats import save_run
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT_RUNS = 2
+# Seconds between two reads of the schedules table, so `schedule` changes are picked up without a reload
+SCHEDULE_RELOAD_INTERVAL = 60.0
+# Largest request a client may send
+MAX_REQUEST_SIZE = 64 * 1024
+
+
+def result_summary(results: dict[str, CleanupResult]) -> dict[str, dict[str, Any]]:
+    """Describe cleanup results as JSON: per resource type, what was removed, failed and reclaimed."""
+    return {
+        resource_type: {
+            "removed": len(result.removed),
+            "failed": len(result.failures),
+            "reclaimed": result.reclaimed,
+            "sized": result.sized,
+            "duration": round(result.duration, 3),
+            "error": str(result.error) if result.error is not None else None,
+            "failures": [f"{resource.kind} {resource.name}: {error}" for resource, error in result.failures],
+        }
+        for resource_type, result in results.items()
+    }
+
+
+class CleanupServer:
+    """Run cleanups on their schedules and on request from the control socket."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        host: str,
+        socket_path: Path,
+        *,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT_RUNS,
+        jobs: int = DEFAULT_JOBS,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        timeout: float | None = None,
+        inventory_ttl: float = DEFAULT_INVENTORY_TTL,
+        reload_interval: float = SCHEDULE_RELOAD_INTERVAL,
+        watch_events: bool = True,
+        rate_limit: float | None = None,
+    ) -> None:
+        """Prepare a server for ``host``, listening on ``socket_path`` once :meth:`serve` is called.
+
+        Args:
+            host: Docker host the cleanups run against.
+            socket_path: Unix socket the server is controlled through.
+            max_concurrent: Most runs in progress at once; later ones wait for a free slot.
+            jobs: Removal threads of a run.
+            batch_size: Resources removed per batch.
+            timeout: Seconds to wait for the daemon to answer a request; no limit when omitted.
+            inventory_ttl: Seconds a listing of the host may be reused for.
+            reload_interval: Seconds between two reads of the schedules from the database.
+            watch_events: Keep the listing current from the daemon's events instead of listing before runs.
+            rate_limit: Most removal calls to start per second; unlimited when omitted.
+        """
+        self.host = host
+        self.socket_path = Path(socket_path)
+        self.max_concurrent = max_concurrent
+        self.jobs = jobs
+        self.batch_size = batch_size
+        self.reload_interval = reload_interval
+        self.client = DockerClient(host, timeout=timeout)
+        self.inventory = (
+            EventInventoryProvider(self.client, ttl=inventory_ttl)
+            if watch_events
+            else InventoryProvider(self.client, ttl=inventory_ttl)
+        )
+        self.engine = CleanupEngine(self.client, self.inventory, rate_limit=rate_limit)
+        self.started_at = time.time()
+        self.runs_completed = 0
+        self.schedules: dict[int, database.ScheduleSchema] = {}
+        # Next run time of each scheduled cleanup, by cleanup ID
+        self.due: dict[int, float] = {}
+        # Names of the cleanups being run, by cleanup ID
+        self.running: dict[int, str] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="cleanup-run")
+        self._tasks: set[asyncio.Task] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._wake: asyncio.Event | None = None
+        self._stopping: asyncio.Event | None = None
+
+    async def serve(self) -> None:
+        """Listen on the control socket and run the scheduler until :meth:`stop` is called.
+
+        Raises:
+            ControlSocketError: If another server is already listening on the socket.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self._wake = asyncio.Event()
+        self._stopping = asyncio.Event()
+        _claim_socket(self.socket_path)
+        # Created owner-only rather than restricted after binding, so no other user can connect in between
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(
+                self._handle_client, path=str(self.socket_path), limit=MAX_REQUEST_SIZE
+            )
+        finally:
+            os.umask(umask)
+        if isinstance(self.inventory, EventInventoryProvider):
+            self.inventory.start()
+        scheduler = asyncio.create_task(self._schedule_loop())
+        logger.info("Serving on %s against %s", self.socket_path, self.host)
+        try:
+            await self._stopping.wait()
+        finally:
+            scheduler.cancel()
+            server.close()
+            await server.wait_closed()
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._executor.shutdown(wait=True)
+            if isinstance(self.inventory, EventInventoryProvider):
+                await asyncio.to_thread(self.inventory.stop)
+            self.client.close()
+            with contextlib.suppress(FileNotFoundError):
+                self.socket_path.unlink()
+            self._loop = None
+
+    def stop(self) -> None:
+        """Ask the server to stop once the running cleanups are done. Safe to call from any thread."""
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    async def reload(self) -> None:
+        """Re-read the schedules from the database; changed schedules get a new next run time."""
+        schedules = {s.cleanup_id: s for s in await asyncio.to_thread(database.list_schedules)}
+        now = time.time()
+        for cleanup_id, schedule in schedules.items():
+            previous = self.schedules.get(cleanup_id)
+            if previous is None or (previous.expression, previous.jitter) != (schedule.expression, schedule.jitter):
+                self.due[cleanup_id] = next_run(parse_schedule(schedule.expression), now, schedule.jitter)
+        for cleanup_id in self.due.keys() - schedules.keys():
+            del self.due[cleanup_id]
+        self.schedules = schedules
+        self._wake.set()
+
+    async def _schedule_loop(self) -> None:
+        next_reload = 0.0
+        while True:
+            now = time.time()
+            if now >= next_reload:
+                try:
+                    await self.reload()
+                except DockerToolsError as e:
+                    logger.error("Cannot load schedules: %s", e)
+                next_reload = now + self.reload_interval
+            for cleanup_id, due in list(self.due.items()):
+                if due > now:
+                    continue
+                schedule = self.schedules[cleanup_id]
+                # Counted from now, so a server that was paused does not replay every missed run
+                self.due[cleanup_id] = next_run(parse_schedule(schedule.expression), now, schedule.jitter)
+                if cleanup_id in self.running:
+                    logger.warning("Skipping scheduled run of %s: the previous one is running", schedule.cleanup_name)
+                    continue
+                self._start(self.run([schedule.cleanup_name], trigger="schedule"))
+            wake_at = min([next_reload, *self.due.values()])
+            self._wake.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), max(wake_at - time.time(), 0))
+
+    def _start(self, run: Coroutine[Any, Any, dict[str, CleanupResult]]) -> asyncio.Task:
+        task = asyncio.create_task(run)
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+        return task
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Run failed: %s", task.exception())
+
+    async def run(self, names: Sequence[str], trigger: str = "control") -> dict[str, CleanupResult]:
+        """Run saved cleanups together, waiting for a free slot first.
+
+        Raises:
+            DockerToolsError: If a name does not match a saved cleanup, or one of them is already running.
+        """
+        return await self._run(await self._claim(names), trigger)
+
+    async def _claim(self, names: Sequence[str]) -> list[database.CleanupSchema]:
+        """Look up saved cleanups and mark them as running, so a second run of them is refused.
+
+        Raises:
+            DockerToolsError: If a name does not match a saved cleanup, or one of them is already running.
+        """
+        cleanups = await asyncio.to_thread(database.get_cleanups_by_names, list(names))
+        missing = set(names) - {c.name for c in cleanups}
+        if missing:
+            raise DockerToolsError(f"No cleanup named {', '.join(sorted(missing))}")
+        busy = [c.name for c in cleanups if c.id in self.running]
+        if busy:
+            raise DockerToolsError(f"Already running: {', '.join(busy)}")
+        self.running.update((c.id, c.name) for c in cleanups)
+        return cleanups
+
+    async def _run(self, cleanups: list[database.CleanupSchema], trigger: str) -> dict[str, CleanupResult]:
+        try:
+            async with self._slots:
+                results = await self._loop.run_in_executor(self._executor, self._clean, cleanups)
+        finally:
+            for cleanup in cleanups:
+                self.running.pop(cleanup.id, None)
+        self.runs_completed += 1
+        removed = sum(len(r.removed) for r in results.values())
+        failed = sum(len(r.failures) for r in results.values())
+        logger.info("Ran %s (%s): %s removed, %s failed", ", ".join(c.name for c in cleanups), trigger, removed, failed)
+        return results
+
+    def _clean(self, cleanups: list[database.CleanupSchema]) -> dict[str, CleanupResult]:
+        results = self.engine.clean_many(cleanups, jobs=self.jobs, batch_size=self.batch_size)
+        try:
+            save_run(cleanups, {self.host: results})
+        except DockerToolsError as e:
+            logger.warning("Could not record run statistics: %s", e)
+        return results
+
+    def status(self) -> dict[str, Any]:
+        """Describe the server: host, uptime, runs in progress and the next run of every schedule."""
+        return {
+            "host": self.host,
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started_at, 1),
+            "runs_completed": self.runs_completed,
+            "max_concurrent": self.max_concurrent,
+            "running": sorted(self.running.values()),
+            "inventory": self._inventory_status(),
+            "schedules": [
+                {"name": s.cleanup_name, "expression": s.expression, "jitter": s.jitter, "next_run": self.due.get(i)}
+                for i, s in sorted(self.schedules.items(), key=lambda item: item[1].cleanup_name)
+            ],
+        }
+
+    def _inventory_status(self) -> dict[str, Any]:
+        if not isinstance(self.inventory, EventInventoryProvider):
+            return {"live": False}
+        snapshot = self.inventory.current()
+        return {
+            "live": self.inventory.live,
+            "resources": len(snapshot) if snapshot is not None else None,
+            "events": self.inventory.events_applied,
+            "resyncs": self.inventory.resyncs,
+        }
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            line = await reader.readuntil(b"\n")
+            answer = await self._answer(json.loads(line))
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, json.JSONDecodeError, ValueError) as e:
+            answer = {"ok": False, "error": f"Invalid request: {e}"}
+        except DockerToolsError as e:
+            answer = {"ok": False, "error": str(e)}
+        try:
+            writer.write(json.dumps(answer).encode() + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _answer(self, request: dict[str, Any]) -> dict[str, Any]:
+        command = request.get("command")
+        if command == "run":
+            names = request.get("names") or []
+            if not names or not all(isinstance(name, str) for name in names):
+                raise ValueError("'names' must be a non-empty list of cleanup names")
+            # Claimed before answering, so a run that cannot start is reported even when not waited for
+            task = self._start(self._run(await self._claim(names), trigger="control"))
+            if not request.get("wait", True):
+                return {"ok": True, "started": names}
+            return {"ok": True, "results": result_summary(await task)}
+        if command == "status":
+            return {"ok": True, **self.status()}
+        if command == "reload":
+            await self.reload()
+            return {"ok": True, "schedules": len(self.schedules)}
+        if command == "stop":
+            self.stop()
+            return {"ok": True}
+        raise ValueError(f"Unknown command {command!r}")
+
+
+def _claim_socket(path: Path) -> None:
+    """Remove a socket left behind by a server that is gone, refusing to take over a live one.
+
+    Raises:
+        ControlSocketError: If a server is listening on the path, or the path is not a socket.
+    """
+    try:
+        mode = path.lstat().st_mode
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ControlSocketError(f"{path} exists and is not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(path))
+        except OSError:
+            path.unlink()
+            return
+    raise ControlSocketError(f"A server is already listening on {path}")
+
+
+def run_server(server: CleanupServer) -> None:
+    """Run a server until SIGINT or SIGTERM."""
+
+    async def main() -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, server.stop)
+        await server.serve()
+
+    asyncio.run(main())
+
+
+def send_request(socket_path: Path, request: dict[str, Any], timeout: float | None = None) -> dict[str, Any]:
+    """Send one request to a running server and return its answer.
+
+    Raises:
+        ControlSocketError: If no server listens on the socket, or it answers with an error.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(str(socket_path))
+            conn.sendall(json.dumps(request).encode() + b"\n")
+            with conn.makefile("rb") as answer:
+                line = answer.readline(MAX_REQUEST_SIZE * 16)
+    except OSError as e:
+        raise ControlSocketError(f"Cannot reach the server on {socket_path}: {e}") from e
+    try:
+        answer = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ControlSocketError(f"Invalid answer from the server on {socket_path}") from e
+    if not answer.get("ok"):
+        raise ControlSocketError(answer.get("error") or "The server refused the request")
+    return answer
@@ -1,9 +1,12 @@
+import os
 from pathlib import Path
 from typing import Any, ClassVar
 
 import tomli
 from pydantic import BaseModel, Field
 
+from .defaults import DEFAULT_BATCH_SIZE, DEFAULT_CACHE_TTL, DEFAULT_DOCKER_HOST, DEFAULT_JOBS
+
 
 class Settings(BaseModel):
     """Application settings configuration."""
@@ -11,6 +14,39 @@ class Settings(BaseModel):
     database_path: Path = Field(description="Path to the SQLite database file")
     log_level: str = "INFO"
     default_timeout: int = Field(30, gt=0, description="Default timeout in seconds for Docker operations")
+    docker_host: str = Field(
+        default_factory=lambda: os.environ.get("DOCKER_HOST", DEFAULT_DOCKER_HOST),
+        description="Docker Engine API endpoint, e.g. unix:///var/run/docker.sock",
+    )
+    hosts: list[str] = Field(
+        default_factory=list, description="Docker hosts clean runs against concurrently instead of docker_host"
+    )
+    host_deadline: float | None = Field(
+        None, gt=0, description="Seconds each host of a multi-host clean may take; unlimited when unset"
+    )
+    inventory_ttl: float = Field(5.0, ge=0, description="Seconds a listing of Docker resources is reused")
+    inventory_cache_ttl: float = Field(
+        DEFAULT_CACHE_TTL,
+        ge=0,
+        description="Seconds an inventory cached on disk is reused by later `clean` runs; 0 disables the cache",
+    )
+    inventory_cache_dir: Path | None = Field(
+        None, description="Folder of the inventory cache; defaults to the configuration folder"
+    )
+    jobs: int = Field(DEFAULT_JOBS, ge=1, description="Default number of resources removed concurrently by clean")
+    removal_rate_limit: float | None = Field(
+        None, gt=0, description="Removal requests sent to a Docker host per second at most; unlimited when unset"
+    )
+    batch_size: int = Field(
+        DEFAULT_BATCH_SIZE, ge=1, description="Matches handed to the removal workers at a time while listing"
+    )
+    control_socket: Path | None = Field(
+        None, description="Unix socket of `serve`; defaults to control.sock in the configuration folder"
+    )
+    max_concurrent_runs: int = Field(2, ge=1, description="Cleanups `serve` runs at the same time")
+    watch_events: bool = Field(
+        True, description="Keep the inventory of `serve` current from the daemon's event stream instead of re-listing"
+    )
 
     logging_config: ClassVar[dict[str, Any]] = {
         "version": 1,
@@ -47,4 +83,9 @@ class Settings(BaseModel):
         return folder
 
 
-settings = Settings.load()
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    """Load ``settings`` on first access so importing this module stays cheap."""
+    if name == "settings":
+        globals()["settings"] = loaded = Settings.load()
+        return loaded
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,178 @@
+import math
+import statistics
+import uuid
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from . import database
+from .database import RunRecord
+
+if TYPE_CHECKING:
+    from .database import CleanupSchema
+    from .engine import CleanupResult
+
+# Fewer runs than this make a trend meaningless.
+MIN_TREND_RUNS = 4
+
+
+def run_records(
+    cleanups: Sequence["CleanupSchema"],
+    results: Mapping[str, "CleanupResult"],
+    host: str = "",
+    run_id: str | None = None,
+) -> list[RunRecord]:
+    """Describe the results of one clean run as rows of the ``runs`` table, one per resource type.
+
+    Resource types the run never reached (because an earlier phase failed) are left out.
+    """
+    run_id = run_id or uuid.uuid4().hex
+    single = cleanups[0] if len(cleanups) == 1 else None
+    name = single.name if single else ", ".join(sorted(c.name for c in cleanups))
+    return [
+        RunRecord(
+            run_id=run_id,
+            cleanup_id=single.id if single else None,
+            cleanup_name=name,
+            host=host,
+            resource_type=resource_type,
+            started_at=result.started_at,
+            finished_at=result.finished_at or result.started_at,
+            matched=result.matched,
+            deleted=len(result.removed),
+            failed=len(result.failures),
+            reclaimed=result.reclaimed,
+            duration=result.duration,
+            error=str(result.error) if result.error is not None else None,
+        )
+        for resource_type, result in results.items()
+        if result.started_at is not None
+    ]
+
+
+def save_run(cleanups: Sequence["CleanupSchema"], results_by_host: Mapping[str, Mapping[str, "CleanupResult"]]) -> None:
+    """Record a run against one or more hosts in the ``runs`` table, under a single run ID.
+
+    Raises:
+        DatabaseError: If the rows cannot be written.
+    """
+    run_id = uuid.uuid4().hex
+    database.record_runs(
+        [
+            record
+            for host, results in results_by_host.items()
+            for record in run_records(cleanups, results, host=host, run_id=run_id)
+        ]
+    )
+
+
+@dataclass
+class RunSummary:
+    """All resource types of one run on one host, added up."""
+
+    run_id: str
+    cleanup_name: str
+    host: str
+    started_at: float
+    finished_at: float
+    matched: int = 0
+    deleted: int = 0
+    failed: int = 0
+    reclaimed: int = 0
+
+    @property
+    def duration(self) -> float:
+        """Wall-clock seconds from the first resource type started to the last one finished.
+
+        Volumes and images are removed together, so this is less than the sum of the per-type durations.
+        """
+        return self.finished_at - self.started_at
+
+
+@dataclass
+class CleanupStats:
+    """Statistics of the runs recorded under one cleanup name."""
+
+    cleanup_name: str
+    runs: int
+    p50: float
+    p95: float
+    total_duration: float
+    deleted: int
+    failed: int
+    reclaimed: int
+    trend: float | None
+
+    @property
+    def reclaimed_per_second(self) -> float:
+        """Bytes freed per second of cleaning."""
+        return self.reclaimed / self.total_duration if self.total_duration else 0.0
+
+
+def summarize_runs(records: Iterable[RunRecord]) -> list[RunSummary]:
+    """Group run rows by run and host, in the order the runs started."""
+    summaries: dict[tuple[str, str], RunSummary] = {}
+    for record in records:
+        key = (record.run_id, record.host)
+        summary = summaries.get(key)
+        if summary is None:
+            summary = summaries[key] = RunSummary(
+                record.run_id, record.cleanup_name, record.host, record.started_at, record.finished_at
+            )
+        summary.started_at = min(summary.started_at, record.started_at)
+        summary.finished_at = max(summary.finished_at, record.finished_at)
+        summary.matched += record.matched
+        summary.deleted += record.deleted
+        summary.failed += record.failed
+        summary.reclaimed += record.reclaimed
+    return sorted(summaries.values(), key=lambda s: s.started_at)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Return the ``q``-th percentile (0-100) of ``values`` by the nearest-rank method, or 0 if empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def trend(durations: Sequence[float]) -> float | None:
+    """Relative change of the median duration between the older and the more recent half of the runs.
+
+    Returns:
+        ``0.25`` when recent runs take 25% longer, ``-0.5`` when they take half the time, or ``None``
+        when there are too few runs to tell.
+    """
+    if len(durations) < MIN_TREND_RUNS:
+        return None
+    half = len(durations) // 2
+    before = statistics.median(durations[:half])
+    after = statistics.median(durations[-half:])
+    if not before:
+        return None
+    return after / before - 1
+
+
+def cleanup_stats(summaries: Iterable[RunSummary]) -> list[CleanupStats]:
+    """Compute per-cleanup statistics, the most expensive (longest total duration) first."""
+    by_name: dict[str, list[RunSummary]] = {}
+    for summary in summaries:
+        by_name.setdefault(summary.cleanup_name, []).append(summary)
+    stats = []
+    for name, runs in by_name.items():
+        durations = [run.duration for run in runs]
+        stats.append(
+            CleanupStats(
+                cleanup_name=name,
+                runs=len(runs),
+                p50=percentile(durations, 50),
+                p95=percentile(durations, 95),
+                total_duration=sum(durations),
+                deleted=sum(run.deleted for run in runs),
+                failed=sum(run.failed for run in runs),
+                reclaimed=sum(run.reclaimed for run in runs),
+                trend=trend(durations),
+            )
+        )
+    return sorted(stats, key=lambda s: s.total_duration, reverse=True)
@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+import tomli
+from pydantic import ValidationError
+
+from .database import CleanupSchema, cleanup_row
+from .exceptions import DockerToolsError, InvalidCleanupError
+from .filters import parse_size
+
+FORMATS = ("toml", "json", "csv")
+# Fields of a cleanup definition, in the order they are exported; IDs are local to a database
+DEFINITION_FIELDS = ("name", "regular_expression", "labels", "until", "min_size", "keep_latest", "match_fields")
+# Separates the label filters or match fields of a cleanup in a CSV cell
+CSV_LABEL_SEPARATOR = ";"
+# Invalid definitions listed in the error raised by parse_definitions
+MAX_REPORTED_ERRORS = 10
+
+
+def detect_format(path: Path) -> str:
+    """Guess the format of a definitions file from its extension.
+
+    Raises:
+        InvalidCleanupError: If the extension is not .toml, .json or .csv.
+    """
+    suffix = path.suffix.lower().lstrip(".")
+    if suffix not in FORMATS:
+        raise InvalidCleanupError(f"Cannot tell the format of {path.name}; use --format toml, json or csv.")
+    return suffix
+
+
+def read_definitions(text: str, file_format: str) -> list[dict[str, Any]]:
+    """Parse the cleanup definitions of a TOML, JSON or CSV document, without validating them.
+
+    TOML holds a ``[[cleanups]]`` table per definition; JSON a list of objects, bare or under ``cleanups``;
+    CSV a header naming the fields, with the label filters and match fields of a cleanup separated by ``;``.
+
+    Raises:
+        InvalidCleanupError: If the document cannot be parsed.
+    """
+    try:
+        if file_format == "toml":
+            records = tomli.loads(text).get("cleanups", [])
+        elif file_format == "json":
+            records = json.loads(text)
+            if isinstance(records, dict):
+                records = records.get("cleanups", [])
+        else:
+            records = [_from_csv_row(row) for row in csv.DictReader(io.StringIO(text))]
+    except (tomli.TOMLDecodeError, json.JSONDecodeError, csv.Error) as e:
+        raise InvalidCleanupError(f"Invalid {file_format.upper()} document: {e}") from e
+    if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+        raise InvalidCleanupError("Cleanup definitions must be a list of tables or objects.")
+    return records
+
+
+def _from_csv_row(row: dict[str, str | None]) -> dict[str, Any]:
+    record: dict[str, Any] = {key: value for key, value in row.items() if key and value}
+    for key in ("labels", "match_fields"):
+        if key in record:
+            record[key] = [item.strip() for item in record[key].split(CSV_LABEL_SEPARATOR) if item.strip()]
+    return record
+
+
+def _values(record: dict[str, Any]) -> dict[str, Any]:
+    unknown = sorted(set(record) - {*DEFINITION_FIELDS, "id"})
+    if unknown:
+        raise InvalidCleanupError(f"Unknown field(s): {', '.join(unknown)}")
+    values = {field: record[field] for field in DEFINITION_FIELDS if record.get(field) is not None}
+    if isinstance(values.get("min_size"), str):
+        values["min_size"] = parse_size(values["min_size"])
+    return values
+
+
+def _unchanged(values: dict[str, Any], stored: Mapping[str, tuple]) -> bool:
+    if values.get("name") not in stored:
+        return False
+    try:
+        return cleanup_row(values) == stored[values["name"]]
+    except TypeError:
+        return False
+
+
+def _describe_error(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, item['loc'])) or 'definition'}: {item['msg']}" for item in error.errors())
+
+
+def parse_definitions(
+    records: Sequence[dict[str, Any]], stored: Mapping[str, tuple] | None = None
+) -> tuple[list[CleanupSchema], int]:
+    """Validate every definition, regular expressions included, before any of them is stored.
+
+    A size such as ``500MB`` is accepted for ``min_size``; an ``id`` is ignored.
+
+    Args:
+        records: Definitions as read by :func:`read_definitions`.
+        stored: Stored rows by name, see ``DatabaseManager.stored_rows``. Definitions identical to their
+            stored row were validated when they were stored; they are left out without compiling their
+            pattern again, which keeps re-importing a large file cheap.
+
+    Returns:
+        The cleanups to store and the number of definitions left out because they are already stored.
+
+    Raises:
+        InvalidCleanupError: Listing the invalid definitions by position and name, or the names defined
+            more than once.
+    """
+    cleanups, errors, positions, unchanged = [], [], {}, 0
+    for position, record in enumerate(records, start=1):
+        name = record.get("name") or "?"
+        if name in positions:
+            errors.append(f"#{position} {name}: also defined by #{positions[name]}")
+            continue
+        try:
+            values = _values(record)
+            if _unchanged(values, stored or {}):
+                unchanged += 1
+            else:
+                cleanups.append(CleanupSchema(**values))
+        except ValidationError as e:
+            errors.append(f"#{position} {name}: {_describe_error(e)}")
+            continue
+        except DockerToolsError as e:
+            errors.append(f"#{position} {name}: {e}")
+            continue
+        positions[name] = position
+    if errors:
+        shown = "\n".join(f"  {error}" for error in errors[:MAX_REPORTED_ERRORS])
+        more = f"\n  ... and {len(errors) - MAX_REPORTED_ERRORS} more" if len(errors) > MAX_REPORTED_ERRORS else ""
+        raise InvalidCleanupError(f"{len(errors)} invalid cleanup definition(s), nothing imported:\n{shown}{more}")
+    return cleanups, unchanged
+
+
+def _definition(cleanup: CleanupSchema) -> dict[str, Any]:
+    """The exported fields of a cleanup, leaving out those that are not set."""
+    values = cleanup.model_dump(include=set(DEFINITION_FIELDS))
+    return {field: values[field] for field in DEFINITION_FIELDS if values[field] not in (None, [], "")}
+
+
+def _toml_value(value: str | int | list[str]) -> str:
+    if isinstance(value, list):
+        return f"[{', '.join(map(_toml_value, value))}]"
+    if isinstance(value, int):
+        return str(value)
+    # A JSON string is a valid TOML basic string, except for DEL which TOML wants escaped
+    return json.dumps(value, ensure_ascii=False).replace("\x7f", "\\u007f")
+
+
+def format_definitions(cleanups: Iterable[CleanupSchema], file_format: str) -> str:
+    """Render cleanups as a TOML, JSON or CSV document that :func:`read_definitions` reads back."""
+    definitions = [_definition(cleanup) for cleanup in cleanups]
+    if file_format == "json":
+        return json.dumps({"cleanups": definitions}, indent=2, ensure_ascii=False) + "\n"
+    if file_format == "toml":
+        tables = (
+            "[[cleanups]]\n" + "".join(f"{key} = {_toml_value(value)}\n" for key, value in definition.items())
+            for definition in definitions
+        )
+        return "\n".join(tables)
+    output = io.StringIO()
+    writer = csv.DictWriter(output, DEFINITION_FIELDS, lineterminator="\n")
+    writer.writeheader()
+    for definition in definitions:
+        for key in ("labels", "match_fields"):
+            if key in definition:
+                definition[key] = CSV_LABEL_SEPARATOR.join(definition[key])
+        writer.writerow(definition)
+    return output.getvalue()
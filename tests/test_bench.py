@@ -0,0 +1,42 @@
+import json
+
+from click.testing import CliRunner
+
+from docker_tools_plus.bench import STAGES, bench_cleanups, bench_report, run_case, synthetic_inventory
+from docker_tools_plus.cli import cli
+from docker_tools_plus.inventory import container_from_api, resource_matcher
+
+
+def test_synthetic_inventory_match_ratio():
+    inventory = synthetic_inventory(100, patterns=3, match_ratio=0.2)
+    assert {len(resources) for resources in inventory.values()} == {100}
+    matches = resource_matcher(bench_cleanups(3))
+    matched = [c for c in map(container_from_api, inventory["containers"]) if matches(c)]
+    assert len(matched) == 20
+    # Every pattern selects its share of the matches
+    assert {c.name.split("-")[0] for c in matched} == {"job0", "job1", "job2"}
+
+
+def test_run_case_measures_every_stage():
+    results = run_case(40, 2, match_ratio=0.25, jobs=2, batch_size=4)
+    assert [r.stage for r in results] == list(STAGES)
+    items = {r.stage: r.items for r in results}
+    assert items == {"list": 120, "match": 120, "attribute": 120, "delete": 30, "clean": 30}
+    assert all(r.seconds > 0 and r.per_second > 0 for r in results)
+
+
+def test_report_is_json():
+    report = bench_report(run_case(10, 1, match_ratio=0.5), latency_ms=0)
+    assert json.loads(json.dumps(report))["parameters"] == {"latency_ms": 0}
+    assert set(report["results"][0]) == {"stage", "size", "patterns", "items", "seconds", "per_second"}
+
+
+def test_bench_command(tmp_path):
+    report_file = tmp_path / "bench.json"
+    result = CliRunner().invoke(
+        cli, ["bench", "-n", "20", "-p", "1", "-p", "2", "--format", "json", "--report", str(report_file)]
+    )
+    assert result.exit_code == 0
+    report = json.loads(report_file.read_text())
+    assert [(r["patterns"], r["stage"]) for r in report["results"]] == [(p, s) for p in (1, 2) for s in STAGES]
+    assert report["parameters"]["match_ratio"] == 0.1
@@ -0,0 +1,133 @@
+import pytest
+
+from docker_tools_plus import cache
+from docker_tools_plus.cache import CachedInventoryProvider, cache_path
+from docker_tools_plus.database import CleanupSchema
+from docker_tools_plus.docker_client import DockerClient
+from docker_tools_plus.engine import CleanupEngine
+from docker_tools_plus.fake_daemon import FakeDockerDaemon, container, image, volume
+
+
+@pytest.fixture
+def daemon():
+    with FakeDockerDaemon(
+        containers=[container("c1", "api_1", image="api:latest"), container("c2", "worker_1")],
+        volumes=[volume("api_data", Labels={"team": "payments"})],
+        images=[image("sha256:i1", "api:latest"), image("sha256:i2", "worker:latest")],
+    ) as daemon:
+        yield daemon
+
+
+@pytest.fixture
+def client(daemon):
+    with DockerClient(daemon.base_url) as client:
+        yield client
+
+
+@pytest.fixture
+def path(tmp_path, daemon):
+    return cache_path(tmp_path, daemon.base_url)
+
+
+def listings(daemon):
+    return sum(request in {("GET", "/containers/json"), ("GET", "/volumes")} for request in daemon.requests)
+
+
+def warm(client, path):
+    provider = CachedInventoryProvider(client, path)
+    provider.get()
+    provider.save()
+    return provider
+
+
+class TestCachedInventoryProvider:
+    def test_warm_cache_skips_the_listing(self, daemon, client, path):
+        assert not warm(client, path).loaded
+        listed = listings(daemon)
+
+        provider = CachedInventoryProvider(client, path)
+        inventory = provider.current()
+        assert provider.loaded
+        assert listings(daemon) == listed
+        assert len(inventory) == 5
+        assert inventory.by_id["api_data"].labels == {"team": "payments"}
+        assert inventory.by_id["api_data"].driver == "local"
+
+    def test_changes_since_the_cache_are_replayed(self, daemon, client, path):
+        warm(client, path)
+        daemon.create("containers", container("c3", "api_2"))
+        client.remove_volume("api_data")
+        listed = listings(daemon)
+
+        provider = CachedInventoryProvider(client, path)
+        inventory = provider.get()
+        assert provider.loaded
+        assert {r.id for r in inventory.of_type("containers")} == {"c1", "c2", "c3"}
+        assert inventory.of_type("volumes") == []
+        # The new container was fetched on its own, with a filtered listing
+        assert listings(daemon) == listed + 1
+
+    @pytest.mark.parametrize("change", ["ttl", "daemon", "uncounted", "corrupt", "unsized"])
+    def test_unusable_cache_is_listed_again(self, daemon, client, path, change):
+        warm(client, path)
+        cache_ttl = cache.DEFAULT_CACHE_TTL
+        if change == "ttl":
+            cache_ttl = 0
+        elif change == "daemon":
+            daemon.daemon_id = "OTHER"
+        elif change == "uncounted":
+            # Created without an event, while another change is replayed
+            daemon.containers["c3"] = container("c3", "api_2")
+            daemon.emit("containers", "rename", "c2")
+        elif change == "corrupt":
+            path.write_bytes(b"not a cache")
+
+        provider = CachedInventoryProvider(client, path, cache_ttl=cache_ttl)
+        # A cache listed without sizes cannot serve a selection by size
+        inventory = provider.get(sizes=change == "unsized")
+        assert len(inventory) == 5 + (change == "uncounted")
+        assert not provider.loaded
+        assert inventory.sized == (change == "unsized")
+
+    def test_changes_lost_from_the_daemon_events_are_listed(self, daemon, client, path):
+        warm(client, path)
+        with daemon.lock:
+            daemon.containers["c2"]["Names"] = ["/worker_2"]
+        daemon.emit("containers", "rename", "c2")
+        # Pushes the rename out of the events the daemon keeps for replays
+        for _ in range(cache.DAEMON_EVENT_BUFFER):
+            daemon.emit("containers", "exec_start", "c1")
+
+        provider = CachedInventoryProvider(client, path)
+        inventory = provider.get()
+        assert not provider.loaded
+        assert inventory.by_id["c2"].name == "worker_2"
+
+    def test_cold_cache_streams_the_listing(self, daemon, client, path):
+        provider = CachedInventoryProvider(client, path)
+        assert provider.current() is None
+        assert listings(daemon) == 0
+        # Nothing was listed yet, and listing only to fill the cache is not worth it
+        provider.save()
+        assert not path.exists()
+
+        CleanupEngine(client, provider).clean_many([CleanupSchema(name="none", regular_expression="^none$")])
+        provider.save()
+        # The run streamed each type once; what it listed is what was saved
+        assert listings(daemon) == 2
+        inventory = CachedInventoryProvider(client, path).current()
+        assert inventory is not None
+        assert len(inventory) == 5
+
+    def test_removals_of_a_run_are_kept(self, daemon, client, path):
+        provider = CachedInventoryProvider(client, path)
+        results = CleanupEngine(client, provider).clean_many([CleanupSchema(name="api", regular_expression="api")])
+        assert {t: len(r.removed) for t, r in results.items()} == {"containers": 1, "volumes": 1, "images": 1}
+        provider.save()
+        listed = listings(daemon)
+
+        provider = CachedInventoryProvider(client, path)
+        inventory = provider.get()
+        assert provider.loaded
+        assert sorted(inventory.by_id) == ["c2", "sha256:i2"]
+        assert listings(daemon) == listed
@@ -1,11 +1,18 @@
-import subprocess
-from unittest.mock import MagicMock, call, patch
+import datetime
+import json
+from unittest.mock import MagicMock, patch
 
 import pytest
 from click.testing import CliRunner
 
+from docker_tools_plus import engine
 from docker_tools_plus.cli import cli
-from docker_tools_plus.database import CleanupSchema
+from docker_tools_plus.database import CleanupSchema, ImportSummary, RunRecord, ScheduleSchema
+from docker_tools_plus.engine import CleanupResult
+from docker_tools_plus.exceptions import DatabaseError, DockerCommandError, InvalidCleanupError
+from docker_tools_plus.fleet import HostResult
+from docker_tools_plus.inventory import Inventory, Resource
+from docker_tools_plus.plan import CleanupPlan
 
 
 class TestListCleanups:
@@ -22,29 +29,47 @@ class TestCLI:
         self.runner = CliRunner()
         # Patch the database functions
         self.db_patchers = {
-            "get_cleanup_by_name": patch("docker_tools_plus.cli.get_cleanup_by_name"),
-            "create_cleanup": patch("docker_tools_plus.cli.create_cleanup"),
-            "list_cleanups": patch("docker_tools_plus.cli.list_cleanups"),
-            "delete_cleanup": patch("docker_tools_plus.cli.delete_cleanup"),
+            "get_cleanup_by_name": patch("docker_tools_plus.database.get_cleanup_by_name"),
+            "create_cleanup": patch("docker_tools_plus.database.create_cleanup"),
+            "list_cleanups": patch("docker_tools_plus.database.list_cleanups"),
+            "delete_cleanup": patch("docker_tools_plus.database.delete_cleanup"),
+            "get_cleanups_by_names": patch("docker_tools_plus.database.get_cleanups_by_names"),
+            "search_cleanups": patch("docker_tools_plus.database.search_cleanups"),
+            "record_runs": patch("docker_tools_plus.database.record_runs"),
+            "list_runs": patch("docker_tools_plus.database.list_runs"),
+            "stored_rows": patch("docker_tools_plus.database.stored_rows", return_value={}),
+            "import_cleanups": patch("docker_tools_plus.database.import_cleanups"),
         }
         self.mocks = {name: patcher.start() for name, patcher in self.db_patchers.items()}
         # Patch logger
         self.logger_patcher = patch("docker_tools_plus.cli.logger")
         self.mock_logger = self.logger_patcher.start()
-        # Patch subprocess
-        self.subprocess_patcher = patch("docker_tools_plus.cli.subprocess")
-        self.mock_subprocess = self.subprocess_patcher.start()
+        # Patch the Docker client and cleanup engine
+        self.client_patcher = patch("docker_tools_plus.docker_client.DockerClient")
+        self.mock_client = self.client_patcher.start()
+        self.engine_patcher = patch("docker_tools_plus.engine.CleanupEngine")
+        self.mock_engine = self.engine_patcher.start().return_value
+        self.mock_engine.clean_many.side_effect = lambda cleanups, resource_types, jobs, batch_size: {
+            t: CleanupResult(t) for t in resource_types
+        }
         # Patch settings
-        self.settings_patcher = patch("docker_tools_plus.cli.settings")
+        self.settings_patcher = patch("docker_tools_plus.settings.settings")
         self.mock_settings = self.settings_patcher.start()
         self.mock_settings.database_path = "/test/db/path"
+        self.mock_settings.jobs = 8
+        self.mock_settings.batch_size = 100
+        self.mock_settings.hosts = []
+        self.mock_settings.docker_host = "unix:///var/run/docker.sock"
+        self.mock_settings.inventory_cache_ttl = 0
+        self.mock_settings.removal_rate_limit = None
 
         yield
 
         for patcher in self.db_patchers.values():
             patcher.stop()
         self.logger_patcher.stop()
-        self.subprocess_patcher.stop()
+        self.client_patcher.stop()
+        self.engine_patcher.stop()
         self.settings_patcher.stop()
 
     def test_about(self):
@@ -54,14 +79,11 @@ class TestCLI:
 
     def test_clean_no_match_creates_new(self):
         self.mocks["get_cleanup_by_name"].return_value = []
-        mock_cleanup = MagicMock(spec=CleanupSchema)
-        mock_cleanup.id = 1
-        mock_cleanup.name = "test"
-        mock_cleanup.regular_expression = "test.*"
-        self.mocks["create_cleanup"].return_value = mock_cleanup
-
-        # Simulate user input for regex prompt
-        inputs = ["test.*"]
+        cleanup = CleanupSchema(id=1, name="test", regular_expression="test.*")
+        self.mocks["create_cleanup"].return_value = cleanup
+
+        # Simulate user input for regex prompt, then accept all three resource types
+        inputs = ["test.*", "y", "y", "y"]
         result = self.runner.invoke(cli, ["clean", "test"], input="\n".join(inputs))
 
         assert "No cleanup found matching 'test'" in result.output
@@ -69,62 +91,116 @@ class TestCLI:
         assert "Successfully cleaned" in result.output
 
     def test_clean_single_match(self):
-        mock_cleanup = MagicMock(spec=CleanupSchema)
-        mock_cleanup.id = 1
-        mock_cleanup.name = "test"
-        mock_cleanup.regular_expression = "test.*"
-        self.mocks["get_cleanup_by_name"].return_value = [mock_cleanup]
+        cleanup = CleanupSchema(id=1, name="test", regular_expression="test.*")
+        self.mocks["get_cleanup_by_name"].return_value = [cleanup]
+        self.mock_engine.clean_many.side_effect = None
+        self.mock_engine.clean_many.return_value = {
+            "containers": CleanupResult("containers", removed=[MagicMock()], reclaimed=2048),
+            "volumes": CleanupResult("volumes", removed=[MagicMock()], sized=False),
+            "images": CleanupResult("images"),
+        }
 
-        # Simulate finding one container
-        self.mock_subprocess.run.side_effect = [
-            subprocess.CompletedProcess([], 0, stdout="container1", stderr=""),
-            subprocess.CompletedProcess([], 0),
-            subprocess.CompletedProcess([], 0),
-        ]
+        result = self.runner.invoke(cli, ["clean", "test", "--force", "--jobs", "4"])
 
-        result = self.runner.invoke(cli, ["clean", "test", "--force"])
-
-        assert mock_cleanup.regular_expression in result.output
-        # Verify commands were run: docker ps, docker stop, docker rm
-        assert self.mock_subprocess.run.call_count == 3
-        # Check that the commands were called with expected arguments
-        calls = [
-            call(
-                ["docker", "ps", "--format", "{{.ID}}", "--filter", "name=test.*"],
-                capture_output=True,
-                text=True,
-                check=True,
-            ),
-            call(["docker", "stop", "container1"], capture_output=True, text=True, check=True),
-            call(["docker", "rm", "container1"], capture_output=True, text=True, check=True),
-        ]
-        self.mock_subprocess.run.assert_has_calls(calls)
+        self.mock_client.assert_called_once_with(
+            self.mock_settings.docker_host, timeout=self.mock_settings.default_timeout
+        )
+        self.mock_engine.clean_many.assert_called_once_with(
+            [cleanup], ["containers", "volumes", "images"], jobs=4, batch_size=100
+        )
+        assert "Successfully cleaned containers (1 removed, 2.0kB reclaimed)" in result.output
+        assert "Successfully cleaned volumes (1 removed, space reclaimed unknown)" in result.output
 
     def test_clean_multiple_matches(self):
-        mock_cleanups = [
-            MagicMock(spec=CleanupSchema, id=1, name="test", regular_expression="test1.*"),
-            MagicMock(spec=CleanupSchema, id=2, name="test", regular_expression="test2.*"),
-        ]
-        self.mocks["get_cleanup_by_name"].return_value = mock_cleanups
-
-        # Simulate successful docker commands after selection
-        self.mock_subprocess.run.side_effect = [
-            subprocess.CompletedProcess([], 0, stdout="container1", stderr=""),
-            subprocess.CompletedProcess([], 0),
-            subprocess.CompletedProcess([], 0),
+        cleanups = [
+            CleanupSchema(id=1, name="test", regular_expression="test1.*"),
+            CleanupSchema(id=2, name="test", regular_expression="test2.*"),
         ]
+        self.mocks["get_cleanup_by_name"].return_value = cleanups
 
-        # Simulate user selecting ID 2
-        inputs = ["2"]
+        # Simulate user selecting ID 2 and accepting every resource type
+        inputs = ["2", "y", "y", "y"]
         result = self.runner.invoke(cli, ["clean", "test"], input="\n".join(inputs))
 
         assert "Multiple cleanups found" in result.output
         self.mocks["get_cleanup_by_name"].assert_called_once_with("test")
         assert "test1.*" in result.output
-        assert "test2.*" in result.output
-        assert "Cleaning using pattern 'test2.*'" in result.output
-        # Verify docker commands were called
-        assert self.mock_subprocess.run.call_count == 3
+        assert "Clean containers using pattern 'test2.*'" in result.output
+        self.mock_engine.clean_many.assert_called_once_with(
+            [cleanups[1]], ["containers", "volumes", "images"], jobs=8, batch_size=100
+        )
+
+    def test_clean_requires_names_or_all(self):
+        result = self.runner.invoke(cli, ["clean"])
+        assert result.exit_code == 2
+        assert "Provide one or more cleanup names, or --all" in result.output
+
+        result = self.runner.invoke(cli, ["clean", "test", "--all"])
+        assert result.exit_code == 2
+
+    def test_clean_several_names(self):
+        cleanups = [
+            CleanupSchema(id=1, name="api", regular_expression="api_.*"),
+            CleanupSchema(id=2, name="worker", regular_expression="worker_.*"),
+        ]
+        self.mocks["get_cleanups_by_names"].return_value = cleanups
+
+        result = self.runner.invoke(cli, ["clean", "api", "worker", "--force"])
+
+        self.mocks["get_cleanups_by_names"].assert_called_once_with(["api", "worker"])
+        self.mocks["get_cleanup_by_name"].assert_not_called()
+        self.mock_engine.clean_many.assert_called_once_with(
+            cleanups, ["containers", "volumes", "images"], jobs=8, batch_size=100
+        )
+        assert "Successfully cleaned images" in result.output
+
+    def test_clean_several_names_missing(self):
+        self.mocks["get_cleanups_by_names"].return_value = [CleanupSchema(id=1, name="api", regular_expression="api")]
+
+        result = self.runner.invoke(cli, ["clean", "api", "nope", "--force"])
+
+        assert "No cleanup named: nope" in result.output
+        self.mock_engine.clean_many.assert_not_called()
+
+    def test_clean_all(self):
+        cleanups = [CleanupSchema(id=1, name="api", regular_expression="api_.*")] * 2
+
+        self.mocks["list_cleanups"].return_value = cleanups
+
+        result = self.runner.invoke(cli, ["clean", "--all"], input="y\nn\ny\n")
+
+        assert "Clean containers matching 2 cleanups (api, api)?" in result.output
+        self.mock_engine.clean_many.assert_called_once_with(cleanups, ["containers", "images"], jobs=8, batch_size=100)
+
+    @pytest.mark.parametrize(
+        ("options", "cached"), [([], True), (["--no-cache"], False), (["--cache-ttl", "0"], False)]
+    )
+    def test_clean_inventory_cache(self, tmp_path, options, cached):
+        self.mock_settings.inventory_cache_ttl = 300
+        self.mock_settings.inventory_cache_dir = tmp_path
+        self.mock_client.return_value.__enter__.return_value.base_url = "unix:///var/run/docker.sock"
+        self.mocks["get_cleanup_by_name"].return_value = [CleanupSchema(id=1, name="api", regular_expression="api")]
+
+        with patch("docker_tools_plus.cache.CachedInventoryProvider") as provider:
+            result = self.runner.invoke(cli, ["clean", "api", "--force", *options])
+
+        assert result.exit_code == 0
+        assert provider.called == cached
+        if cached:
+            (client, path), kwargs = provider.call_args
+            assert path.parent == tmp_path
+            assert kwargs["cache_ttl"] == 300
+            provider.return_value.save.assert_called_once_with()
+
+    @pytest.mark.parametrize(("options", "rate_limit"), [([], 20.0), (["--rate-limit", "5"], 5.0)])
+    def test_clean_rate_limit(self, options, rate_limit):
+        self.mock_settings.removal_rate_limit = 20.0
+        self.mocks["get_cleanup_by_name"].return_value = [CleanupSchema(id=1, name="api", regular_expression="api")]
+
+        result = self.runner.invoke(cli, ["clean", "api", "--force", *options])
+
+        assert result.exit_code == 0
+        assert engine.CleanupEngine.call_args.kwargs["rate_limit"] == rate_limit
 
     def test_list_cleanups(self):
         mock_cleanups = [
@@ -138,6 +214,132 @@ class TestCLI:
         assert "1: test1 - test1.*" in result.output
         assert "2: test2 - test2.*" in result.output
 
+    def test_list_search(self):
+        self.mocks["search_cleanups"].return_value = [CleanupSchema(id=3, name="api-staging", regular_expression="api")]
+
+        result = self.runner.invoke(cli, ["list", "--search", "api"])
+
+        self.mocks["search_cleanups"].assert_called_once_with("api")
+        self.mocks["list_cleanups"].assert_not_called()
+        assert "3: api-staging - api" in result.output
+
+    def test_list_shows_filters(self):
+        self.mocks["list_cleanups"].return_value = [
+            CleanupSchema(id=1, name="ci", labels=["ci=true", "!keep"], until="24h"),
+            CleanupSchema(id=2, name="api", regular_expression="api_.*", labels=["team"]),
+        ]
+
+        result = self.runner.invoke(cli, ["list"])
+
+        assert "1: ci - * [label ci=true, label !keep, until 24h]" in result.output
+        assert "2: api - api_.* [label team]" in result.output
+
+    def test_create_with_filters(self):
+        self.mocks["create_cleanup"].return_value = CleanupSchema(id=4, name="ci", labels=["ci"], until="2h")
+
+        result = self.runner.invoke(cli, ["create", "ci", "--label", "ci", "--until", "2h"])
+
+        self.mocks["create_cleanup"].assert_called_once_with("ci", "", ["ci"], "2h", None, None, [])
+        assert "Created cleanup 4: ci - * [label ci, until 2h]" in result.output
+
+    def test_create_with_size_and_keep_latest(self):
+        self.mocks["create_cleanup"].return_value = CleanupSchema(
+            id=5, name="builds", regular_expression="build", min_size=500_000_000, keep_latest=3
+        )
+
+        result = self.runner.invoke(
+            cli, ["create", "builds", "build", "--older-than", "24h", "--min-size", "500MB", "--keep-latest", "3"]
+        )
+
+        self.mocks["create_cleanup"].assert_called_once_with("builds", "build", [], "24h", 500_000_000, 3, [])
+        assert "build [min size 500.0MB, keep latest 3]" in result.output
+
+    def test_create_with_fields(self):
+        self.mocks["create_cleanup"].return_value = CleanupSchema(
+            id=6, name="old-tags", regular_expression="^v0", match_fields=["tag", "name"]
+        )
+
+        result = self.runner.invoke(cli, ["create", "old-tags", "^v0", "--field", "tag", "--field", "name"])
+
+        self.mocks["create_cleanup"].assert_called_once_with("old-tags", "^v0", [], None, None, None, ["tag", "name"])
+        assert "Created cleanup 6: old-tags - ^v0 in tag, name" in result.output
+
+    def test_create_invalid(self):
+        self.mocks["create_cleanup"].side_effect = InvalidCleanupError("Invalid duration '7d'.")
+
+        result = self.runner.invoke(cli, ["create", "ci", "--until", "7d"])
+
+        assert "Error: Invalid duration '7d'." in result.output
+
+    def test_list_ndjson(self):
+        self.mocks["list_cleanups"].return_value = [
+            CleanupSchema(id=1, name="api: v1 - old", regular_expression="api_.*"),
+            CleanupSchema(id=2, name="ci", labels=["ci"], until="24h"),
+        ]
+        result = self.runner.invoke(cli, ["--output", "ndjson", "list"])
+
+        records = [json.loads(line) for line in result.output.splitlines()]
+        assert [(r["event"], r["id"], r["name"]) for r in records] == [
+            ("cleanup", 1, "api: v1 - old"),
+            ("cleanup", 2, "ci"),
+        ]
+        assert records[1]["labels"] == ["ci"]
+        assert records[1]["until"] == "24h"
+
+    def test_list_json(self):
+        self.mocks["list_cleanups"].return_value = []
+        result = self.runner.invoke(cli, ["--output", "json", "list"])
+        assert json.loads(result.output) == []
+
+    def test_import(self, tmp_path):
+        definitions = tmp_path / "teams.toml"
+        definitions.write_text(
+            '[[cleanups]]\nname = "api"\nregular_expression = "api_.*"\n\n[[cleanups]]\nname = "ci"\nlabels = ["ci"]\n'
+        )
+        self.mocks["import_cleanups"].return_value = ImportSummary(created=1, updated=1)
+
+        result = self.runner.invoke(cli, ["import", str(definitions)])
+
+        cleanups, unchanged = self.mocks["import_cleanups"].call_args.args
+        assert [c.name for c in cleanups] == ["api", "ci"]
+        assert unchanged == 0
+        assert "Imported 2 cleanup(s): 1 created, 1 updated, 0 skipped" in result.output
+
+    def test_import_invalid_imports_nothing(self, tmp_path):
+        definitions = tmp_path / "teams.csv"
+        definitions.write_text("name,regular_expression\napi,api_[\n")
+
+        result = self.runner.invoke(cli, ["import", str(definitions)])
+
+        assert "Error: 1 invalid cleanup definition(s), nothing imported" in result.output
+        assert "#1 api: Invalid regular expression" in result.output
+        self.mocks["import_cleanups"].assert_not_called()
+
+    def test_import_stdin_needs_format(self):
+        result = self.runner.invoke(
+            cli, ["import", "-", "--format", "json"], input='[{"name": "web", "regular_expression": "web"}]'
+        )
+        assert self.mocks["import_cleanups"].call_args.args[0][0].name == "web"
+        result = self.runner.invoke(cli, ["import", "-"], input="[]")
+        assert "use --format toml, json or csv" in result.output
+
+    def test_export(self, tmp_path):
+        self.mocks["list_cleanups"].return_value = [
+            CleanupSchema(id=1, name="api", regular_expression="api_.*"),
+            CleanupSchema(id=2, name="ci", labels=["ci", "team=a"], until="24h"),
+        ]
+        result = self.runner.invoke(cli, ["export", "--format", "json"])
+        assert json.loads(result.output) == {
+            "cleanups": [
+                {"name": "api", "regular_expression": "api_.*"},
+                {"name": "ci", "labels": ["ci", "team=a"], "until": "24h"},
+            ]
+        }
+
+        result = self.runner.invoke(cli, ["export", str(tmp_path / "teams.csv")])
+        assert "Exported 2 cleanup(s)" in result.output
+        assert (tmp_path / "teams.csv").read_text().splitlines()[2] == "ci,,ci;team=a,24h,,,"
+
     def test_list_no_cleanups(self):
         self.mocks["list_cleanups"].return_value = []
         result = self.runner.invoke(cli, ["list"])
@@ -175,13 +377,391 @@ class TestCLI:
         assert "Error: DB error" in result.output
 
     def test_clean_execution_error(self):
-        mock_cleanup = MagicMock(spec=CleanupSchema, regular_expression="test.*")
-        self.mocks["get_cleanup_by_name"].return_value = [mock_cleanup]
-        # Simulate error on first docker command
-        self.mock_subprocess.run.side_effect = subprocess.CalledProcessError(1, "cmd")
+        cleanup = CleanupSchema(id=1, name="test", regular_expression="test.*")
+        self.mocks["get_cleanup_by_name"].return_value = [cleanup]
+        # Simulate an error listing containers only
+        self.mock_engine.clean_many.side_effect = None
+        self.mock_engine.clean_many.return_value = {
+            "containers": CleanupResult("containers", error=DockerCommandError("boom")),
+            "volumes": CleanupResult("volumes"),
+            "images": CleanupResult("images"),
+        }
 
         result = self.runner.invoke(cli, ["clean", "test", "--force"])
 
-        assert "Failed to clean" in result.output
+        assert "Failed to clean containers" in result.output
+        assert "Successfully cleaned volumes" in result.output
         # We should have one error log for the failed command
         assert self.mock_logger.error.call_count == 1
+
+    def test_clean_reports_resource_failures(self):
+        cleanup = CleanupSchema(id=1, name="test", regular_expression="test.*")
+        self.mocks["get_cleanup_by_name"].return_value = [cleanup]
+        failed = Resource(kind="containers", id="c1", names=("test_web",))
+        self.mock_engine.clean_many.side_effect = None
+        self.mock_engine.clean_many.return_value = {
+            "containers": CleanupResult(
+                "containers", removed=[MagicMock()], failures=[(failed, DockerCommandError("in use"))]
+            ),
+        }
+
+        result = self.runner.invoke(cli, ["clean", "test", "--force"])
+
+        assert "Cleaned containers with errors (1 removed, 1 failed)" in result.output
+        assert "1 resource(s) could not be removed" in result.output
+        assert "containers test_web: in use" in result.output
+
+    def test_clean_ndjson_streams_removals(self):
+        self.mocks["get_cleanups_by_names"].return_value = [CleanupSchema(id=1, name="test", regular_expression="test")]
+        removed = Resource(kind="containers", id="c1", names=("test_web",), size=10)
+        failed = Resource(kind="containers", id="c2", names=("test_db",))
+
+        def clean_many(cleanups, resource_types, jobs, batch_size):
+            on_removal = engine_class.call_args.kwargs["on_removal"]
+            on_removal(removed, None)
+            on_removal(failed, DockerCommandError("in use"))
+            return {
+                "containers": CleanupResult(
+                    "containers", removed=[removed], failures=[(failed, DockerCommandError("in use"))], matched=2
+                )
+            }
+
+        with patch("docker_tools_plus.engine.CleanupEngine") as engine_class:
+            engine_class.return_value.clean_many.side_effect = clean_many
+            result = self.runner.invoke(cli, ["--output", "ndjson", "clean", "test", "--force"])
+
+        records = [json.loads(line) for line in result.output.splitlines()]
+        assert [r["event"] for r in records] == ["removed", "failed", "result"]
+        assert records[0] == {
+            "event": "removed",
+            "host": "unix:///var/run/docker.sock",
+            "resource_type": "containers",
+            "id": "c1",
+            "name": "test_web",
+            "size": 10,
+        }
+        assert records[1]["error"] == "in use"
+        assert (records[2]["matched"], records[2]["removed"], records[2]["failed"]) == (2, 1, 1)
+        self.mocks["get_cleanup_by_name"].assert_not_called()
+
+    def test_clean_json_reports_missing_cleanup(self):
+        self.mocks["get_cleanups_by_names"].return_value = []
+        result = self.runner.invoke(cli, ["--output", "json", "clean", "nope", "--force"])
+        assert json.loads(result.output) == [{"event": "error", "message": "No cleanup named: nope"}]
+
+    def test_delete_json(self):
+        self.mocks["get_cleanups_by_names"].return_value = [CleanupSchema(id=3, name="test", regular_expression="test")]
+        result = self.runner.invoke(cli, ["--output", "json", "delete", "test"], input="y\n")
+
+        self.mocks["delete_cleanup"].assert_called_once_with(3)
+        assert json.loads(result.stdout) == [{"event": "deleted", "id": 3, "name": "test"}]
+        assert "Delete cleanup 'test' (ID: 3)?" in result.stderr
+
+    def _plan(self, cleanup):
+        matches = {
+            "containers": [Resource(kind="containers", id="c1" * 10, names=("test_web",), size=2048)],
+            "volumes": [],
+            "images": [Resource(kind="images", id="sha256:abcdef1234567890", names=("test:latest",), size=10**9)],
+        }
+        return CleanupPlan.build([cleanup], matches, docker_host="unix:///test.sock")
+
+    def test_clean_free_at_least(self):
+        cleanup = CleanupSchema(id=1, name="test", regular_expression="test.*")
+        self.mocks["get_cleanup_by_name"].return_value = [cleanup]
+        self.mock_engine.plan.return_value = self._plan(cleanup)
+        self.mock_engine.execute.return_value = {
+            "images": CleanupResult("images", removed=[MagicMock()], reclaimed=10**9)
+        }
+
+        result = self.runner.invoke(cli, ["clean", "test", "--free-at-least", "2GB", "--force"])
+
+        assert self.mock_engine.plan.call_args.kwargs["free_at_least"] == 2 * 10**9
+        assert "The matches only add up to 1.0GB of 2.0GB" in result.output
+        assert "Freed 1.0GB of 2.0GB" in result.output
+        self.mock_engine.clean_many.assert_not_called()
+
+    def test_clean_free_at_least_invalid(self):
+        result = self.runner.invoke(cli, ["clean", "test", "--free-at-least", "lots"])
+        assert result.exit_code == 2
+        assert "Invalid size 'lots'" in result.output
+
+    def test_clean_dry_run_table(self):
+        cleanup = CleanupSchema(id=1, name="test", regular_expression="test.*")
+        self.mocks["get_cleanup_by_name"].return_value = [cleanup]
+        self.mock_engine.plan.return_value = self._plan(cleanup)
+
+        result = self.runner.invoke(cli, ["clean", "test", "--dry-run"])
+
+        assert result.exit_code == 0
+        assert "test_web" in result.output
+        assert "abcdef123456" in result.output
+        assert "2 resource(s), 1.0GB reclaimable" in result.output
+        self.mock_engine.clean_many.assert_not_called()
+
+    def test_clean_dry_run_json_saves_plan(self, tmp_path):
+        cleanup = CleanupSchema(id=1, name="test", regular_expression="test.*")
+        self.mocks["get_cleanup_by_name"].return_value = [cleanup]
+        self.mock_engine.plan.return_value = self._plan(cleanup)
+        plan_file = tmp_path / "plan.json"
+
+        result = self.runner.invoke(
+            cli, ["clean", "test", "--dry-run", "--format", "json", "--plan-file", str(plan_file)]
+        )
+
+        assert result.exit_code == 0
+        assert json.loads(result.stdout)["resources"][0]["name"] == "test_web"
+        assert CleanupPlan.load(plan_file) == self.mock_engine.plan.return_value
+
+    def test_clean_dry_run_does_not_create_cleanup(self):
+        self.mocks["get_cleanup_by_name"].return_value = []
+
+        result = self.runner.invoke(cli, ["clean", "test", "--dry-run"])
+
+        assert "No cleanup found matching 'test'" in result.output
+        self.mocks["create_cleanup"].assert_not_called()
+        self.mock_engine.plan.assert_not_called()
+
+    @pytest.fixture
+    def inventory(self):
+        snapshot = Inventory(
+            [
+                Resource("containers", "c1", ("api_1",), size=1_000_000),
+                Resource("containers", "c2", ("api_2",)),
+                Resource("containers", "c3", ("worker_1",)),
+                Resource("volumes", "v1", ("cache",)),
+            ]
+        )
+        with patch("docker_tools_plus.inventory.InventoryProvider") as provider:
+            provider.return_value.get.return_value = snapshot
+            yield provider
+
+    def test_test_pattern(self, inventory):
+        result = self.runner.invoke(cli, ["test-pattern", "api_[0-9]+", "--field", "name", "--samples", "1"])
+
+        assert result.exit_code == 0
+        assert "Pattern api_[0-9]+ in name on unix:///var/run/docker.sock" in result.output
+        assert "containers: 2 of 3 selected (1.0MB), e.g. api_1, ..." in result.output
+        assert "volumes: 0 of 1 selected" in result.output
+        assert "Warning" not in result.output
+        inventory.return_value.save.assert_called_once_with()
+        self.mocks["create_cleanup"].assert_not_called()
+
+    def test_test_pattern_warnings(self, inventory):
+        result = self.runner.invoke(cli, ["test-pattern", "(_?[a-z]+)+"])
+
+        assert "Warning: The pattern has nested quantifiers" in result.output
+        assert "Warning: The cleanup selects 4 of the 4 resources" in result.output
+
+    def test_test_pattern_invalid(self, inventory):
+        result = self.runner.invoke(cli, ["test-pattern", "api_("])
+
+        assert "Error:" in result.output
+        inventory.assert_not_called()
+
+    def test_test_pattern_records(self, inventory):
+        result = self.runner.invoke(cli, ["--output", "ndjson", "test-pattern", "worker"])
+
+        record = json.loads(result.stdout)
+        assert record["event"] == "explain"
+        assert record["types"]["containers"] == {"total": 3, "matched": 1, "size": 0, "samples": ["worker_1"]}
+
+    def test_clean_explain(self, inventory):
+        self.mocks["get_cleanup_by_name"].return_value = [
+            CleanupSchema(id=1, name="api", regular_expression="api", labels=["!keep"])
+        ]
+
+        result = self.runner.invoke(cli, ["clean", "api", "--explain"])
+
+        assert result.exit_code == 0
+        assert "api: api [label !keep]" in result.output
+        assert "containers: 2 of 3 selected" in result.output
+        self.mock_engine.clean_many.assert_not_called()
+
+    def test_clean_explain_does_not_create_cleanup(self, inventory):
+        self.mocks["get_cleanup_by_name"].return_value = []
+
+        result = self.runner.invoke(cli, ["clean", "test", "--explain"])
+
+        assert "No cleanup found matching 'test'" in result.output
+        self.mocks["create_cleanup"].assert_not_called()
+        inventory.assert_not_called()
+
+    def test_clean_plan_file(self, tmp_path):
+        self.mock_settings.docker_host = "unix:///test.sock"
+        plan = self._plan(CleanupSchema(id=1, name="test", regular_expression="test.*"))
+        plan_file = tmp_path / "plan.json"
+        plan.save(plan_file)
+        self.mock_engine.execute.return_value = {"containers": CleanupResult("containers", removed=[MagicMock()])}
+
+        result = self.runner.invoke(cli, ["clean", "--plan-file", str(plan_file)], input="y\n")
+
+        assert "Remove 2 resource(s) (1.0GB)" in result.output
+        assert "Successfully cleaned containers (1 removed, 0B reclaimed)" in result.output
+        assert self.mock_engine.execute.call_args.args[0] == plan
+        self.mocks["get_cleanup_by_name"].assert_not_called()
+
+    def test_clean_plan_file_other_host(self, tmp_path):
+        self.mock_settings.docker_host = "unix:///other.sock"
+        plan_file = tmp_path / "plan.json"
+        self._plan(CleanupSchema(id=1, name="test", regular_expression="test.*")).save(plan_file)
+
+        result = self.runner.invoke(cli, ["clean", "--plan-file", str(plan_file), "--force"])
+
+        assert "The plan was made for unix:///test.sock" in result.output
+        self.mock_engine.execute.assert_not_called()
+
+    def test_clean_plan_file_with_names(self, tmp_path):
+        result = self.runner.invoke(cli, ["clean", "test", "--plan-file", str(tmp_path / "plan.json")])
+        assert result.exit_code == 2
+        assert "do not combine it with cleanup names" in result.output
+
+    def test_clean_several_hosts(self):
+        cleanup = CleanupSchema(id=1, name="test", regular_expression="test.*")
+        self.mocks["get_cleanup_by_name"].return_value = [cleanup]
+        failed = Resource(kind="containers", id="c9", names=("test_db",))
+        outcomes = [
+            HostResult("unix:///a.sock", {"containers": CleanupResult("containers", removed=[MagicMock()] * 2)}),
+            HostResult(
+                "tcp://b:2375",
+                {"containers": CleanupResult("containers", failures=[(failed, DockerCommandError("in use"))])},
+            ),
+            HostResult("tcp://c:2375", error=DockerCommandError("Cannot reach Docker daemon at tcp://c:2375")),
+        ]
+        with patch("docker_tools_plus.fleet.run_fleet", return_value=outcomes) as run_fleet:
+            hosts = ["--host", "unix:///a.sock", "--host", "tcp://b:2375", "--host", "tcp://c"]
+            result = self.runner.invoke(cli, ["clean", "test", "--force", *hosts])
+
+        assert run_fleet.call_args.args[0] == ["unix:///a.sock", "tcp://b:2375", "tcp://c"]
+        assert run_fleet.call_args.kwargs["timeout"] == self.mock_settings.default_timeout
+        assert "Cleaned 3 host(s): 1 succeeded, 2 failed" in result.output
+        assert "unix:///a.sock: 2 removed, 0 failed" in result.output
+        assert "containers test_db: in use" in result.output
+        assert "tcp://c:2375: Error: Cannot reach Docker daemon" in result.output
+        self.mock_engine.clean_many.assert_not_called()
+
+    def test_clean_hosts_from_settings(self):
+        self.mock_settings.hosts = ["unix:///a.sock", "unix:///b.sock"]
+        self.mocks["get_cleanup_by_name"].return_value = [CleanupSchema(id=1, name="test", regular_expression="test")]
+        with patch("docker_tools_plus.fleet.run_fleet", return_value=[]) as run_fleet:
+            self.runner.invoke(cli, ["clean", "test", "--force"])
+        assert run_fleet.call_args.args[0] == ["unix:///a.sock", "unix:///b.sock"]
+
+    def test_clean_records_runs(self):
+        cleanup = CleanupSchema(id=3, name="test", regular_expression="test.*")
+        self.mocks["get_cleanup_by_name"].return_value = [cleanup]
+        self.mock_engine.clean_many.side_effect = None
+        self.mock_engine.clean_many.return_value = {
+            "containers": CleanupResult(
+                "containers", removed=[MagicMock()], matched=2, started_at=100.0, finished_at=101.5, reclaimed=10
+            ),
+            "volumes": CleanupResult("volumes", error=DockerCommandError("boom")),
+        }
+
+        self.runner.invoke(cli, ["clean", "test", "--force"])
+
+        (records,) = self.mocks["record_runs"].call_args.args
+        assert len(records) == 1
+        record = records[0]
+        assert (record.cleanup_id, record.cleanup_name, record.resource_type) == (3, "test", "containers")
+        assert (record.matched, record.deleted, record.reclaimed, record.duration) == (2, 1, 10, 1.5)
+
+    def test_clean_recording_failure_does_not_fail_run(self):
+        self.mocks["get_cleanup_by_name"].return_value = [CleanupSchema(id=1, name="test", regular_expression="test")]
+        self.mocks["record_runs"].side_effect = DatabaseError("database is locked")
+
+        result = self.runner.invoke(cli, ["clean", "test", "--force"])
+
+        assert "Successfully cleaned containers" in result.output
+        self.mock_logger.warning.assert_called_once()
+
+    def test_stats(self):
+        def run(run_id, name, started, duration, deleted):
+            return RunRecord(
+                run_id=run_id,
+                cleanup_name=name,
+                resource_type="containers",
+                started_at=started,
+                finished_at=started + duration,
+                deleted=deleted,
+                duration=duration,
+            )
+
+        self.mocks["list_runs"].return_value = [
+            run("a", "cheap", 1000, 1.0, 1),
+            run("b", "costly", 1100, 30.0, 5),
+            run("c", "costly", 1200, 50.0, 7),
+        ]
+
+        result = self.runner.invoke(cli, ["stats", "--days", "7", "--top", "1"])
+
+        assert result.exit_code == 0
+        since = self.mocks["list_runs"].call_args.kwargs["since"]
+        assert since == pytest.approx(datetime.datetime.now().timestamp() - 7 * 86400, abs=60)
+        assert "costly" in result.output
+        assert "cheap" not in result.output
+        assert "3 run(s), 13 removed" in result.output
+
+    def test_stats_without_runs(self):
+        self.mocks["list_runs"].return_value = []
+        result = self.runner.invoke(cli, ["stats", "--cleanup", "test"])
+        assert "No runs recorded in the last 30 day(s)" in result.output
+        assert self.mocks["list_runs"].call_args.kwargs["cleanup_name"] == "test"
+
+    def test_schedule(self, tmp_path):
+        self.mock_settings.control_socket = tmp_path / "control.sock"
+        self.mocks["get_cleanups_by_names"].return_value = [CleanupSchema(id=1, name="test", regular_expression="test")]
+        with patch("docker_tools_plus.database.set_schedule") as set_schedule:
+            set_schedule.return_value = ScheduleSchema(cleanup_id=1, expression="@daily", jitter=300)
+            result = self.runner.invoke(cli, ["schedule", "test", "@daily", "--jitter", "5m"])
+
+        assert result.exit_code == 0
+        set_schedule.assert_called_once_with(1, "@daily", 300.0)
+        assert "Scheduled test: @daily" in result.output
+
+    def test_schedule_list_and_remove(self, tmp_path):
+        self.mock_settings.control_socket = tmp_path / "control.sock"
+        with patch("docker_tools_plus.database.list_schedules") as list_schedules:
+            list_schedules.return_value = [ScheduleSchema(cleanup_id=1, cleanup_name="test", expression="@hourly")]
+            result = self.runner.invoke(cli, ["schedule"])
+        assert "@hourly" in result.output
+
+        self.mocks["get_cleanups_by_names"].return_value = []
+        result = self.runner.invoke(cli, ["schedule", "missing", "--remove"])
+        assert "No cleanup named: missing" in result.output
+        result = self.runner.invoke(cli, ["schedule", "test"])
+        assert result.exit_code == 2
+
+    def test_trigger(self, tmp_path):
+        self.mock_settings.control_socket = tmp_path / "control.sock"
+        answer = {
+            "ok": True,
+            "results": {
+                "containers": {"removed": 2, "failed": 0, "reclaimed": 0, "error": None, "failures": []},
+                "images": {"removed": 0, "failed": 1, "reclaimed": 0, "error": None, "failures": ["image a: busy"]},
+            },
+        }
+        with patch("docker_tools_plus.server.send_request", return_value=answer) as send_request:
+            result = self.runner.invoke(cli, ["trigger", "test", "other"])
+
+        send_request.assert_called_once_with(
+            tmp_path / "control.sock", {"command": "run", "names": ["test", "other"], "wait": True}
+        )
+        assert "Successfully cleaned containers (2 removed" in result.output
+        assert "image a: busy" in result.output
+
+    def test_trigger_without_server(self, tmp_path):
+        self.mock_settings.control_socket = tmp_path / "control.sock"
+        result = self.runner.invoke(cli, ["trigger", "test"])
+        assert "Error: Cannot reach the server" in result.output
+
+    def test_status_json_reports_missing_server(self, tmp_path):
+        self.mock_settings.control_socket = tmp_path / "control.sock"
+        result = self.runner.invoke(cli, ["--output", "json", "status"])
+        [record] = json.loads(result.output)
+        assert record["event"] == "error"
+        assert record["message"].startswith("Cannot reach the server")
+
+    def test_clean_dry_run_needs_one_host(self):
+        result = self.runner.invoke(cli, ["clean", "test", "--dry-run", "--host", "unix:///a", "--host", "unix:///b"])
+        assert result.exit_code == 2
+        assert "one Docker host at a time" in result.output
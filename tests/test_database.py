@@ -1,9 +1,18 @@
 import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
 
-from docker_tools_plus.database import CleanupSchema, DatabaseManager
-from docker_tools_plus.exceptions import DatabaseError
+from docker_tools_plus.database import MIGRATIONS, CleanupSchema, DatabaseManager, RunRecord
+from docker_tools_plus.exceptions import (
+    DatabaseError,
+    InvalidCleanupError,
+    InvalidRegularExpressionError,
+    InvalidScheduleError,
+)
+from docker_tools_plus.inventory import Resource
+from docker_tools_plus.patterns import PatternCache
 
 
 class TestDatabaseManager:
@@ -20,6 +29,14 @@ class TestDatabaseManager:
         assert cleanup.name == "test"
         assert cleanup.regular_expression == "pattern"
 
+    def test_create_cleanup_with_selection(self, manager):
+        manager.create_cleanup("builds", "build", until="24h", min_size=1000, keep_latest=3)
+        (cleanup,) = manager.get_cleanup_by_name("builds")
+        assert (cleanup.until, cleanup.min_size, cleanup.keep_latest) == ("24h", 1000, 3)
+        assert not cleanup.prunable
+        with pytest.raises(ValueError, match="greater than or equal to 1"):
+            manager.create_cleanup("none", "build", keep_latest=0)
+
     def test_get_cleanup_by_name(self, manager):
         """Test retrieving cleanups by name pattern."""
         manager.create_cleanup("test1", "pattern1")
@@ -30,6 +47,16 @@ class TestDatabaseManager:
         assert len(results) == 2
         assert {r.name for r in results} == {"test1", "test2"}
 
+    def test_get_cleanups_by_names(self, manager):
+        """Test retrieving cleanups by exact names."""
+        manager.create_cleanup("test", "pattern1")
+        manager.create_cleanup("test2", "pattern2")
+        manager.create_cleanup("other", "pattern3")
+
+        results = manager.get_cleanups_by_names(["test", "other", "missing"])
+        assert {r.name for r in results} == {"test", "other"}
+        assert manager.get_cleanups_by_names([]) == []
+
     def test_list_cleanups(self, manager):
         """Test listing all cleanups."""
         assert manager.list_cleanups() == []
@@ -73,3 +100,307 @@ class TestDatabaseManager:
 
         with pytest.raises(DatabaseError, match="Mocked database error"):
             manager.create_cleanup("test", "pattern")
+
+    def test_connection_opened_lazily_and_reused(self, manager, monkeypatch):
+        """Test that one WAL-mode connection serves every call."""
+        connects = []
+        real_connect = sqlite3.connect
+
+        def counting_connect(*args, **kwargs):
+            connects.append(args)
+            return real_connect(*args, **kwargs)
+
+        monkeypatch.setattr("sqlite3.connect", counting_connect)
+        assert manager._conn is None
+
+        manager.create_cleanup("test", "pattern")
+        manager.list_cleanups()
+        manager.get_cleanup_by_name("test")
+        assert len(connects) == 1
+
+        with manager._connection() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    def test_close_and_reopen(self, manager):
+        """Test that the connection is reopened after close."""
+        manager.create_cleanup("test", "pattern")
+        manager.close()
+        assert manager._conn is None
+        assert [c.name for c in manager.list_cleanups()] == ["test"]
+
+    def test_concurrent_access(self, manager):
+        """Test that the shared connection can be used from several threads."""
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda i: manager.create_cleanup(f"test{i}", "pattern"), range(40)))
+        assert len(manager.list_cleanups()) == 40
+
+    def test_failed_transaction_is_rolled_back(self, manager):
+        """Test that an error inside a transaction leaves no partial writes."""
+        with pytest.raises(sqlite3.IntegrityError), manager._connection() as conn:
+            conn.execute("INSERT INTO cleanups (name, regular_expression) VALUES ('x', 'pattern')")
+            conn.execute("INSERT INTO cleanups (id, name, regular_expression) VALUES (1, 'y', 'pattern')")
+        assert manager.list_cleanups() == []
+
+
+class TestNameLookup:
+    @pytest.fixture
+    def manager(self, tmp_path):
+        manager = DatabaseManager(str(tmp_path / "test.db"))
+        for name in ["api", "api-staging", "payments-api", "reconciliation_postgres", "web_100%"]:
+            manager.create_cleanup(name, "pattern")
+        return manager
+
+    def test_exact_match_wins(self, manager):
+        assert [c.name for c in manager.get_cleanup_by_name("api")] == ["api"]
+
+    def test_exact_match_uses_index(self, manager):
+        with manager._connection() as conn:
+            plan = conn.execute("EXPLAIN QUERY PLAN SELECT id FROM cleanups WHERE name = ?", ("api",)).fetchall()
+        assert "idx_cleanups_name" in plan[0][-1]
+
+    def test_partial_match_is_ranked(self, manager):
+        assert [c.name for c in manager.get_cleanup_by_name("API")] == ["api", "api-staging", "payments-api"]
+        assert [c.name for c in manager.get_cleanup_by_name("ap")] == ["api", "api-staging", "payments-api"]
+
+    def test_wildcards_are_literal(self, manager):
+        assert [c.name for c in manager.get_cleanup_by_name("0%")] == ["web_100%"]
+        assert manager.get_cleanup_by_name("b%") == []
+        assert manager.get_cleanup_by_name("0_%") == []
+
+    def test_index_follows_updates_and_deletes(self, manager):
+        (cleanup,) = manager.get_cleanup_by_name("reconciliation_postgres")
+        manager.delete_cleanup(cleanup.id)
+        assert manager.get_cleanup_by_name("concil") == []
+
+    def test_search_falls_back_to_fuzzy(self, manager):
+        assert [c.name for c in manager.search_cleanups("reconcilation")] == ["reconciliation_postgres"]
+        assert manager.search_cleanups("zzzz") == []
+
+    def test_duplicate_name_rejected(self, manager):
+        with pytest.raises(DatabaseError, match="already exists"):
+            manager.create_cleanup("api", "pattern")
+
+    def test_migrates_old_database(self, tmp_path):
+        db_path = tmp_path / "old.db"
+        with sqlite3.connect(db_path) as conn:
+            conn.execute(
+                "CREATE TABLE cleanups (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+                "regular_expression TEXT NOT NULL)"
+            )
+            conn.executemany(
+                "INSERT INTO cleanups (name, regular_expression) VALUES (?, ?)",
+                [("dup", "one"), ("dup", "two"), ("other", "three")],
+            )
+        conn.close()
+
+        manager = DatabaseManager(str(db_path))
+        assert {c.name for c in manager.list_cleanups()} == {"dup", "dup-2", "other"}
+        assert [c.regular_expression for c in manager.get_cleanup_by_name("dup")] == ["one"]
+        assert [c.name for c in manager.get_cleanup_by_name("the")] == ["other"]
+        with manager._connection() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+
+
+class TestPatternCache:
+    def test_compiles_once(self):
+        cache = PatternCache(maxsize=4)
+        first = cache.get("api_.*")
+        assert cache.get("api_.*") is first
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = PatternCache(maxsize=2)
+        cache.get("a+")
+        cache.get("b+")
+        cache.get("a+")
+        cache.get("c+")
+        assert len(cache) == 2
+        cache.get("a+")
+        assert cache.misses == 3
+        cache.get("b+")
+        assert cache.misses == 4
+
+    def test_invalid_pattern(self):
+        with pytest.raises(InvalidRegularExpressionError, match="is not valid"):
+            PatternCache().get("invalid[regex")
+
+    def test_schema_reuses_compiled_pattern(self, tmp_path):
+        manager = DatabaseManager(str(tmp_path / "test.db"))
+        manager.create_cleanup("test", "cached_pattern_[0-9]+")
+        (cleanup,) = manager.list_cleanups()
+        assert cleanup.compiled is manager.pattern_cache.get("cached_pattern_[0-9]+")
+        assert cleanup.compiled.search("cached_pattern_42")
+
+
+class TestCleanupFilters:
+    @pytest.fixture
+    def manager(self, tmp_path):
+        return DatabaseManager(str(tmp_path / "test.db"))
+
+    def test_filters_are_stored(self, manager):
+        cleanup = manager.create_cleanup("ci", "", ["ci=true", "!keep"], "24h")
+        assert cleanup.prunable
+        (stored,) = manager.get_cleanup_by_name("ci")
+        assert stored.labels == ["ci=true", "!keep"]
+        assert stored.until == "24h"
+        assert manager.create_cleanup("api", "api_.*").labels == []
+
+    def test_pattern_or_filters_required(self, manager):
+        with pytest.raises(InvalidCleanupError, match="at least 3 characters"):
+            manager.create_cleanup("empty", "")
+        with pytest.raises(InvalidCleanupError, match="Invalid duration"):
+            manager.create_cleanup("old", "", until="7d")
+        with pytest.raises(InvalidCleanupError, match="Invalid label filter"):
+            manager.create_cleanup("label", "", ["=x"])
+        assert manager.list_cleanups() == []
+
+    def test_upgrade_keeps_existing_cleanups(self, tmp_path):
+        db_path = tmp_path / "old.db"
+        with sqlite3.connect(db_path) as conn:
+            for migration in MIGRATIONS[:3]:
+                migration(conn)
+            conn.execute("PRAGMA user_version = 3")
+            conn.execute("INSERT INTO cleanups (name, regular_expression) VALUES ('api', 'api_.*')")
+        conn.close()
+
+        (cleanup,) = DatabaseManager(str(db_path)).list_cleanups()
+        assert (cleanup.regular_expression, cleanup.labels, cleanup.until) == ("api_.*", [], None)
+
+    def test_match_fields(self, manager):
+        manager.create_cleanup("old-tags", "^v0", match_fields=["tag", "tag", "name"])
+        (cleanup,) = manager.get_cleanup_by_name("old-tags")
+        assert cleanup.match_fields == ["tag", "name"]
+        assert cleanup.matches(Resource(kind="containers", id="c1", names=("web",), image="app:v0.9"))
+        assert not cleanup.matches(Resource(kind="containers", id="v0", names=("web",), image="app:v1"))
+        with pytest.raises(InvalidCleanupError, match="Invalid match field"):
+            manager.create_cleanup("bad", "web", match_fields=["status"])
+        with pytest.raises(InvalidCleanupError, match="only apply to a regular expression"):
+            manager.create_cleanup("ci", "", ["ci"], match_fields=["name"])
+
+    def test_matches(self):
+        now = time.time()
+        cleanup = CleanupSchema(name="ci", regular_expression="^ci_", labels=["ci", "!keep"], until="1h")
+        old = Resource(kind="containers", id="ci_1", labels={"ci": "1"}, created=now - 7200)
+        assert cleanup.matches(old)
+        assert not cleanup.matches(Resource(kind="containers", id="ci_2", labels={"ci": "1"}, created=now))
+        assert not cleanup.matches(Resource(kind="containers", id="ci_3", labels={"ci": "1", "keep": ""}, created=0))
+        assert not cleanup.matches(Resource(kind="containers", id="web", labels={"ci": "1"}, created=now - 7200))
+
+
+class TestRuns:
+    @pytest.fixture
+    def manager(self, tmp_path):
+        return DatabaseManager(str(tmp_path / "test.db"))
+
+    def _record(self, run_id, name, started, **kwargs):
+        return RunRecord(
+            run_id=run_id,
+            cleanup_name=name,
+            resource_type="containers",
+            started_at=started,
+            finished_at=started + 1,
+            **kwargs,
+        )
+
+    def test_record_and_list(self, manager):
+        manager.record_runs(
+            [
+                self._record("b", "api", 200.0, cleanup_id=1, deleted=3, reclaimed=4096, duration=1.0),
+                self._record("a", "web", 100.0, failed=1, error="in use"),
+            ]
+        )
+        runs = manager.list_runs()
+        assert [run.run_id for run in runs] == ["a", "b"]
+        assert runs[0].error == "in use"
+        assert (runs[1].cleanup_id, runs[1].deleted, runs[1].reclaimed) == (1, 3, 4096)
+
+    def test_list_filters(self, manager):
+        manager.record_runs([self._record("a", "api", 100.0), self._record("b", "api", 200.0)])
+        manager.record_runs([self._record("c", "web", 300.0)])
+        assert [run.run_id for run in manager.list_runs(since=150)] == ["b", "c"]
+        assert [run.run_id for run in manager.list_runs(cleanup_name="api")] == ["a", "b"]
+        manager.record_runs([])
+        assert len(manager.list_runs()) == 3
+
+
+class TestSchedules:
+    @pytest.fixture
+    def manager(self, tmp_path):
+        return DatabaseManager(str(tmp_path / "test.db"))
+
+    def test_set_and_list(self, manager):
+        web = manager.create_cleanup("web", "web")
+        api = manager.create_cleanup("api", "api")
+        manager.set_schedule(web.id, "0  3 * * *", jitter=60)
+        manager.set_schedule(api.id, "@every 1h")
+
+        schedules = manager.list_schedules()
+        assert [(s.cleanup_name, s.expression, s.jitter) for s in schedules] == [
+            ("api", "@every 1h", 0.0),
+            ("web", "0 3 * * *", 60.0),
+        ]
+
+    def test_set_replaces(self, manager):
+        cleanup = manager.create_cleanup("web", "web")
+        manager.set_schedule(cleanup.id, "@daily")
+        manager.set_schedule(cleanup.id, "@hourly", jitter=5)
+        assert [(s.expression, s.jitter) for s in manager.list_schedules()] == [("@hourly", 5.0)]
+
+    def test_invalid_schedule(self, manager):
+        cleanup = manager.create_cleanup("web", "web")
+        with pytest.raises(InvalidScheduleError):
+            manager.set_schedule(cleanup.id, "every day")
+        with pytest.raises(DatabaseError, match="No cleanup with ID 42"):
+            manager.set_schedule(42, "@daily")
+        assert manager.list_schedules() == []
+
+    def test_delete(self, manager):
+        cleanup = manager.create_cleanup("web", "web")
+        manager.set_schedule(cleanup.id, "@daily")
+        assert manager.delete_schedule(cleanup.id)
+        assert not manager.delete_schedule(cleanup.id)
+
+    def test_deleting_cleanup_removes_schedule(self, manager):
+        cleanup = manager.create_cleanup("web", "web")
+        manager.set_schedule(cleanup.id, "@daily")
+        manager.delete_cleanup(cleanup.id)
+        assert manager.list_schedules() == []
+
+
+class TestImport:
+    @pytest.fixture
+    def manager(self, tmp_path):
+        return DatabaseManager(str(tmp_path / "test.db"))
+
+    def test_upserts_by_name(self, manager):
+        web = manager.create_cleanup("web", "web")
+        manager.set_schedule(web.id, "@daily")
+        manager.create_cleanup("api", "api")
+
+        summary = manager.import_cleanups(
+            [
+                CleanupSchema(name="web", regular_expression="web_.*", labels=["ci"]),
+                CleanupSchema(name="api", regular_expression="api"),
+                CleanupSchema(name="worker", regular_expression="worker", keep_latest=2),
+            ],
+            skipped=3,
+        )
+
+        assert (summary.created, summary.updated, summary.skipped) == (1, 1, 4)
+        (updated,) = manager.get_cleanup_by_name("web")
+        assert (updated.id, updated.regular_expression, updated.labels) == (web.id, "web_.*", ["ci"])
+        assert [s.cleanup_name for s in manager.list_schedules()] == ["web"]
+        assert manager.get_cleanup_by_name("worker")[0].keep_latest == 2
+
+    def test_imported_names_are_searchable(self, manager):
+        manager.create_cleanup("payments", "payments")
+        manager.import_cleanups([CleanupSchema(name=f"team-{i}-builds", regular_expression="build") for i in range(50)])
+
+        assert [c.name for c in manager.search_cleanups("team-42")] == ["team-42-builds"]
+        manager.create_cleanup("team-99-builds", "build")
+        assert [c.name for c in manager.search_cleanups("team-99")] == ["team-99-builds"]
+
+    def test_stored_rows(self, manager):
+        manager.create_cleanup("ci", "", ["ci"], "24h", min_size=1000)
+        assert manager.stored_rows() == {"ci": ("ci", "", '["ci"]', "24h", 1000, None, "[]")}
@@ -0,0 +1,117 @@
+import threading
+
+import pytest
+
+from docker_tools_plus.docker_client import DockerClient, _iter_json_array
+from docker_tools_plus.exceptions import DockerAPIError, DockerCommandError
+from docker_tools_plus.fake_daemon import FakeDockerDaemon, container, image, volume
+
+
+class TestDockerClient:
+    @pytest.fixture
+    def daemon(self):
+        with FakeDockerDaemon(
+            containers=[container("c1", "web"), container("c2", "db")],
+            volumes=[volume("data")],
+            images=[image("sha256:i1", "app:latest")],
+        ) as daemon:
+            yield daemon
+
+    def test_list_resources(self, daemon):
+        with DockerClient(daemon.base_url) as client:
+            assert [c["Id"] for c in client.list_containers()] == ["c1", "c2"]
+            assert [v["Name"] for v in client.list_volumes()] == ["data"]
+            assert [i["Id"] for i in client.list_images()] == ["sha256:i1"]
+
+    def test_connection_is_reused(self, daemon):
+        with DockerClient(daemon.base_url) as client:
+            client.list_containers()
+            client.remove_container("c1")
+            client.remove_volume("data")
+            client.remove_image("sha256:i1")
+        assert daemon.connections == 1
+        assert daemon.containers.keys() == {"c2"}
+        assert not daemon.volumes
+        assert not daemon.images
+
+    def test_api_error(self, daemon):
+        with DockerClient(daemon.base_url) as client, pytest.raises(DockerAPIError, match="No such object") as exc:
+            client.remove_container("missing")
+        assert exc.value.status_code == 404
+
+    def test_filters_and_inspect(self, daemon):
+        with DockerClient(daemon.base_url) as client:
+            assert [c["Id"] for c in client.iter_containers({"id": ["c2"]})] == ["c2"]
+            assert [v["Name"] for v in client.iter_volumes({"name": ["dat"]})] == ["data"]
+            assert client.inspect_image("app:latest")["Id"] == "sha256:i1"
+
+    def test_events(self, daemon):
+        with DockerClient(daemon.base_url) as client, client.events({"type": ["container"]}) as events:
+            received = []
+
+            def read():
+                received.extend(events)
+
+            reader = threading.Thread(target=read)
+            reader.start()
+            client.remove_volume("data")
+            client.remove_container("c1")
+            daemon.emit("containers", "start", "c2")
+            for _ in range(500):
+                if len(received) == 2:
+                    break
+                reader.join(0.01)
+            events.close()
+            reader.join(5)
+
+        assert not reader.is_alive()
+        assert [(e["Action"], e["Actor"]["ID"]) for e in received] == [("destroy", "c1"), ("start", "c2")]
+
+    def test_unreachable_daemon(self, tmp_path):
+        client = DockerClient(f"unix://{tmp_path}/missing.sock")
+        with pytest.raises(DockerCommandError, match="Cannot reach Docker daemon"):
+            client.list_containers()
+
+    def test_tcp_host(self):
+        with FakeDockerDaemon(containers=[container("c1", "web")], tcp=True) as daemon:
+            assert daemon.base_url.startswith("tcp://")
+            with DockerClient(daemon.base_url) as client:
+                assert [c["Id"] for c in client.list_containers()] == ["c1"]
+        assert DockerClient("tcp://agent").address == ("agent", 2375)
+
+    def test_unsupported_host(self):
+        with pytest.raises(DockerCommandError, match="Unsupported Docker host"):
+            DockerClient("ssh://example")
+
+
+class TestStreamingListing:
+    def test_elements_are_yielded_as_they_arrive(self):
+        received = []
+
+        def chunks():
+            for chunk in (b'[{"Id": "c1"}, {"Id":', b' "c2"}, {"Id": "c3"}]'):
+                received.append(chunk)
+                yield chunk
+
+        elements = _iter_json_array(chunks())
+        assert next(elements) == {"Id": "c1"}
+        assert len(received) == 1
+        assert list(elements) == [{"Id": "c2"}, {"Id": "c3"}]
+
+    def test_split_values(self):
+        raw = '[1, 234, "é", {"a": [null, true]}]'.encode()
+        for size in (1, 2, 5):
+            chunks = [raw[i : i + size] for i in range(0, len(raw), size)]
+            assert list(_iter_json_array(chunks)) == [1, 234, "é", {"a": [None, True]}]
+
+    def test_array_under_key(self):
+        assert list(_iter_json_array([b'{"Volumes": [{"Name": "a"}], "Warnings": null}'], "Volumes")) == [{"Name": "a"}]
+        assert list(_iter_json_array([b'{"Volumes": null, "Warnings": null}'], "Volumes")) == []
+
+    def test_stream_over_socket(self):
+        containers = [container(f"c{i}", f"name_{i}") for i in range(3000)]
+        with FakeDockerDaemon(containers) as daemon, DockerClient(daemon.base_url) as client:
+            assert [c["Id"] for c in client.iter_containers()] == [f"c{i}" for i in range(3000)]
+            # The connection is left clean for the next request
+            assert client.list_volumes() == []
+            assert daemon.connections == 1
@@ -0,0 +1,395 @@
+import time
+
+import pytest
+
+from docker_tools_plus.database import CleanupSchema
+from docker_tools_plus.docker_client import DockerClient
+from docker_tools_plus.engine import CleanupEngine, CleanupResult, RateLimiter, batched, largest_first
+from docker_tools_plus.exceptions import DockerCommandError
+from docker_tools_plus.fake_daemon import FakeDockerDaemon, container, image, volume
+from docker_tools_plus.images import ImageGraph
+from docker_tools_plus.inventory import InventoryProvider, Resource, iter_resources
+
+
+class TestCleanupEngine:
+    @pytest.fixture
+    def daemon(self):
+        with FakeDockerDaemon(
+            containers=[
+                container("c1", "reconciliation_postgres"),
+                container("c2", "web", image="reconciliation_app:latest"),
+                container("c3", "other"),
+            ],
+            volumes=[volume("reconciliation_data"), volume("keep")],
+            images=[
+                image("sha256:i1", "reconciliation_app:latest"),
+                image("sha256:i2", "nginx:1.25"),
+                image("sha256:i3"),
+            ],
+        ) as daemon:
+            yield daemon
+
+    @pytest.fixture
+    def engine(self, daemon):
+        with DockerClient(daemon.base_url) as client:
+            yield CleanupEngine(client)
+
+    def test_find_matches(self, engine):
+        cleanup = CleanupSchema(name="rec", regular_expression="reconciliation")
+        assert [r.id for r in engine.find_matches(cleanup, "containers")] == ["c1", "c2"]
+        assert [r.id for r in engine.find_matches(cleanup, "volumes")] == ["reconciliation_data"]
+        assert [r.id for r in engine.find_matches(cleanup, "images")] == ["sha256:i1"]
+
+    def test_clean_removes_matches(self, engine, daemon):
+        cleanup = CleanupSchema(name="rec", regular_expression="reconciliation")
+        results = engine.clean(cleanup, jobs=4)
+        assert list(results) == ["containers", "volumes", "images"]
+        assert all(result.ok for result in results.values())
+        assert daemon.containers.keys() == {"c3"}
+        assert daemon.volumes.keys() == {"keep"}
+        assert daemon.images.keys() == {"sha256:i2", "sha256:i3"}
+
+    def test_clean_selected_types(self, engine, daemon):
+        cleanup = CleanupSchema(name="rec", regular_expression="reconciliation")
+        results = engine.clean(cleanup, ["volumes"])
+        assert list(results) == ["volumes"]
+        assert len(daemon.containers) == 3
+        assert daemon.volumes.keys() == {"keep"}
+
+    def test_clean_no_matches(self, engine, daemon):
+        cleanup = CleanupSchema(name="none", regular_expression="^nothing$")
+        assert engine.clean(cleanup, ["containers"])["containers"].removed == []
+        assert len(daemon.containers) == 3
+
+    def test_clean_collects_failures(self, engine, daemon):
+        daemon.fail_deletes["c1"] = 409
+        cleanup = CleanupSchema(name="rec", regular_expression="reconciliation")
+        result = engine.clean(cleanup, ["containers"], jobs=4)["containers"]
+        assert [r.id for r in result.removed] == ["c2"]
+        assert [(r.id, e.status_code) for r, e in result.failures] == [("c1", 409)]
+
+    def test_on_removal_reports_each_outcome(self, engine, daemon):
+        daemon.fail_deletes["c1"] = 409
+        outcomes = []
+        engine.on_removal = lambda resource, error: outcomes.append((resource.id, error and error.status_code))
+        engine.clean(CleanupSchema(name="rec", regular_expression="reconciliation"), jobs=4)
+        assert sorted(outcomes, key=str) == [
+            ("c1", 409),
+            ("c2", None),
+            ("reconciliation_data", None),
+            ("sha256:i1", None),
+        ]
+
+    def test_clean_many_removes_each_resource_once(self, engine, daemon):
+        cleanups = [
+            CleanupSchema(name="rec", regular_expression="reconciliation"),
+            CleanupSchema(name="pg", regular_expression="postgres"),
+            CleanupSchema(name="other", regular_expression=" other "),
+        ]
+        results = engine.clean_many(cleanups, ["containers"])
+        assert [r.id for r in results["containers"].removed] == ["c1", "c2", "c3"]
+        assert not results["containers"].failures
+        assert daemon.requests.count(("DELETE", "/containers/c1")) == 1
+
+
+class TestConcurrentRemoval:
+    def test_containers_removed_before_their_volumes_and_images(self):
+        containers = [
+            container(f"c{i}", f"job_{i}", ImageID=f"sha256:{i}", Mounts=[{"Type": "volume", "Name": f"job_{i}"}])
+            for i in range(50)
+        ]
+        volumes = [volume(f"job_{i}") for i in range(50)]
+        images = [image(f"sha256:{i}", f"job_{i}:latest") for i in range(50)]
+        with FakeDockerDaemon(containers, volumes, images) as daemon, DockerClient(daemon.base_url) as client:
+            results = CleanupEngine(client).clean(CleanupSchema(name="jobs", regular_expression="job_"), jobs=8)
+
+            assert all(result.ok for result in results.values())
+            assert not daemon.containers and not daemon.volumes and not daemon.images
+            # One connection for listing plus at most one per worker
+            assert 2 < daemon.connections <= 9
+
+
+class TestImageRemoval:
+    @pytest.fixture
+    def daemon(self):
+        # base <- build <- app:1 / app:2, and base <- other
+        with FakeDockerDaemon(
+            images=[
+                image("sha256:base", "base:1", Size=100),
+                image("sha256:build", "app:build", ParentId="sha256:base", Size=150),
+                image("sha256:a1", "app:1", "app:latest", ParentId="sha256:build", Size=160),
+                image("sha256:a2", "app:2", ParentId="sha256:build", Size=170),
+                image("sha256:other", "other:1", ParentId="sha256:base", Size=105),
+            ],
+        ) as daemon:
+            yield daemon
+
+    @pytest.fixture
+    def engine(self, daemon):
+        with DockerClient(daemon.base_url) as client:
+            yield CleanupEngine(client)
+
+    def test_waves(self):
+        images = {
+            key: Resource("images", key, parent=parent)
+            for key, parent in [("base", ""), ("build", "base"), ("a1", "build"), ("a2", "build"), ("other", "base")]
+        }
+        graph = ImageGraph(images.values())
+
+        waves, blocked = graph.waves([images[key] for key in ("base", "build", "a1", "a2")])
+
+        assert [[image.id for image in wave] for wave in waves] == [["a1", "a2"], ["build"]]
+        assert [image.id for image in blocked] == ["base"]
+        assert list(graph.ancestors("a1")) == ["build", "base"]
+
+    def test_children_are_removed_first(self, engine, daemon):
+        result = engine.clean(CleanupSchema(name="app", regular_expression="app|base"), ["images"])["images"]
+
+        assert {image.id for image in result.removed} == {"sha256:a1", "sha256:a2", "sha256:build"}
+        # The base image is kept for its other child, without asking the daemon
+        assert [(image.id, str(error)) for image, error in result.failures] == [
+            ("sha256:base", "base:1 has child images that are kept")
+        ]
+        assert ("DELETE", "/images/sha256:base") not in daemon.requests
+        assert daemon.images.keys() == {"sha256:base", "sha256:other"}
+        # What app:1, app:2 and app:build add on top of their parents; base:1 is kept
+        assert result.reclaimed == 80
+
+    def test_image_with_several_tags_is_untagged_first(self, engine, daemon):
+        engine.clean(CleanupSchema(name="app", regular_expression="app:(1|latest)"), ["images"])
+
+        assert "sha256:a1" not in daemon.images
+        assert ("DELETE", "/images/app:latest") in daemon.requests
+
+    def test_image_is_kept_for_the_tags_not_selected(self, engine, daemon):
+        result = engine.clean(CleanupSchema(name="app", regular_expression="app:latest"), ["images"])["images"]
+
+        assert daemon.images["sha256:a1"]["RepoTags"] == ["app:1"]
+        assert not result.removed
+        assert [(image.id, str(error)) for image, error in result.failures] == [
+            ("sha256:a1", "app:1 is kept for its tags not selected: app:1")
+        ]
+
+    def test_parents_of_a_failed_child_are_not_attempted(self, engine, daemon):
+        daemon.fail_deletes["sha256:a2"] = 500
+
+        result = engine.clean(CleanupSchema(name="all", regular_expression="sha256"), ["images"])["images"]
+
+        assert {image.id for image in result.removed} == {"sha256:a1", "sha256:other"}
+        failed = {image.id: str(error) for image, error in result.failures}
+        assert failed.keys() == {"sha256:a2", "sha256:build", "sha256:base"}
+        assert failed["sha256:build"] == "app:build has child images that could not be removed"
+        assert ("DELETE", "/images/sha256:build") not in daemon.requests
+
+    def test_plan_is_executed_children_first(self, engine, daemon):
+        plan = engine.plan([CleanupSchema(name="app", regular_expression="app")], ["images"])
+
+        results = engine.execute(plan, jobs=4)
+
+        assert results["images"].ok
+        assert daemon.images.keys() == {"sha256:base", "sha256:other"}
+
+    def test_rate_limit(self):
+        limiter = RateLimiter(100)
+        started = time.monotonic()
+        for _ in range(6):
+            limiter.wait()
+        assert time.monotonic() - started >= 0.05
+
+        containers = [container(f"c{i}", f"job_{i}") for i in range(5)]
+        with FakeDockerDaemon(containers) as daemon, DockerClient(daemon.base_url) as client:
+            started = time.monotonic()
+            CleanupEngine(client, rate_limit=50).clean(CleanupSchema(name="jobs", regular_expression="job_"), jobs=5)
+            assert time.monotonic() - started >= 0.08
+            assert not daemon.containers
+
+
+class TestPrune:
+    @pytest.fixture
+    def daemon(self):
+        now = time.time()
+        with FakeDockerDaemon(
+            containers=[
+                container("c1", "ci_1", Labels={"ci": "true"}, Created=now - 7200, SizeRw=100),
+                container("c2", "ci_2", Labels={"ci": "true"}, Created=now - 60, SizeRw=100),
+                container("c3", "ci_3", Labels={"ci": "true"}, Created=now - 7200, State="running"),
+                container("c4", "web", Created=now - 7200),
+            ],
+            volumes=[
+                volume("ci_cache", Labels={"ci": "true"}, CreatedAt="2020-01-01T00:00:00Z", UsageData={"Size": 50}),
+                volume("web_data", CreatedAt="2020-01-01T00:00:00Z"),
+            ],
+            images=[
+                image("sha256:i1", "ci:latest", Labels={"ci": "true"}, Created=now - 7200, Size=1000),
+                image("sha256:i2", "web:latest", Created=now - 7200, Size=1000),
+            ],
+        ) as daemon:
+            yield daemon
+
+    @pytest.fixture
+    def engine(self, daemon):
+        with DockerClient(daemon.base_url) as client:
+            yield CleanupEngine(client)
+
+    def test_filter_only_cleanup_uses_prune_endpoints(self, engine, daemon):
+        cleanup = CleanupSchema(name="ci", labels=["ci=true"])
+        results = engine.clean(cleanup)
+
+        assert daemon.containers.keys() == {"c3", "c4"}
+        assert daemon.volumes.keys() == {"web_data"}
+        assert daemon.images.keys() == {"sha256:i2"}
+        assert [r.id for r in results["images"].removed] == ["sha256:i1"]
+        assert [result.reclaimed for result in results.values()] == [200, 50, 1000]
+        assert [method for method, _ in daemon.requests] == ["POST", "POST", "POST"]
+
+    def test_until_filter(self, engine, daemon):
+        results = engine.clean(CleanupSchema(name="ci", labels=["ci"], until="1h"), ["containers", "images"])
+        assert [r.id for r in results["containers"].removed] == ["c1"]
+        assert daemon.containers.keys() == {"c2", "c3", "c4"}
+        assert daemon.images.keys() == {"sha256:i2"}
+
+    def test_volumes_fall_back_to_per_item_removal_for_until(self, engine, daemon):
+        results = engine.clean(CleanupSchema(name="ci", labels=["ci"], until="24h"), ["volumes"])
+        assert [r.id for r in results["volumes"].removed] == ["ci_cache"]
+        # Volumes are only sized for size filters, so what their removal reclaimed is unknown
+        assert (results["volumes"].reclaimed, results["volumes"].sized) == (0, False)
+        assert ("DELETE", "/volumes/ci_cache") in daemon.requests
+        assert ("POST", "/volumes/prune") not in daemon.requests
+
+    def test_rejected_prune_falls_back_to_per_item_removal(self, engine, daemon):
+        daemon.reject_prunes.add("images")
+        results = engine.clean(CleanupSchema(name="web", labels=["!ci"]), ["images"])
+        assert [r.id for r in results["images"].removed] == ["sha256:i2"]
+        assert daemon.images.keys() == {"sha256:i1"}
+
+    def test_pattern_and_prune_cleanups_together(self, engine, daemon):
+        cleanups = [CleanupSchema(name="web", regular_expression="^c4 "), CleanupSchema(name="ci", labels=["ci"])]
+        results = engine.clean_many(cleanups, ["containers"])
+        assert sorted(r.id for r in results["containers"].removed) == ["c1", "c2", "c4"]
+        assert not results["containers"].failures
+        assert daemon.containers.keys() == {"c3"}
+
+
+class TestStreaming:
+    def test_removal_starts_before_listing_finishes(self):
+        containers = [container(f"c{i}", f"job_{i}" if i % 10 == 0 else f"keep_{i}") for i in range(2000)]
+        with FakeDockerDaemon(containers) as daemon, DockerClient(daemon.base_url) as client:
+            daemon.chunk_delay = 0.002
+            results = CleanupEngine(client).clean(
+                CleanupSchema(name="jobs", regular_expression="job_"), ["containers"], jobs=4, batch_size=10
+            )
+
+            assert len(results["containers"].removed) == 200
+            assert len(daemon.containers) == 1800
+            first_delete = next(i for i, (_, method, _) in enumerate(daemon.timeline) if method == "DELETE")
+            listed = daemon.timeline.index(("end", "GET", "/containers/json"))
+            assert first_delete < listed
+
+    def test_fresh_snapshot_is_reused(self):
+        with FakeDockerDaemon([container("c1", "job_1")]) as daemon, DockerClient(daemon.base_url) as client:
+            inventory = InventoryProvider(client, ttl=60)
+            engine = CleanupEngine(client, inventory)
+            assert [r.id for r in engine.find_matches(CleanupSchema(name="j", regular_expression="job"), "containers")]
+            results = engine.clean(CleanupSchema(name="j", regular_expression="job"), ["containers"])
+
+            assert [r.id for r in results["containers"].removed] == ["c1"]
+            assert daemon.requests.count(("GET", "/containers/json")) == 1
+            assert inventory.get().of_type("containers") == []
+
+    def test_listing_failure_stops_later_phases(self, tmp_path):
+        client = DockerClient(f"unix://{tmp_path}/missing.sock")
+        results = CleanupEngine(client).clean(CleanupSchema(name="j", regular_expression="job"))
+        assert all(isinstance(result.error, DockerCommandError) for result in results.values())
+
+    def test_batched(self):
+        assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+        assert list(batched([], 3)) == []
+
+
+class TestRunTiming:
+    def test_results_are_timed_and_counted(self):
+        with (
+            FakeDockerDaemon(
+                containers=[container("c1", "rec_a"), container("c2", "rec_b")], volumes=[volume("rec_data")]
+            ) as daemon,
+            DockerClient(daemon.base_url) as client,
+        ):
+            results = CleanupEngine(client).clean(CleanupSchema(name="rec", regular_expression="rec_"))
+
+        containers, volumes = results["containers"], results["volumes"]
+        assert (containers.matched, volumes.matched, results["images"].matched) == (2, 1, 0)
+        assert containers.started_at <= containers.finished_at <= volumes.started_at <= volumes.finished_at
+        assert containers.duration >= 0
+        assert CleanupResult("images").duration == 0.0
+
+
+class TestSelection:
+    @pytest.fixture
+    def daemon(self):
+        with FakeDockerDaemon(
+            images=[
+                image("sha256:b1", "build:1", Size=300, Created=1000),
+                image("sha256:b2", "build:2", Size=100, Created=2000),
+                image("sha256:b3", "build:3", Size=500, Created=3000),
+                image("sha256:b4", "build:4", Size=200, Created=4000),
+                image("sha256:o1", "other:1", Size=900, Created=500),
+            ],
+        ) as daemon:
+            yield daemon
+
+    @pytest.fixture
+    def engine(self, daemon):
+        with DockerClient(daemon.base_url) as client:
+            yield CleanupEngine(client)
+
+    def test_keep_latest(self, engine, daemon):
+        results = engine.clean(CleanupSchema(name="b", regular_expression="build", keep_latest=2), ["images"])
+        assert {r.id for r in results["images"].removed} == {"sha256:b1", "sha256:b2"}
+        assert daemon.images.keys() == {"sha256:b3", "sha256:b4", "sha256:o1"}
+
+    def test_keep_latest_only_spares_its_own_matches(self, engine, daemon):
+        cleanups = [
+            CleanupSchema(name="b", regular_expression="build", keep_latest=1),
+            CleanupSchema(name="three", regular_expression="build:3"),
+        ]
+        engine.clean_many(cleanups, ["images"])
+        assert daemon.images.keys() == {"sha256:b4", "sha256:o1"}
+
+    def test_min_size(self, engine, daemon):
+        engine.clean(CleanupSchema(name="b", regular_expression="build", min_size=300), ["images"])
+        assert daemon.images.keys() == {"sha256:b2", "sha256:b4", "sha256:o1"}
+
+    def test_min_size_alone_is_not_pruned(self, engine, daemon):
+        engine.clean(CleanupSchema(name="big", min_size=500), ["images"])
+        assert ("POST", "/images/prune") not in daemon.requests
+        assert daemon.images.keys() == {"sha256:b1", "sha256:b2", "sha256:b4"}
+
+    def test_plan_free_at_least(self, engine):
+        plan = engine.plan([CleanupSchema(name="b", regular_expression="build")], free_at_least=600)
+        assert [r.id for r in plan.resources] == ["sha256:b3", "sha256:b1"]
+        assert plan.total_size == 800
+
+    def test_containers_and_volumes_are_sized_for_size_selections(self):
+        containers = [container("c1", "big_1", SizeRw=900), container("c2", "big_2", SizeRw=10)]
+        volumes = [volume("big_data", UsageData={"Size": 500, "RefCount": 0})]
+        with FakeDockerDaemon(containers, volumes) as daemon, DockerClient(daemon.base_url) as client:
+            assert [r.size for r in iter_resources(client, "containers")] == [0, 0]
+            assert [r.size for r in iter_resources(client, "volumes")] == [0]
+            assert ("GET", "/system/df") not in daemon.requests
+
+            engine = CleanupEngine(client)
+            plan = engine.plan([CleanupSchema(name="big", regular_expression="big")], free_at_least=1000)
+            assert [(r.id, r.size) for r in plan.resources] == [("c1", 900), ("big_data", 500)]
+
+            engine.clean(CleanupSchema(name="big", regular_expression="big", min_size=100))
+            assert daemon.containers.keys() == {"c2"}
+            assert not daemon.volumes
+
+    def test_largest_first_stops_at_target(self):
+        matches = {
+            "containers": [Resource("containers", "c1")],
+            "images": [Resource("images", f"i{size}", size=size) for size in (5, 40, 10, 30)],
+        }
+        picked = largest_first(matches, 50)
+        assert picked == {"containers": [], "images": [matches["images"][1], matches["images"][3]]}
+        assert sum(r.size for r in largest_first(matches, 10**6)["images"]) == 85
@@ -0,0 +1,57 @@
+import pytest
+
+from docker_tools_plus.database import CleanupSchema
+from docker_tools_plus.explain import explain
+from docker_tools_plus.inventory import Inventory, Resource
+
+
+@pytest.fixture
+def inventory():
+    return Inventory(
+        [
+            Resource("containers", "c1", ("api_1",), image="api:latest", size=100),
+            Resource("containers", "c2", ("api_2",), image="api:latest", size=50),
+            Resource("containers", "c3", ("worker_1",), image="worker:latest"),
+            Resource("volumes", "api_data", ("api_data",)),
+            Resource("volumes", "cache", ("cache",)),
+            Resource("images", "sha256:i1", ("api:latest",)),
+            Resource("images", "sha256:i2", ("worker:latest",)),
+        ]
+    )
+
+
+def test_counts_and_samples(inventory):
+    explanation = explain(CleanupSchema(name="api", regular_expression="api_[0-9]+"), inventory, samples=1)
+
+    containers, volumes, images = explanation.types
+    assert (containers.matched, containers.total, containers.size, containers.samples) == (2, 3, 150, ["api_1"])
+    assert (volumes.matched, volumes.total, images.matched) == (0, 2, 0)
+    # Every resource has its ID, names and image searched as one text
+    assert explanation.searched == 7
+    assert explanation.compile_seconds > 0
+    assert explanation.warnings == []
+    assert explanation.to_dict()["types"]["containers"]["samples"] == ["api_1"]
+
+
+def test_match_fields_and_filters_are_applied(inventory):
+    cleanup = CleanupSchema(name="api", regular_expression="^api", match_fields=["image"], keep_latest=1)
+
+    explanation = explain(cleanup, inventory)
+
+    # keep_latest spares one matching container and the only matching image
+    assert [t.matched for t in explanation.types] == [1, 0, 0]
+    # Volumes have no image to search
+    assert explanation.searched == 5
+
+
+@pytest.mark.parametrize(
+    ("pattern", "warning"),
+    [
+        (r"(\w+_?)+$", "nested quantifiers"),
+        ("x*y*z*", "matches an empty string"),
+        ("a.*", "selects 7 of the 7 resources"),
+    ],
+)
+def test_warnings(inventory, pattern, warning):
+    explanation = explain(CleanupSchema(name="risky", regular_expression=pattern), inventory)
+    assert any(warning in w for w in explanation.warnings)
@@ -0,0 +1,107 @@
+import socket
+import time
+
+import pytest
+
+from docker_tools_plus.database import CleanupSchema
+from docker_tools_plus.fake_daemon import FakeDockerDaemon, container, image, volume
+from docker_tools_plus.fleet import run_fleet
+
+
+def _agent(tcp=False):
+    return FakeDockerDaemon(
+        containers=[container("c1", "build_1"), container("c2", "agent")],
+        volumes=[volume("build_cache")],
+        images=[image("sha256:i1", "build:latest", Size=1000)],
+        tcp=tcp,
+    )
+
+
+@pytest.fixture
+def stalled_host():
+    """A TCP endpoint that accepts connections but never answers."""
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        yield f"tcp://127.0.0.1:{server.getsockname()[1]}"
+
+
+class TestFleet:
+    def test_cleans_every_host(self):
+        with _agent() as first, _agent() as second, _agent(tcp=True) as third:
+            hosts = [first.base_url, second.base_url, third.base_url, first.base_url]
+            outcomes = run_fleet(hosts, [CleanupSchema(name="build", regular_expression="build")], timeout=5)
+
+            assert [o.host for o in outcomes] == hosts[:3]
+            assert all(o.ok for o in outcomes)
+            assert [(o.removed, o.reclaimed) for o in outcomes] == [(3, 1000)] * 3
+            for daemon in (first, second, third):
+                assert daemon.containers.keys() == {"c2"}
+                assert not daemon.volumes and not daemon.images
+
+    def test_removals_are_reported_with_their_host(self):
+        removals = []
+        with _agent() as first, _agent() as second:
+            run_fleet(
+                [first.base_url, second.base_url],
+                [CleanupSchema(name="build", regular_expression="build")],
+                on_removal=lambda host, resource, error: removals.append((host, resource.id, error)),
+            )
+
+        assert sorted(removals) == sorted(
+            (host, resource_id, None)
+            for host in (first.base_url, second.base_url)
+            for resource_id in ("c1", "build_cache", "sha256:i1")
+        )
+
+    def test_failing_hosts_do_not_stop_the_others(self, tmp_path, stalled_host):
+        with _agent() as daemon:
+            daemon.fail_deletes["c1"] = 409
+            hosts = [f"unix://{tmp_path}/missing.sock", stalled_host, daemon.base_url, "ssh://agent"]
+            start = time.perf_counter()
+            missing, stalled, healthy, unsupported = run_fleet(
+                hosts, [CleanupSchema(name="build", regular_expression="build")], ["containers"], timeout=0.5
+            )
+
+            # The stalled host times out on its own instead of holding up the run
+            assert time.perf_counter() - start < 3
+            assert "Cannot reach Docker daemon" in str(missing.first_error)
+            assert "timed out" in str(stalled.first_error)
+            assert not healthy.first_error and healthy.failed == 1 and not healthy.ok
+            assert "Unsupported Docker host" in str(unsupported.error)
+
+    def test_hosts_run_concurrently(self):
+        cleanups = [CleanupSchema(name="build", regular_expression="build")]
+        with _agent() as first, _agent() as second, _agent() as third:
+            for daemon in (first, second, third):
+                daemon.chunk_delay = 0.2
+            start = time.perf_counter()
+            run_fleet([first.base_url], cleanups)
+            alone = time.perf_counter() - start
+
+            start = time.perf_counter()
+            outcomes = run_fleet([second.base_url, third.base_url], cleanups)
+            together = time.perf_counter() - start
+
+            assert all(o.ok for o in outcomes)
+            assert together < alone * 1.5
+
+    def test_slow_host_is_stopped_at_its_deadline(self):
+        containers = [container(f"c{i}", f"build_{i}") for i in range(20)]
+        with FakeDockerDaemon(containers, latency=0.05) as slow, _agent() as fast:
+            start = time.perf_counter()
+            stopped, healthy = run_fleet(
+                [slow.base_url, fast.base_url],
+                [CleanupSchema(name="build", regular_expression="build")],
+                ["containers"],
+                jobs=1,
+                batch_size=2,
+                deadline=0.3,
+            )
+
+            assert time.perf_counter() - start < 0.8
+            assert "did not finish within 0.3s" in str(stopped.error)
+            # What was removed before the deadline is still reported
+            assert 0 < stopped.removed < 20
+            assert len(slow.containers) == 20 - stopped.removed
+            assert healthy.ok
@@ -0,0 +1,295 @@
+import re
+import time
+
+import pytest
+
+from docker_tools_plus.database import CleanupSchema
+from docker_tools_plus.docker_client import DockerClient
+from docker_tools_plus.fake_daemon import FakeDockerDaemon, container, image, volume
+from docker_tools_plus.inventory import (
+    EventInventoryProvider,
+    Inventory,
+    InventoryProvider,
+    Resource,
+    combine_patterns,
+)
+from docker_tools_plus.patterns import (
+    CONSECUTIVE_QUANTIFIERS,
+    NESTED_QUANTIFIERS,
+    OVERLAPPING_ALTERNATION,
+    PatternIndex,
+    backtracking_risks,
+    required_literals,
+)
+
+
+@pytest.fixture
+def daemon():
+    with FakeDockerDaemon(
+        containers=[
+            container("c1", "api_1", image="api:latest", Labels={"team": "payments"}),
+            container("c2", "worker_1", image="worker:latest"),
+        ],
+        volumes=[volume("api_data", Labels={"team": "payments"})],
+        images=[image("sha256:i1", "api:latest", "api:1.0"), image("sha256:i2", "worker:latest")],
+    ) as daemon:
+        yield daemon
+
+
+@pytest.fixture
+def client(daemon):
+    with DockerClient(daemon.base_url) as client:
+        yield client
+
+
+class TestInventory:
+    def test_indexes(self, client):
+        inventory = Inventory.fetch(client)
+        assert len(inventory) == 5
+        assert inventory.by_id["c1"].name == "api_1"
+        assert [r.id for r in inventory.by_name["api_data"]] == ["api_data"]
+        assert {r.id for r in inventory.by_image["api:latest"]} == {"c1", "sha256:i1"}
+        assert [r.id for r in inventory.by_image["api:1.0"]] == ["sha256:i1"]
+        assert {r.id for r in inventory.by_label["team=payments"]} == {"c1", "api_data"}
+        assert {r.id for r in inventory.by_label["team"]} == {"c1", "api_data"}
+
+    def test_match_many_patterns(self, client):
+        inventory = Inventory.fetch(client)
+        api, worker = inventory.match(
+            [CleanupSchema(name="api", regular_expression="api"), CleanupSchema(name="w", regular_expression="worker")]
+        )
+        assert {t: [r.id for r in rs] for t, rs in api.items()} == {
+            "containers": ["c1"],
+            "volumes": ["api_data"],
+            "images": ["sha256:i1"],
+        }
+        assert [r.id for r in worker["containers"]] == ["c2"]
+        assert worker["volumes"] == []
+
+    def test_match_any_deduplicates(self, client):
+        inventory = Inventory.fetch(client)
+        cleanups = [
+            CleanupSchema(name="a", regular_expression="api"),
+            CleanupSchema(name="b", regular_expression="api_1"),
+            CleanupSchema(name="c", regular_expression="^worker"),
+        ]
+        matches = inventory.match_any(cleanups, ["containers"])
+        assert [r.id for r in matches["containers"]] == ["c1"]
+
+    def test_match_fields(self, client):
+        inventory = Inventory.fetch(client)
+        cleanups = [
+            CleanupSchema(name="tag", regular_expression="^1\\.0$", match_fields=["tag"]),
+            CleanupSchema(name="label", regular_expression="^team=payments$", match_fields=["label"]),
+            CleanupSchema(name="driver", regular_expression="local", match_fields=["driver"]),
+        ]
+        tag, label, driver = inventory.match(cleanups)
+        assert [r.id for r in tag["images"]] == ["sha256:i1"]
+        assert tag["containers"] == []
+        assert {t: [r.id for r in rs] for t, rs in label.items()} == {
+            "containers": ["c1"],
+            "volumes": ["api_data"],
+            "images": [],
+        }
+        assert [r.id for r in driver["volumes"]] == ["api_data"]
+        assert {t: [r.id for r in rs] for t, rs in inventory.match_any(cleanups).items()} == {
+            "containers": ["c1"],
+            "volumes": ["api_data"],
+            "images": ["sha256:i1"],
+        }
+
+    def test_name_field_ignores_the_image(self, client):
+        inventory = Inventory.fetch(client)
+        by_name = CleanupSchema(name="n", regular_expression="^api", match_fields=["name"])
+        by_image = CleanupSchema(name="i", regular_expression="^api", match_fields=["image"])
+        worker = CleanupSchema(name="w", regular_expression="worker", match_fields=["image"])
+        assert [r.id for r in inventory.match_any([by_name], ["containers"])["containers"]] == ["c1"]
+        assert [r.id for r in inventory.match_any([by_image, worker], ["containers"])["containers"]] == ["c1", "c2"]
+
+    def test_columns_follow_changes(self, client):
+        inventory = Inventory.fetch(client)
+        cleanup = CleanupSchema(name="api", regular_expression="api", match_fields=["name"])
+        assert [r.id for r in inventory.match_any([cleanup], ["containers"])["containers"]] == ["c1"]
+        inventory.add(Resource("containers", "c3", ("api_2",), "api:latest"))
+        inventory.discard(inventory.by_id["c1"])
+        assert inventory.column("containers", ["name"]) == [("worker_1",), ("api_2",)]
+        assert [r.id for r in inventory.match_any([cleanup], ["containers"])["containers"]] == ["c3"]
+
+    def test_discard(self, client):
+        inventory = Inventory.fetch(client)
+        inventory.discard(inventory.by_id["c1"])
+        assert "c1" not in inventory.by_id
+        assert "api_1" not in inventory.by_name
+        assert [r.id for r in inventory.by_image["api:latest"]] == ["sha256:i1"]
+        assert [r.id for r in inventory.of_type("containers")] == ["c2"]
+
+
+class TestInventoryProvider:
+    def test_snapshot_reused_within_ttl(self, daemon, client):
+        provider = InventoryProvider(client, ttl=60)
+        assert provider.get() is provider.get()
+        assert daemon.requests.count(("GET", "/containers/json")) == 1
+
+    def test_snapshot_refreshed_after_ttl(self, daemon, client):
+        provider = InventoryProvider(client, ttl=0)
+        first = provider.get()
+        assert provider.get() is not first
+        assert daemon.requests.count(("GET", "/containers/json")) == 2
+
+    def test_invalidate(self, daemon, client):
+        provider = InventoryProvider(client, ttl=60)
+        first = provider.get()
+        provider.invalidate()
+        assert provider.get() is not first
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class TestEventInventoryProvider:
+    @pytest.fixture
+    def provider(self, client):
+        provider = EventInventoryProvider(client, ttl=60, reconnect_delay=0.01)
+        provider.start()
+        _wait_for(lambda: provider.live)
+        yield provider
+        provider.stop()
+
+    def test_follows_creations_and_removals(self, daemon, client, provider):
+        before = provider.get()
+        daemon.create("containers", container("c3", "api_2", image="api:latest"))
+        daemon.create("volumes", volume("api_logs"))
+        client.remove_container("c2")
+
+        _wait_for(lambda: provider.events_applied == 3)
+        inventory = provider.get()
+        assert {r.id for r in inventory.of_type("containers")} == {"c1", "c3"}
+        assert {r.id for r in inventory.by_image["api:latest"]} == {"c1", "c3", "sha256:i1"}
+        assert "api_logs" in inventory.by_name
+        # Handed-out snapshots do not change under a run
+        assert {r.id for r in before.of_type("containers")} == {"c1", "c2"}
+        # Only single resources were fetched; the daemon was listed once
+        assert provider.resyncs == 1
+        assert daemon.requests.count(("GET", "/images/json")) == 1
+
+    def test_follows_image_tags(self, daemon, provider):
+        daemon.images["sha256:i2"]["RepoTags"] = ["worker:latest", "worker:2.0"]
+        daemon.emit("images", "tag", "sha256:i2")
+        daemon.create("images", image("sha256:i3", "cache:latest", Size=10))
+
+        _wait_for(lambda: provider.events_applied == 2)
+        inventory = provider.get()
+        assert inventory.by_id["sha256:i2"].names == ("worker:latest", "worker:2.0")
+        assert inventory.by_id["sha256:i3"].size == 10
+
+    def test_unchanged_inventory_is_not_copied(self, provider):
+        assert provider.get() is provider.get()
+
+    def test_resyncs_after_reconnecting(self, daemon, provider):
+        daemon.drop_event_streams()
+        # A change made while the stream is down is picked up by the listing that follows the reconnection
+        daemon.containers["c9"] = container("c9", "missed")
+        _wait_for(lambda: provider.resyncs == 2 and provider.live)
+        assert "c9" in provider.get().by_id
+
+    def test_falls_back_to_listing_when_stopped(self, daemon, provider):
+        provider.stop()
+        assert not provider.live
+        provider.get()
+        assert daemon.requests.count(("GET", "/volumes")) == 2
+
+
+class TestCombinePatterns:
+    def test_merges_into_one_alternation(self):
+        cleanups = [
+            CleanupSchema(name="a", regular_expression="api_.*"),
+            CleanupSchema(name="b", regular_expression="^db$"),
+            CleanupSchema(name="c", regular_expression="api_.*"),
+        ]
+        (pattern,) = combine_patterns(cleanups)
+        assert pattern.pattern == "(?:api_.*)|(?:^db$)"
+        assert pattern.search("db") and not pattern.search("xdb")
+
+    def test_keeps_unsafe_patterns_separate(self):
+        cleanups = [
+            CleanupSchema(name="a", regular_expression="(a)\\1"),
+            CleanupSchema(name="b", regular_expression="(?i)web"),
+            CleanupSchema(name="c", regular_expression="api"),
+            CleanupSchema(name="d", regular_expression="(b)"),
+        ]
+        patterns = [p.pattern for p in combine_patterns(cleanups)]
+        assert patterns == ["(?:api)|(?:(b))", "(a)\\1", "(?i)web"]
+
+    def test_keeps_conditionals_separate(self):
+        # Merged after "(x)", group 1 of the conditional would be the other pattern's group
+        cleanups = [
+            CleanupSchema(name="a", regular_expression="(x)"),
+            CleanupSchema(name="b", regular_expression="(a)?(?(1)b|c)d"),
+            CleanupSchema(name="c", regular_expression="(?P<n>e)?(?(n)f|g)h"),
+        ]
+        patterns = combine_patterns(cleanups)
+        assert [p.pattern for p in patterns] == ["(x)", "(a)?(?(1)b|c)d", "(?P<n>e)?(?(n)f|g)h"]
+        assert any(p.search("cd") for p in patterns)
+
+
+class TestPatternIndex:
+    @pytest.mark.parametrize(
+        ("pattern", "literals"),
+        [
+            ("^tmp-[0-9a-f]{8}$", ("tmp-",)),
+            ("ci_(build|test)_[0-9]+", ("build", "test")),
+            ("x(abc)+y", ("abc",)),
+            ("(?:ab)?cd", ("cd",)),
+            ("[a-z]+", ()),
+            ("(?i)api", ()),
+            ("foo(?i:bar)baz1", ("baz1",)),
+        ],
+    )
+    def test_required_literals(self, pattern, literals):
+        assert required_literals(pattern) == literals
+
+    def test_agrees_with_searching_every_pattern(self):
+        patterns = ["job1", "job10", "ob1", "[a-z]+[0-9]", "^job", "ci_(build|test)_[0-9]+", "(?i)JOB"]
+        index = PatternIndex(patterns)
+        assert index.unindexed == [3, 6]
+        texts = ["job10-x", "nope", "ab7", "ci_test_7", "ci_test_", "x-job1"]
+        for text in texts:
+            assert index.search(text) == [p for p, pattern in enumerate(patterns) if re.search(pattern, text)]
+        assert index.search_any(["ab7", "job1"]) == [0, 2, 3, 4, 6]
+
+    @pytest.mark.parametrize(
+        ("pattern", "risks"),
+        [
+            ("^api_[0-9]+$", []),
+            ("(web|db)_.*", []),
+            ("[a-z]+[0-9]+", []),
+            (r"(\w+_?)+$", [NESTED_QUANTIFIERS]),
+            ("(?>a+)+", []),
+            ("(a|a)+$", [OVERLAPPING_ALTERNATION]),
+            ("(x|xy|z)+", [OVERLAPPING_ALTERNATION]),
+            ("name=.*.*=", [CONSECUTIVE_QUANTIFIERS]),
+            ("(", []),
+        ],
+    )
+    def test_backtracking_risks(self, pattern, risks):
+        assert backtracking_risks(pattern) == risks
+
+    def test_matched_by(self, client):
+        inventory = Inventory.fetch(client)
+        cleanups = [
+            CleanupSchema(name="api", regular_expression="api"),
+            CleanupSchema(name="team", labels=["team=payments"]),
+            CleanupSchema(name="latest", regular_expression=":latest$", match_fields=["image"]),
+            CleanupSchema(name="api-old", regular_expression="api", until="1h"),
+        ]
+        assert inventory.matched_by(cleanups) == {
+            "c1": [0, 1, 2],
+            "c2": [2],
+            "api_data": [0, 1],
+            "sha256:i1": [0, 2],
+            "sha256:i2": [2],
+        }
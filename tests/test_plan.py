@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from docker_tools_plus.database import CleanupSchema
+from docker_tools_plus.docker_client import DockerClient
+from docker_tools_plus.engine import CleanupEngine
+from docker_tools_plus.exceptions import InvalidPlanError
+from docker_tools_plus.fake_daemon import FakeDockerDaemon, container, image, volume
+from docker_tools_plus.plan import CleanupPlan, format_size
+
+
+@pytest.fixture
+def daemon():
+    with FakeDockerDaemon(
+        containers=[container("c1", "api_1", ImageID="sha256:i1", SizeRw=2048), container("c2", "db_1")],
+        volumes=[volume("api_data", UsageData={"Size": 1000, "RefCount": 0}), volume("api_cache", UsageData=None)],
+        images=[image("sha256:i1", "api:latest", Size=1_500_000_000)],
+    ) as daemon:
+        yield daemon
+
+
+@pytest.fixture
+def engine(daemon):
+    with DockerClient(daemon.base_url) as client:
+        yield CleanupEngine(client)
+
+
+class TestCleanupPlan:
+    def test_plan_lists_matches_in_removal_order(self, engine, daemon):
+        plan = engine.plan([CleanupSchema(name="api", regular_expression="api")])
+        assert [(r.phase, r.kind, r.id) for r in plan.resources] == [
+            (0, "containers", "c1"),
+            (1, "volumes", "api_data"),
+            (1, "volumes", "api_cache"),
+            (1, "images", "sha256:i1"),
+        ]
+        assert [r.size for r in plan.resources] == [2048, 1000, 0, 1_500_000_000]
+        assert plan.total_size == 1_500_003_048
+        assert plan.docker_host == daemon.base_url
+        # Planning never removes anything
+        assert all(method == "GET" for method, _ in daemon.requests)
+        assert daemon.requests.count(("GET", "/containers/json")) == 1
+
+    def test_save_and_load(self, engine, tmp_path):
+        plan = engine.plan([CleanupSchema(name="api", regular_expression="api")], ["containers"])
+        path = tmp_path / "plan.json"
+        plan.save(path)
+        assert json.loads(path.read_text())["resources"][0]["id"] == "c1"
+        loaded = CleanupPlan.load(path)
+        assert loaded == plan
+        assert loaded.resource_types == ["containers"]
+
+    def test_load_invalid_plan(self, tmp_path):
+        path = tmp_path / "plan.json"
+        path.write_text('{"version": 1, "resources": [{"kind": "networks", "id": "n1", "name": "n", "phase": 0}]}')
+        with pytest.raises(InvalidPlanError, match="Invalid plan file"):
+            CleanupPlan.load(path)
+        with pytest.raises(InvalidPlanError, match="Cannot read plan file"):
+            CleanupPlan.load(tmp_path / "missing.json")
+
+    def test_execute_saved_plan(self, engine, daemon, tmp_path):
+        path = tmp_path / "plan.json"
+        engine.plan([CleanupSchema(name="api", regular_expression="api")]).save(path)
+        results = engine.execute(CleanupPlan.load(path), jobs=4)
+        assert all(result.ok for result in results.values())
+        assert [r.id for r in results["containers"].removed] == ["c1"]
+        assert daemon.containers.keys() == {"c2"}
+        assert not daemon.volumes and not daemon.images
+        # The plan is executed as saved, without listing the daemon again
+        assert daemon.requests.count(("GET", "/containers/json")) == 1
+
+    def test_saved_plan_removes_child_images_first(self, tmp_path):
+        images = [image("sha256:p", "app:base"), image("sha256:c", "app:1", ParentId="sha256:p")]
+        with FakeDockerDaemon(images=images) as daemon, DockerClient(daemon.base_url) as client:
+            engine = CleanupEngine(client)
+            path = tmp_path / "plan.json"
+            engine.plan([CleanupSchema(name="app", regular_expression="app")]).save(path)
+            plan = CleanupPlan.load(path)
+            assert [r.parent for r in plan.resources] == ["", "sha256:p"]
+
+            assert engine.execute(plan)["images"].ok
+            assert not daemon.images
+
+    def test_format_size(self):
+        assert format_size(512) == "512B"
+        assert format_size(1_500) == "1.5kB"
+        assert format_size(1_500_000_000) == "1.5GB"
@@ -0,0 +1,189 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+import pytest
+from click.testing import CliRunner
+
+from docker_tools_plus import profiling
+from docker_tools_plus.cli import cli
+from docker_tools_plus.database import DatabaseManager
+from docker_tools_plus.exceptions import ProfileExportError
+
+
+@pytest.fixture
+def profiler():
+    profiler = profiling.start()
+    yield profiler
+    profiling.stop()
+
+
+class TestDisabled:
+    def test_helpers_are_no_ops(self):
+        assert profiling.active() is None
+        assert profiling.span("x") is profiling.span("y")
+        assert profiling.timer("x") is profiling.span("x")
+
+        def func():
+            return 1
+
+        assert profiling.timed(func, "x") is func
+        items = iter([1, 2])
+        assert profiling.timed_iter(items, "x") is items
+
+    def test_traced_calls_through(self):
+        @profiling.traced("db.answer")
+        def answer(value):
+            return value * 2
+
+        assert answer(21) == 42
+
+
+class TestProfiler:
+    def test_nested_spans(self, profiler):
+        with profiling.span("outer", host="a"):
+            with profiling.span("inner"):
+                pass
+            with profiling.span("inner"):
+                pass
+        outer = next(s for s in profiler.spans if s.name == "outer")
+        inner = [s for s in profiler.spans if s.name == "inner"]
+        assert outer.parent_id is None
+        assert outer.attributes == {"host": "a"}
+        assert [s.parent_id for s in inner] == [outer.span_id] * 2
+        assert all(outer.start_ns <= s.start_ns and s.end_ns <= outer.end_ns for s in inner)
+
+    def test_aggregates(self, profiler):
+        items = list(profiling.timed_iter(range(3), "list"))
+        match = profiling.timed(lambda x: x > 0, "match")
+        assert [match(i) for i in items] == [False, True, True]
+        with profiling.timer("remove"):
+            pass
+        calls = {a.name: a.calls for a in profiler.aggregates.values()}
+        # Producing the end of the iteration is timed too
+        assert calls == {"list": 4, "match": 3, "remove": 1}
+
+    def test_breakdown_costliest_first(self, profiler):
+        profiler.add("fast", 0, 1_000)
+        profiler.add("slow", 0, 3_000_000)
+        profiler.add("slow", 10, 1_000_000)
+        assert profiler.breakdown() == [("slow", 2, 0.004, 0.003), ("fast", 1, 0.000001, 0.000001)]
+
+    def test_traced(self, profiler):
+        @profiling.traced("db.answer")
+        def answer():
+            return 42
+
+        with profiling.span("cli.list"):
+            answer()
+        root, child = sorted(profiler.spans, key=lambda s: s.start_ns)
+        assert (child.name, child.parent_id) == ("db.answer", root.span_id)
+
+
+class TestExport:
+    def test_jsonl(self, profiler, tmp_path):
+        with profiling.span("cli.list"):
+            profiler.add("docker.list.containers", 1, 5)
+        target = tmp_path / "profile.jsonl"
+        profiler.export(str(target))
+        profiler.export(str(target))
+        records = [json.loads(line) for line in target.read_text().splitlines()]
+        assert len(records) == 4
+        assert {r["type"] for r in records} == {"span", "aggregate"}
+        assert {r["trace_id"] for r in records} == {profiler.trace_id}
+
+    def test_otlp(self, profiler):
+        with profiling.span("cli.clean", jobs=8):
+            profiler.add("engine.match", 1, 5)
+        (resource_spans,) = profiler.to_otlp()["resourceSpans"]
+        spans = resource_spans["scopeSpans"][0]["spans"]
+        root, aggregate = spans
+        assert root["name"] == "cli.clean"
+        assert root["attributes"] == [{"key": "jobs", "value": {"intValue": "8"}}]
+        assert "parentSpanId" not in root
+        assert aggregate["parentSpanId"] == root["spanId"]
+        assert {"key": "calls", "value": {"intValue": "1"}} in aggregate["attributes"]
+        assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+
+    def test_otlp_worker_spans_are_children_of_the_command(self, profiler):
+        with profiling.span("cli.clean"):
+            # Worker threads start with no current span; this one also ends first
+            thread = threading.Thread(target=self._worker_span)
+            thread.start()
+            thread.join()
+        (resource_spans,) = profiler.to_otlp()["resourceSpans"]
+        spans = {span["name"]: span for span in resource_spans["scopeSpans"][0]["spans"]}
+        assert "parentSpanId" not in spans["cli.clean"]
+        assert spans["fleet.host"]["parentSpanId"] == spans["cli.clean"]["spanId"]
+        assert profiler.root.name == "cli.clean"
+
+    @staticmethod
+    def _worker_span():
+        with profiling.span("fleet.host"):
+            pass
+
+    def test_otlp_collector(self, profiler):
+        received = []
+
+        class Collector(BaseHTTPRequestHandler):
+            def do_POST(self):  # noqa: N802
+                received.append((self.path, json.loads(self.rfile.read(int(self.headers["Content-Length"])))))
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Collector)
+        thread = threading.Thread(target=server.handle_request, daemon=True)
+        thread.start()
+        with profiling.span("cli.list"):
+            pass
+        profiler.export(f"http://127.0.0.1:{server.server_address[1]}/v1/traces", "otlp")
+        thread.join(5)
+        server.server_close()
+        ((path, body),) = received
+        assert path == "/v1/traces"
+        assert body["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] == "cli.list"
+
+    def test_errors(self, profiler, tmp_path):
+        with pytest.raises(ProfileExportError, match="otlp format"):
+            profiler.export("http://127.0.0.1:1/v1/traces", "jsonl")
+        with pytest.raises(ProfileExportError, match="Cannot send profile"):
+            profiler.export("http://127.0.0.1:1/v1/traces", "otlp")
+        with pytest.raises(ProfileExportError, match="Cannot write profile"):
+            profiler.export(str(tmp_path / "missing" / "profile.jsonl"))
+
+
+class TestCommandProfile:
+    @pytest.fixture
+    def manager(self, tmp_path):
+        manager = DatabaseManager(str(tmp_path / "test.db"))
+        manager.create_cleanup("api", "api_.*")
+        with patch("docker_tools_plus.database.get_manager", return_value=manager):
+            yield manager
+
+    def test_profile_and_export(self, manager, tmp_path):
+        target = tmp_path / "profile.jsonl"
+        result = CliRunner().invoke(cli, ["--profile", "--profile-export", str(target), "list"])
+
+        assert result.exit_code == 0
+        assert "1: api - api_.*" in result.output
+        assert "Profile" in result.output
+        assert "db.list_cleanups" in result.output
+        spans = {r["name"]: r for r in map(json.loads, target.read_text().splitlines())}
+        assert spans["db.list_cleanups"]["parent_id"] == spans["cli.list"]["span_id"]
+        assert spans["list.render"]["attributes"] == {"cleanups": 1}
+        assert profiling.active() is None
+
+    def test_collector_needs_otlp(self, manager):
+        result = CliRunner().invoke(cli, ["--profile-export", "http://localhost:4318/v1/traces", "list"])
+        assert result.exit_code == 2
+        assert "--profile-format otlp" in result.output
+
+    def test_off_by_default(self, manager):
+        with patch("docker_tools_plus.profiling.start") as start:
+            CliRunner().invoke(cli, ["list"])
+        start.assert_not_called()
@@ -0,0 +1,76 @@
+import datetime
+
+import pytest
+
+from docker_tools_plus.exceptions import InvalidScheduleError
+from docker_tools_plus.schedule import CronSchedule, IntervalSchedule, next_run, parse_schedule
+
+
+def at(*args):
+    return datetime.datetime(*args).timestamp()
+
+
+class TestCronSchedule:
+    def test_every_quarter_hour(self):
+        schedule = parse_schedule("*/15 * * * *")
+        assert isinstance(schedule, CronSchedule)
+        assert schedule.next_after(at(2026, 5, 4, 10, 7, 30)) == at(2026, 5, 4, 10, 15)
+        assert schedule.next_after(at(2026, 5, 4, 10, 15)) == at(2026, 5, 4, 10, 30)
+        assert schedule.next_after(at(2026, 5, 4, 23, 50)) == at(2026, 5, 5, 0, 0)
+
+    def test_macro(self):
+        assert parse_schedule("@daily").next_after(at(2026, 12, 31, 12, 0)) == at(2027, 1, 1, 0, 0)
+
+    def test_ranges_and_lists(self):
+        schedule = parse_schedule("30 8-18/2 * * 1-5")
+        # Friday evening to Monday morning
+        assert schedule.next_after(at(2026, 5, 8, 18, 30)) == at(2026, 5, 11, 8, 30)
+        assert schedule.next_after(at(2026, 5, 11, 8, 30)) == at(2026, 5, 11, 10, 30)
+
+    def test_day_of_month_or_day_of_week(self):
+        # The 1st of the month or any Sunday, as in cron
+        schedule = parse_schedule("0 0 1 * 7")
+        assert schedule.next_after(at(2026, 5, 4)) == at(2026, 5, 10)
+        assert schedule.next_after(at(2026, 5, 31)) == at(2026, 6, 1)
+
+    def test_leap_day(self):
+        assert parse_schedule("0 0 29 2 *").next_after(at(2026, 3, 1)) == at(2028, 2, 29)
+
+    def test_whitespace_is_normalized(self):
+        assert parse_schedule("  0   3 * *  * ").expression == "0 3 * * *"
+
+    @pytest.mark.parametrize(
+        ("expression", "message"),
+        [
+            ("* * * *", "five fields"),
+            ("61 * * * *", "minute '61'"),
+            ("* * * * mon", "day of week 'mon'"),
+            ("*/0 * * * *", "minute"),
+            ("5-1 * * * *", "minute"),
+            ("0 0 31 2 *", "never runs"),
+        ],
+    )
+    def test_invalid(self, expression, message):
+        with pytest.raises(InvalidScheduleError, match=message):
+            parse_schedule(expression)
+
+
+class TestIntervalSchedule:
+    def test_every(self):
+        schedule = parse_schedule("@every 1h30m")
+        assert isinstance(schedule, IntervalSchedule)
+        assert schedule.seconds == 5400
+        assert schedule.next_after(100.0) == 5500.0
+
+    @pytest.mark.parametrize("expression", ["@every", "@every soon", "@every 0s"])
+    def test_invalid(self, expression):
+        with pytest.raises(InvalidScheduleError):
+            parse_schedule(expression)
+
+
+def test_next_run_jitter():
+    schedule = parse_schedule("@every 10s")
+    assert next_run(schedule, 100.0) == 110.0
+    runs = [next_run(schedule, 100.0, jitter=5) for _ in range(50)]
+    assert all(110.0 <= run <= 115.0 for run in runs)
+    assert len(set(runs)) > 1
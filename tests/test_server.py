@@ -0,0 +1,179 @@
+import asyncio
+import socket
+import stat
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from docker_tools_plus.database import DatabaseManager
+from docker_tools_plus.exceptions import ControlSocketError
+from docker_tools_plus.fake_daemon import FakeDockerDaemon, container, image, volume
+from docker_tools_plus.server import CleanupServer, send_request
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "test.db"))
+    with patch("docker_tools_plus.database.get_manager", return_value=manager):
+        yield manager
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are limited to about 100 bytes, too short for pytest's tmp_path
+    with tempfile.TemporaryDirectory(prefix="dtp-") as folder:
+        yield Path(folder) / "control.sock"
+
+
+@pytest.fixture
+def daemon():
+    with FakeDockerDaemon(
+        containers=[container("c1", "build_1"), container("c2", "agent")],
+        volumes=[volume("build_cache")],
+        images=[image("sha256:i1", "build:latest", Size=1000)],
+    ) as daemon:
+        yield daemon
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def _listening(path):
+    try:
+        return send_request(path, {"command": "status"}, timeout=1)["ok"]
+    except ControlSocketError:
+        return False
+
+
+@pytest.fixture
+def serve(manager, daemon, socket_path):
+    """Start a server in a thread; returns a function creating it, stopped at the end of the test."""
+    servers = []
+
+    def start(**kwargs):
+        server = CleanupServer(daemon.base_url, socket_path, timeout=5, **kwargs)
+        thread = threading.Thread(target=asyncio.run, args=(server.serve(),), daemon=True)
+        thread.start()
+        servers.append((server, thread))
+        _wait_for(lambda: _listening(socket_path))
+        return server
+
+    yield start
+    for server, thread in servers:
+        server.stop()
+        thread.join(timeout=5)
+
+
+class TestCleanupServer:
+    def test_trigger_runs_and_records(self, manager, daemon, socket_path, serve):
+        manager.create_cleanup("build", "build")
+        serve()
+
+        answer = send_request(socket_path, {"command": "run", "names": ["build"]}, timeout=5)
+
+        assert answer["results"]["containers"]["removed"] == 1
+        assert answer["results"]["images"]["reclaimed"] == 1000
+        assert daemon.containers.keys() == {"c2"}
+        assert {run.cleanup_name for run in manager.list_runs()} == {"build"}
+
+    def test_runs_use_the_event_fed_inventory(self, manager, daemon, socket_path, serve):
+        manager.create_cleanup("build", "build")
+        server = serve()
+        _wait_for(lambda: server.inventory.live)
+
+        send_request(socket_path, {"command": "run", "names": ["build"]}, timeout=5)
+        daemon.create("containers", container("c3", "build_2"))
+        _wait_for(lambda: "c3" in server.inventory.get().by_id)
+        answer = send_request(socket_path, {"command": "run", "names": ["build"]}, timeout=5)
+
+        assert answer["results"]["containers"]["removed"] == 1
+        assert daemon.containers.keys() == {"c2"}
+        # Listed once when the server subscribed to the events, not once per run
+        assert daemon.requests.count(("GET", "/images/json")) == 1
+        status = send_request(socket_path, {"command": "status"}, timeout=5)
+        assert status["inventory"]["live"]
+        assert status["inventory"]["resyncs"] == 1
+
+    def test_unknown_cleanup_and_command(self, manager, socket_path, serve):
+        serve()
+        with pytest.raises(ControlSocketError, match="No cleanup named missing"):
+            send_request(socket_path, {"command": "run", "names": ["missing"]}, timeout=5)
+        with pytest.raises(ControlSocketError, match="Unknown command"):
+            send_request(socket_path, {"command": "explode"}, timeout=5)
+
+    def test_unknown_cleanup_is_refused_without_waiting(self, manager, socket_path, serve):
+        serve()
+        with pytest.raises(ControlSocketError, match="No cleanup named missing"):
+            send_request(socket_path, {"command": "run", "names": ["missing"], "wait": False}, timeout=5)
+
+    def test_socket_is_owner_only(self, socket_path, serve):
+        serve()
+        assert stat.S_IMODE(socket_path.stat().st_mode) == 0o600
+
+    def test_scheduled_run(self, manager, daemon, socket_path, serve):
+        cleanup = manager.create_cleanup("build", "build")
+        manager.set_schedule(cleanup.id, "@every 0.1s")
+        server = serve()
+
+        _wait_for(lambda: server.runs_completed >= 1)
+
+        assert daemon.containers.keys() == {"c2"}
+        status = send_request(socket_path, {"command": "status"}, timeout=5)
+        assert status["runs_completed"] >= 1
+        assert [s["name"] for s in status["schedules"]] == ["build"]
+        assert status["schedules"][0]["next_run"] > time.time() - 1
+
+    def test_reload_picks_up_schedules(self, manager, socket_path, serve):
+        cleanup = manager.create_cleanup("build", "build")
+        server = serve()
+        manager.set_schedule(cleanup.id, "@daily")
+
+        assert send_request(socket_path, {"command": "reload"}, timeout=5)["schedules"] == 1
+        assert cleanup.id in server.due
+
+        manager.delete_schedule(cleanup.id)
+        send_request(socket_path, {"command": "reload"}, timeout=5)
+        assert server.due == {}
+
+    def test_stop_removes_socket(self, socket_path, serve):
+        serve()
+        send_request(socket_path, {"command": "stop"}, timeout=5)
+        _wait_for(lambda: not socket_path.exists())
+
+    def test_refuses_live_socket_and_replaces_stale_one(self, manager, daemon, socket_path, serve):
+        serve()
+        second = CleanupServer(daemon.base_url, socket_path)
+        with pytest.raises(ControlSocketError, match="already listening"):
+            asyncio.run(second.serve())
+
+        stale = socket_path.with_name("stale.sock")
+        # Bound by a server that is gone: nothing listens on it any more
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as left_behind:
+            left_behind.bind(str(stale))
+        third = CleanupServer(daemon.base_url, stale)
+        thread = threading.Thread(target=asyncio.run, args=(third.serve(),), daemon=True)
+        thread.start()
+        _wait_for(lambda: _listening(stale))
+        third.stop()
+        thread.join(timeout=5)
+
+
+def test_refuses_a_path_that_is_not_a_socket(daemon, socket_path):
+    socket_path.write_text("keep me")
+    server = CleanupServer(daemon.base_url, socket_path)
+    with pytest.raises(ControlSocketError, match="not a socket"):
+        asyncio.run(server.serve())
+    assert socket_path.read_text() == "keep me"
+
+
+def test_send_request_without_server(socket_path):
+    with pytest.raises(ControlSocketError, match="Cannot reach the server"):
+        send_request(socket_path, {"command": "status"}, timeout=1)
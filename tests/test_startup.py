@@ -0,0 +1,57 @@
+import subprocess
+import sys
+from pathlib import Path
+
+# Cumulative `python -X importtime` microseconds allowed for importing docker_tools_plus.cli.
+# The eager imports this guards against (pydantic, rich, tomli, SQLite setup) cost ~300ms on their own.
+STARTUP_BUDGET_US = 150_000
+HEAVY_MODULES = {
+    "pydantic",
+    "rich",
+    "tomli",
+    "sqlite3",
+    "http.client",
+    "docker_tools_plus.database",
+    "docker_tools_plus.settings",
+    "docker_tools_plus.engine",
+}
+
+
+def _import_times():
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from docker_tools_plus.cli import cli; cli(['--help'])"],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative)
+    return result.stdout, times
+
+
+class TestStartup:
+    def test_help_does_not_import_heavy_modules(self):
+        output, times = _import_times()
+        assert "Docker cleanup management tool." in output
+        assert not HEAVY_MODULES & times.keys()
+
+    def test_help_import_budget(self):
+        # Take the best of a few runs to keep the check stable on busy machines
+        best = min(_import_times()[1]["docker_tools_plus.cli"] for _ in range(3))
+        assert best < STARTUP_BUDGET_US
+
+    def test_settings_do_not_import_the_engine(self):
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys, docker_tools_plus.settings; print(' '.join(sys.modules))"],
+            cwd=Path(__file__).parent.parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        loaded = set(result.stdout.split())
+        assert not {"docker_tools_plus.engine", "docker_tools_plus.cache", "docker_tools_plus.docker_client"} & loaded
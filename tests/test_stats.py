@@ -0,0 +1,83 @@
+import pytest
+
+from docker_tools_plus.database import CleanupSchema, RunRecord
+from docker_tools_plus.engine import CleanupResult
+from docker_tools_plus.exceptions import DockerCommandError
+from docker_tools_plus.stats import cleanup_stats, percentile, run_records, summarize_runs, trend
+
+
+def _record(run_id, name, resource_type, started, finished, **kwargs):
+    return RunRecord(
+        run_id=run_id,
+        cleanup_name=name,
+        resource_type=resource_type,
+        started_at=started,
+        finished_at=finished,
+        duration=finished - started,
+        **kwargs,
+    )
+
+
+def test_run_records():
+    cleanups = [
+        CleanupSchema(id=1, name="web", regular_expression="web"),
+        CleanupSchema(id=2, name="api", regular_expression="api"),
+    ]
+    results = {
+        "containers": CleanupResult("containers", removed=["c1"], matched=2, started_at=10.0, finished_at=12.0),
+        "volumes": CleanupResult("volumes", error=DockerCommandError("boom"), started_at=12.0, finished_at=12.5),
+        "images": CleanupResult("images"),
+    }
+    records = run_records(cleanups, results, host="unix:///a.sock", run_id="r1")
+    assert [r.resource_type for r in records] == ["containers", "volumes"]
+    assert {r.cleanup_name for r in records} == {"api, web"}
+    assert all(r.cleanup_id is None and r.host == "unix:///a.sock" for r in records)
+    assert (records[0].matched, records[0].deleted, records[0].duration) == (2, 1, 2.0)
+    assert records[1].error == "boom"
+    assert run_records(cleanups[:1], results)[0].cleanup_id == 1
+
+
+def test_summarize_runs_spans_overlapping_types():
+    summaries = summarize_runs(
+        [
+            _record("b", "api", "containers", 100, 102, deleted=1),
+            _record("a", "web", "containers", 10, 11, deleted=2),
+            _record("b", "api", "volumes", 102, 105, deleted=3, reclaimed=10),
+            _record("b", "api", "images", 102, 104, deleted=4, reclaimed=5),
+        ]
+    )
+    assert [s.run_id for s in summaries] == ["a", "b"]
+    assert summaries[1].duration == 5
+    assert (summaries[1].deleted, summaries[1].reclaimed) == (8, 15)
+
+
+def test_percentile():
+    values = list(range(1, 21))
+    assert percentile(values, 50) == 10
+    assert percentile(values, 95) == 19
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_trend():
+    assert trend([1.0, 1.0, 1.0]) is None
+    assert trend([1.0, 1.0, 2.0, 2.0]) == pytest.approx(1.0)
+    assert trend([4.0, 4.0, 4.0, 2.0, 2.0]) == pytest.approx(-0.5)
+
+
+def test_cleanup_stats_costliest_first():
+    stats = cleanup_stats(
+        summarize_runs(
+            [
+                _record("a", "cheap", "containers", 0, 1, deleted=1),
+                _record("b", "costly", "containers", 10, 20, deleted=5, failed=1),
+                _record("c", "costly", "containers", 30, 60, deleted=5, reclaimed=300),
+            ]
+        )
+    )
+    assert [s.cleanup_name for s in stats] == ["costly", "cheap"]
+    costly = stats[0]
+    assert (costly.runs, costly.p50, costly.p95, costly.total_duration) == (2, 10, 30, 40)
+    assert (costly.deleted, costly.failed, costly.reclaimed) == (10, 1, 300)
+    assert costly.reclaimed_per_second == 7.5
+    assert costly.trend is None
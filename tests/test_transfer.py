@@ -0,0 +1,77 @@
+import pytest
+
+from docker_tools_plus.database import CleanupSchema, cleanup_row
+from docker_tools_plus.exceptions import InvalidCleanupError
+from docker_tools_plus.transfer import detect_format, format_definitions, parse_definitions, read_definitions
+
+CLEANUPS = [
+    CleanupSchema(name="api: v1 - old", regular_expression='api_"v1".*'),
+    CleanupSchema(name="ci", labels=["ci=true", "!keep"], until="24h"),
+    CleanupSchema(name="builds", regular_expression="build", min_size=500_000_000, keep_latest=3),
+    CleanupSchema(name="old-tags", regular_expression="^v0", match_fields=["tag", "name"]),
+]
+
+
+class TestTransfer:
+    @pytest.mark.parametrize("file_format", ["toml", "json", "csv"])
+    def test_round_trip(self, file_format):
+        document = format_definitions(CLEANUPS, file_format)
+        cleanups, unchanged = parse_definitions(read_definitions(document, file_format))
+        assert cleanups == CLEANUPS
+        assert unchanged == 0
+
+    def test_toml_layout(self):
+        document = format_definitions(CLEANUPS[1:2], "toml")
+        assert document == '[[cleanups]]\nname = "ci"\nlabels = ["ci=true", "!keep"]\nuntil = "24h"\n'
+
+    def test_sizes_and_bare_json_list(self):
+        records = read_definitions('[{"name": "big", "min_size": "1.5GB", "id": 7}]', "json")
+        (cleanup,), _ = parse_definitions(records)
+        assert (cleanup.id, cleanup.min_size) == (None, 1_500_000_000)
+
+    def test_csv_labels_and_empty_cells(self):
+        document = "name,regular_expression,labels,keep_latest\nci,,ci; team=a,\nweb,web_.*,,2\n"
+        cleanups, _ = parse_definitions(read_definitions(document, "csv"))
+        assert [(c.name, c.labels, c.keep_latest) for c in cleanups] == [("ci", ["ci", "team=a"], None), ("web", [], 2)]
+
+    def test_every_invalid_definition_is_reported(self):
+        records = [
+            {"name": "bad-regex", "regular_expression": "api_[0-9"},
+            {"name": "ok", "regular_expression": "fine"},
+            {"name": "bad-until", "regular_expression": "web", "until": "7d"},
+            {"name": "ok", "regular_expression": "again"},
+            {"name": "extra", "regular_expression": "web", "pattern": "x"},
+            {"name": "", "regular_expression": "web"},
+        ]
+        with pytest.raises(InvalidCleanupError) as error:
+            parse_definitions(records)
+        message = str(error.value)
+        assert message.startswith("5 invalid cleanup definition(s), nothing imported")
+        assert "#1 bad-regex: Invalid regular expression" in message
+        assert "#3 bad-until: Invalid duration '7d'" in message
+        assert "#4 ok: also defined by #2" in message
+        assert "#5 extra: Unknown field(s): pattern" in message
+        assert "#6 ?: name:" in message
+
+    def test_unchanged_definitions_are_not_validated_again(self):
+        stored = {c.name: cleanup_row(dict(c)) for c in CLEANUPS}
+        records = [
+            {"name": "ci", "labels": ["ci=true", "!keep"], "until": "24h"},
+            {"name": "builds", "regular_expression": "build", "min_size": "500MB", "keep_latest": 3},
+            {"name": "api: v1 - old", "regular_expression": "api_v2"},
+        ]
+        cleanups, unchanged = parse_definitions(records, stored)
+        assert [c.regular_expression for c in cleanups] == ["api_v2"]
+        assert unchanged == 2
+
+    @pytest.mark.parametrize(
+        ("text", "file_format"), [("[[cleanups]\n", "toml"), ("{", "json"), ('{"cleanups": {"name": "x"}}', "json")]
+    )
+    def test_unreadable_documents(self, text, file_format):
+        with pytest.raises(InvalidCleanupError):
+            read_definitions(text, file_format)
+
+    def test_detect_format(self, tmp_path):
+        assert detect_format(tmp_path / "teams.CSV") == "csv"
+        with pytest.raises(InvalidCleanupError, match="use --format"):
+            detect_format(tmp_path / "teams.yaml")